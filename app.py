@@ -1,25 +1,42 @@
 import streamlit as st
-from datetime import datetime, date
+from datetime import date
 import re
-from decimal import Decimal, InvalidOperation
+import math
 import html
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Import custom modules for database handling and tracker logic
 from db_module.dynamo_handler import (
-    add_book_to_db, edit_book, delete_book, get_book_details,
-    search_books, filter_books, get_user_history,
-    generate_user_id, get_user_details, register_user
+    add_book_to_db, edit_book, delete_book,
+    generate_user_id, get_user_details, register_user,
+    build_book_filter, get_books_page, count_books, get_books_with_deadlines
 )
 
 from reading_tracker.tracker import (
-    get_all_books_for_user,
     update_book_progress_in_db,
     archive_single_book_in_db,
     unarchive_single_book_in_db
 )
 
-from dashboard.dashboard_cli import show_dashboard
+from db_module.codec import encode_progress, encode_rating, PROGRESS_FIELDS
+from db_module.filter_engine import BookQuery, run_book_query
+from db_module.tag_index import tag_counts
+from db_module.single_table import dual_layout_enabled, load_user_bundle
+from reading_tracker.library_hub import find_user_book, get_library_hub, get_user_books, record_book_write
+from dashboard.dashboard_cli import show_dashboard, DASHBOARD_FIELDS
+from catalog.genre_bitmaps import get_genre_bitmaps
+from catalog.search_engine import search_catalog
+from recommender.recommendation_cache import (
+    clear_user_recommendations, load_genre_recommendations, load_recommendations, seed_recommendations
+)
+from recommender.recommend import refresh_recommendations
+from db_module.stats_handler import get_user_stats
 from dashboard.report_generator import generate_pdf_summary
+from monitoring.metrics import instrument_page, registry
+from monitoring.diagnostics import show_diagnostics
+from monitoring.profiler import profile_rerun, profiling_enabled
 
 # Configure the Streamlit page settings
 st.set_page_config(
@@ -47,6 +64,24 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Attributes each view renders, so reads only fetch what is displayed
+BOOK_CARD_FIELDS = [
+    "book_id", "title", "author", "genre", "rating", "status",
+    "tags", "total_pages", "pages_read", *PROGRESS_FIELDS
+]
+EDIT_BOOK_FIELDS = ["book_id", "title", "author", "genre", "tags", "total_pages", "pages_read", "version"]
+DELETE_BOOK_FIELDS = ["book_id", "title", "author", "version"]
+PROGRESS_BOOK_FIELDS = ["book_id", "title", "author", "total_pages", "pages_read", "rating", "deadline", "version"]
+ARCHIVE_BOOK_FIELDS = ["book_id", "title", "author", "status", "archived"]
+DEADLINE_FIELDS = ["title", "deadline", "status"]
+
+# Paging options for the library views
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+SORT_OPTIONS = {"Oldest added first": True, "Newest added first": False}
+
+# Recommendation grid settings
+RECOMMENDATION_PAGE_SIZE = 12  # Cards shown initially and added per "Load more"
+
 # Utility function to validate the Book ID format (e.g., B1234)
 def is_valid_book_id_format(book_id):
     pattern = re.compile(r'^B\d{4}$')
@@ -59,8 +94,8 @@ def is_valid_user_id_format(user_id):
 
 # Formats book data for clean display in the UI
 def format_book_for_display(book):
-    rating_val = book.get('rating')
-    rating_display = float(rating_val) if rating_val is not None else "N/A"
+    rating_val = book.get('rating')  # Already an int/float, converted once by the data layer
+    rating_display = rating_val if rating_val is not None else "N/A"
     
     return {
         "Book ID": book.get("book_id", "N/A"),
@@ -144,7 +179,7 @@ def show_login():
                 email_login = email_login_input.strip()
 
                 if is_valid_user_id_format(user_id_upper):
-                    user_details = get_user_details(user_id_upper)
+                    user_details = get_user_details(user_id_upper, fields=["email", "name"])
                     
                     # Validate email from DB against input
                     if user_details and user_details.get('email') == email_login:
@@ -232,30 +267,42 @@ def main_app():
                 st.session_state.selected_page = value
                 st.rerun()
 
-    # Render the selected page based on user navigation
-    page = st.session_state.selected_page
-    if page == "dashboard":
-        show_dashboard()
-    elif page == "add":
-        show_add_book()
-    elif page == "edit":
-        show_edit_book()
-    elif page == "delete":
-        show_delete_book()
-    elif page == "search":
-        show_search_books()
-    elif page == "filter":
-        show_filter_books()
-    elif page == "history":
-        show_reading_history()
-    elif page == "recommend":
-        show_recommendations()
-    elif page == "progress":
-        show_update_progress()
-    elif page == "deadlines":
-        show_view_deadlines()
-    elif page == "archive":
-        show_archive_book()
+    sync_held_books()
+
+    # Render the selected page based on user navigation (?diagnostics=1 opens the hidden metrics page)
+    page = "diagnostics" if st.query_params.get("diagnostics") else st.session_state.selected_page
+    if page in PAGE_HANDLERS:
+        handler = PAGE_HANDLERS[page]
+        # Opt-in rerun profiling (SMARTREADS_PROFILE=1 or ?profile=1), summarized by monitoring/profiler.py
+        with profile_rerun(handler.__name__, enabled=profiling_enabled(st.query_params.get("profile"))):
+            handler()
+
+# Books a page holds in the session while a form is open, with the session key of their id
+HELD_BOOKS = {"edit_book": "edit_book_id", "progress_book": "progress_book_id",
+              "delete_book": "delete_book_id", "archive_book": "archive_book_id"}
+
+# Bring the books this session holds up to date with writes from the user's other tabs, using the
+# library hub's change list instead of fetching them again
+def sync_held_books():
+    hub = get_library_hub(st.session_state.user_id)
+    if hub is None:
+        return
+    seen = st.session_state.get("library_version")  # (hub generation, hub version)
+    version, changed = hub.changes_since(*(seen or (hub.generation, 0)))
+    st.session_state.library_version = (hub.generation, version)
+    if seen is None or changed == set():
+        return
+    for book_key, id_key in HELD_BOOKS.items():
+        book_id = st.session_state.get(id_key)
+        if book_key not in st.session_state or not book_id or (changed is not None and book_id not in changed):
+            continue
+        book = hub.get_book(book_id)
+        if book is None:
+            # Deleted in another tab
+            st.session_state.pop(book_key, None)
+            st.session_state.pop(id_key, None)
+        else:
+            st.session_state[book_key] = book
 
 # Page for adding a new book
 def show_add_book():
@@ -278,6 +325,8 @@ def show_add_book():
         st.session_state.add_total_pages = 1
     if "add_pages_read" not in st.session_state:
         st.session_state.add_pages_read = 0
+    if "add_lookup" not in st.session_state:
+        st.session_state.add_lookup = ""
 
     # Callback to handle the logic of adding a book
     def _handle_add_book():
@@ -301,7 +350,7 @@ def show_add_book():
         book_data = {
             "title": title, "author": author,
             "genre": st.session_state.add_genre.strip() if st.session_state.add_genre else None,
-            "rating": Decimal(str(st.session_state.add_rating)) if st.session_state.add_rating else None,
+            "rating": encode_rating(st.session_state.add_rating),
             "status": st.session_state.add_status.lower(), "tags": st.session_state.add_tags.strip(),
             "total_pages": int(total_pages), "pages_read": int(pages_read)
         }
@@ -327,11 +376,37 @@ def show_add_book():
         st.session_state.add_tags = ""
         st.session_state.add_total_pages = 1
         st.session_state.add_pages_read = 0
+        st.session_state.add_lookup = ""
+
+    # Callback to fill the form from the catalog match picked in the lookup
+    def _handle_pick_match():
+        match = st.session_state.get("add_matches", {}).get(st.session_state.add_match)
+        if match is None:
+            return
+        st.session_state.add_title = match.title
+        st.session_state.add_author = match.author
+        st.session_state.add_genre = match.genres[0] if match.genres else ""
 
     # UI layout for the add book form
     st.markdown("""
         <style> .stButton>button { display: block; margin: 0 auto; } </style>
     """, unsafe_allow_html=True)
+
+    # Catalog lookup: the top matches for the title/author typed so far
+    st.text_input("🔎 Find in catalog", key="add_lookup", placeholder="Type part of a title or author (typos are fine)...")
+    if st.session_state.add_lookup.strip():
+        results = search_catalog(st.session_state.add_lookup)
+        matches = {book.book_id: book for book in results or []}
+        if results is None:
+            st.caption("The catalog index is being built, try again in a moment...")
+        elif matches:
+            st.session_state.add_matches = matches
+            st.selectbox("Catalog matches", [None] + list(matches), key="add_match", on_change=_handle_pick_match,
+                         format_func=lambda book_id: "Pick a book to fill in the form" if book_id is None
+                         else f"{matches[book_id].title} - {matches[book_id].author}")
+        else:
+            st.caption("No catalog matches, enter the details below.")
+
     col1, col2 = st.columns(2)
 
     with col1:
@@ -372,7 +447,7 @@ def show_edit_book():
     if st.session_state.edit_book_input and 'edit_book' not in st.session_state:
         book_id = st.session_state.edit_book_input.strip().upper()
         if is_valid_book_id_format(book_id):
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=EDIT_BOOK_FIELDS)
             if book:
                 st.session_state.edit_book = book
                 st.session_state.edit_book_id = book_id
@@ -396,7 +471,7 @@ def show_edit_book():
             st.error("Invalid Book ID format!")
             st.session_state.edit_book_input = ""
         else:
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=EDIT_BOOK_FIELDS)
             if not book:
                 st.error("Book not found!")
                 st.session_state.edit_book_input = ""
@@ -435,19 +510,23 @@ def show_edit_book():
                 if total_pages_val < pages_read:
                     st.error(f"New total pages ({total_pages_val}) cannot be less than pages read ({pages_read})!")
                     return
-                # Recalculate progress percentage
-                new_percent = round(Decimal(pages_read) / Decimal(total_pages_val) * 100, 2)
-                updated_fields = {'total_pages': total_pages_val, 'progress_percent': new_percent}
+                # Recalculate progress in basis points
+                updated_fields = {'total_pages': total_pages_val, 'progress_bp': encode_progress(pages_read, total_pages_val)}
             else:
                 updated_fields = {field: final_value}
-        except (ValueError, TypeError, InvalidOperation):
+        except (ValueError, TypeError):
             st.error(f"Invalid value provided for {field}. Please check your input.")
             return
 
-        # Call the database handler to apply the changes
+        # Call the database handler to apply the changes, only if the book is unchanged since it was loaded
         try:
-            edit_book(st.session_state.user_id, st.session_state.edit_book_id, updated_fields)
-            st.success("Book edited successfully!")
+            updated = edit_book(st.session_state.user_id, st.session_state.edit_book_id, updated_fields,
+                                expected_version=book.get('version', 0))
+            if updated is None:
+                st.error("The book was changed or deleted since it was loaded. Please find it again!")
+            else:
+                record_book_write(st.session_state.user_id, st.session_state.edit_book_id, updated)
+                st.success("Book edited successfully!")
             st.session_state.pop("edit_book", None)
             st.session_state.pop("edit_book_id", None)
             st.session_state.edit_book_input = ""
@@ -510,7 +589,7 @@ def show_delete_book():
     if st.session_state.delete_book_input and 'delete_book' not in st.session_state:
         book_id = st.session_state.delete_book_input.strip().upper()
         if is_valid_book_id_format(book_id):
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=DELETE_BOOK_FIELDS)
             if book:
                 st.session_state.delete_book = book
                 st.session_state.delete_book_id = book_id
@@ -530,7 +609,7 @@ def show_delete_book():
             st.error("Invalid Book ID format!")
             st.session_state.delete_book_id_input = ""
         else:
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=DELETE_BOOK_FIELDS)
             if not book:
                 st.error("Book not found!")
                 st.session_state.delete_book_id_input = ""
@@ -541,8 +620,13 @@ def show_delete_book():
     # Callback to confirm and execute the deletion
     def _handle_book_delete():
         try:
-            delete_book(st.session_state.user_id, st.session_state.delete_book_id)
-            st.success("Book deleted successfully!")
+            deleted = delete_book(st.session_state.user_id, st.session_state.delete_book_id,
+                                  expected_version=st.session_state.delete_book.get('version', 0))
+            if deleted is None:
+                st.error("The book was changed or deleted since it was loaded. Please find it again!")
+            else:
+                record_book_write(st.session_state.user_id, st.session_state.delete_book_id, None)
+                st.success("Book deleted successfully!")
             del st.session_state.delete_book
             del st.session_state.delete_book_id
             st.session_state.delete_book_id_input = ""
@@ -579,13 +663,13 @@ def show_search_books():
     st.markdown("<br>", unsafe_allow_html=True)
     keyword = st.text_input("Search by title or author", placeholder="Enter keyword (case-sensitive)")
     
+    # Keep the active search across reruns so the result pages can be browsed
     if st.button("🔍 Search"):
-        results = search_books(st.session_state.user_id, keyword)
-        if results:
-            st.success(f"Found {len(results)} book(s)...")
-            display_books_table(results)
-        else:
-            st.info("No books found!")
+        st.session_state.search_filter = {"keyword": keyword}
+        st.session_state.pop("search_pager", None)  # Every search runs afresh, even when repeated
+    if "search_filter" in st.session_state:
+        show_paginated_books("search", st.session_state.search_filter,
+                             found_message="Found {} book(s)...", empty_message="No books found!")
 
 # Page for filtering books by genre, rating, or status
 def show_filter_books():
@@ -595,36 +679,63 @@ def show_filter_books():
     
     with col1:
         genre = st.text_input("Genre", placeholder="e.g. Fiction")
+        statuses = st.multiselect("Status", ["To-read", "Reading", "Completed"], placeholder="Any status")
+        tags = st.text_input("Tags (any of)", placeholder="e.g. book-club, favourites")
+        tag_summary = ", ".join(f"{tag} ({count})" for tag, count in list(tag_counts(st.session_state.user_id).items())[:8])
+        if tag_summary:
+            st.caption(f"Your tags: {tag_summary}")
     with col2:
-        rating = st.selectbox("Rating", [None, 1, 2, 3, 4, 5], 
-                             format_func=lambda x: "Any rating" if x is None else f"{x} ⭐")
+        # The full range of a slider means "no filter", so unrated books are only excluded on purpose
+        ratings = st.slider("Rating", 1, 5, (1, 5), format="%d ⭐")
+        progress = st.slider("Progress (%)", 0, 100, (0, 100))
     with col3:
-        status = st.selectbox("Status", [None, "To-read", "Reading", "Completed"],
-                             format_func=lambda x: "Any status" if x is None else x.capitalize())
+        added = st.date_input("Added between", value=(), format="YYYY-MM-DD")
+        completed = st.date_input("Completed between", value=(), format="YYYY-MM-DD")
     
+    # Keep the active filters across reruns so the result pages can be browsed
     if st.button("🔎 Apply"):
-        results = filter_books(st.session_state.user_id,
-                               genre.strip() if genre.strip() else None,
-                               str(rating) if rating else None,
-                               status.lower() if status else None)
-        if results:
-            st.success(f"Found {len(results)} book(s)...")
-            display_books_table(results)
-        else:
+        query = BookQuery(
+            statuses=statuses, genre=genre.strip() or None,
+            tags=tags.split(","),
+            rating_min=ratings[0] if ratings != (1, 5) else None,
+            rating_max=ratings[1] if ratings != (1, 5) else None,
+            progress_min=progress[0] if progress != (0, 100) else None,
+            progress_max=progress[1] if progress != (0, 100) else None,
+            added_from=added[0] if added else None, added_to=added[-1] if added else None,
+            completed_from=completed[0] if completed else None, completed_to=completed[-1] if completed else None
+        )
+        books, plan = run_book_query(st.session_state.user_id, query, fields=BOOK_CARD_FIELDS)
+        st.session_state.filter_results = {"books": books, "plan": plan.summary()}
+        st.session_state.filter_page = 1
+
+    if "filter_results" in st.session_state:
+        results = st.session_state.filter_results
+        books = results["books"]
+        if not books:
             st.info("No books match your filters!")
+            st.caption(f"Plan: {results['plan']}")
+            return
+        st.success(f"Found {len(books)} book(s)...")
+        st.caption(f"Plan: {results['plan']}")
+
+        # Results are already in memory, so pages are slices
+        size_col, page_col = st.columns(2)
+        with size_col:
+            page_size = st.selectbox("Books per page", PAGE_SIZE_OPTIONS, key="filter_page_size")
+        num_pages = math.ceil(len(books) / page_size)
+        st.session_state.filter_page = min(st.session_state.get("filter_page", 1), num_pages)
+        with page_col:
+            st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, step=1, key="filter_page")
+        start = (st.session_state.filter_page - 1) * page_size
+        display_books_table(books[start:start + page_size])
 
 # Page to display the user's complete reading history
 def show_reading_history():
     st.title("📖 Reading History")
     st.markdown("<br>", unsafe_allow_html=True)
-    history = get_user_history(st.session_state.user_id)
-
-    if history:
-        history_sorted = sorted(history, key=lambda b: b.get("book_id", ""))
-        st.success(f"Showing {len(history_sorted)} book(s) from your history...")
-        display_books_table_edit(history_sorted)
-    else:
-        st.info("No reading history found!")
+    show_paginated_books("history", {"exclude_archived": True}, editable=True,
+                         found_message="Showing {} book(s) from your history...",
+                         empty_message="No reading history found!")
 
 # Page to display personalized book recommendations
 def show_recommendations():
@@ -640,6 +751,9 @@ def show_recommendations():
             flex-direction: column; justify-content: space-between;
             transition: border-color 0.3s; overflow: hidden;
         }
+        .book-grid {
+            display: grid; grid-template-columns: repeat(3, minmax(0, 1fr)); column-gap: 1rem;
+        }
         .book-card:hover { border-color: #4A90E2; }
         .book-card h4 {
             font-size: 1.1rem; font-weight: 600; color: #FAFAFA; margin: 0 0 10px 0;
@@ -657,36 +771,76 @@ def show_recommendations():
     """
     st.markdown(card_css, unsafe_allow_html=True)
 
-    # Fetch and display recommendations
-    user_details = get_user_details(st.session_state.user_id)
-    recommendations = user_details.get('recommendations', [])
+    # Recompute from the current library (scored by the recommendation service when it is running)
+    if st.button("🔄 Refresh Recommendations"):
+        with st.spinner("Scoring the catalog..."):
+            if refresh_recommendations(st.session_state.user_id) is None:
+                st.error("Could not refresh recommendations!")
+        clear_user_recommendations(st.session_state.user_id)
+
+    # Genre facets over the whole catalog, with the most common genres of the current selection
+    genre_keys = ("rec_all_genres", "rec_any_genres", "rec_no_genres")
+    genre_filter = tuple(tuple(st.session_state.get(key, ())) for key in genre_keys)
+    with st.expander("🎯 Filter by genre", expanded=any(genre_filter)):
+        genre_index = get_genre_bitmaps()
+        for label, key in zip(("Must have all of", "Any of", "None of"), genre_keys):
+            st.multiselect(label, genre_index.genres, key=key)
+        if any(genre_filter):
+            selection = genre_index.query(*genre_filter)
+            facets = sorted(genre_index.facet_counts(selection).items(), key=lambda facet: facet[1], reverse=True)
+            st.caption(f"{genre_index.count(selection)} catalog books match. Common genres: "
+                       + " · ".join(f"{genre} ({count})" for genre, count in facets[:8]))
+
+    # Fetch recommendations through the TTL cache instead of on every rerun
+    if any(genre_filter):
+        payload = load_genre_recommendations(st.session_state.user_id, *genre_filter)
+        summary = f"{payload['matched']} unread catalog books match these genres, here are the best {len(payload['items'])} for you..."
+    else:
+        payload = load_recommendations(st.session_state.user_id)
+        summary = f"Based on your reading history, here are {len(payload['items'])} recommendations..."
+    recommendations = payload["items"]
 
     if recommendations:
-        st.success(f"Based on your reading history, here are {len(recommendations)} recommendations...")
-        num_columns = 3
-        for i in range(0, len(recommendations), num_columns):
-            cols = st.columns(num_columns)
-            row_recs = recommendations[i:i + num_columns]
-            for j, rec in enumerate(row_recs):
-                with cols[j]:
-                    # Escape HTML to prevent injection vulnerabilities
-                    title = html.escape(rec.get('title', 'N/A'))
-                    author = html.escape(rec.get('author', 'N/A'))
-                    try:
-                        rating_text = f"{float(rec.get('avg_rating')):.2f}"
-                    except (ValueError, TypeError):
-                        rating_text = "N/A"
-                    # Render the book card using HTML
-                    card_html = f"""
-                    <div class="book-card">
-                        <div> <h4 title="{title}">{title}</h4> <p class="author" title="by {author}">by {author}</p> </div>
-                        <div> <p class="rating">⭐ {rating_text} Average Rating</p> </div>
-                    </div>
-                    """
-                    st.markdown(card_html, unsafe_allow_html=True)
+        st.success(summary)
+
+        # Start from the first page again whenever the recommendation list changes
+        if st.session_state.get("rec_version") != payload["version"]:
+            st.session_state.rec_version = payload["version"]
+            st.session_state.rec_visible = RECOMMENDATION_PAGE_SIZE
+        visible = min(st.session_state.rec_visible, len(recommendations))
+
+        # Render the whole grid with a single element write
+        grid_html = build_recommendation_grid(payload["version"], visible, recommendations)
+        st.markdown(grid_html, unsafe_allow_html=True)
+
+        if visible < len(recommendations):
+            def _handle_load_more():
+                st.session_state.rec_visible += RECOMMENDATION_PAGE_SIZE
+
+            st.button(f"⬇️ Load more ({len(recommendations) - visible} remaining)", on_click=_handle_load_more)
     else:
         st.error("No recommendations available! Read more books...")
 
+# Builds the HTML for the first `count` recommendation cards, cached per list version
+@st.cache_data(max_entries=256, show_spinner=False)
+def build_recommendation_grid(version, count, _recommendations):
+    cards = []
+    for rec in _recommendations[:count]:
+        # Escape HTML to prevent injection vulnerabilities
+        title = html.escape(rec.get('title', 'N/A'))
+        author = html.escape(rec.get('author', 'N/A'))
+        try:
+            rating_text = f"{float(rec.get('avg_rating')):.2f}"
+        except (ValueError, TypeError):
+            rating_text = "N/A"
+        cards.append(
+            f'<div class="book-card">'
+            f'<div> <h4 title="{title}">{title}</h4> <p class="author" title="by {author}">by {author}</p> </div>'
+            f'<div> <p class="rating">⭐ {rating_text} Average Rating</p> </div>'
+            f'</div>'
+        )
+    return f'<div class="book-grid">{"".join(cards)}</div>'
+
 # Page for updating reading progress for a book
 def show_update_progress():
     st.title("📈 Update Reading Progress")
@@ -700,7 +854,7 @@ def show_update_progress():
     if st.session_state.progress_book_input and 'progress_book' not in st.session_state:
         book_id = st.session_state.progress_book_input.strip().upper()
         if is_valid_book_id_format(book_id):
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=PROGRESS_BOOK_FIELDS)
             if book:
                 st.session_state.progress_book = book
                 st.session_state.progress_book_id = book_id
@@ -720,7 +874,7 @@ def show_update_progress():
             st.error("Invalid Book ID format!")
             st.session_state.progress_book_input = ""
             return
-        book = get_book_details(st.session_state.user_id, book_id)
+        book = find_user_book(st.session_state.user_id, book_id, fields=PROGRESS_BOOK_FIELDS)
         if not book:
             st.error("Book not found!")
             st.session_state.progress_book_input = ""
@@ -768,14 +922,19 @@ def show_update_progress():
             'rating': rating_value
         }
 
-        # Attempt to update the book progress in the database
+        # Attempt to update the book progress in the database, only if it is unchanged since it was loaded
         try:
-            success, percent = update_book_progress_in_db(
-                st.session_state.user_id, st.session_state.progress_book_id, progress_data)
-            if success:
+            updated, percent = update_book_progress_in_db(
+                st.session_state.user_id, st.session_state.progress_book_id, progress_data,
+                expected_version=book.get('version', 0))
+            if updated:
+                record_book_write(st.session_state.user_id, st.session_state.progress_book_id, updated)
                 st.success("Progress updated successfully!")
                 _handle_cancel_progress() # Clear the form
                 st.session_state.trigger_progress_rerun = True
+            else:
+                st.error("The book was changed or deleted since it was loaded. Please find it again!")
+                _handle_cancel_progress()
         except Exception:
             st.error(f"Error updating progress...")
 
@@ -816,8 +975,7 @@ def show_update_progress():
                          key="progress_rating_input")
 
             # Deadline selector
-            current_deadline = book.get('deadline')
-            deadline_val = datetime.strptime(current_deadline, "%Y-%m-%d").date() if current_deadline else None
+            deadline_val = book.deadline_date  # Parsed once and cached on the record
             st.date_input("Deadline (optional)", value=deadline_val, key="progress_deadline_input")
 
             # Action buttons
@@ -832,24 +990,20 @@ def show_view_deadlines():
     st.title("⏰ Your Reading Deadlines")
     st.markdown("<br>", unsafe_allow_html=True)
     
-    books = get_all_books_for_user(st.session_state.user_id)
+    books = get_books_with_deadlines(st.session_state.user_id, fields=DEADLINE_FIELDS)
     today = date.today()
     upcoming, overdue = [], []
     
     # Categorize books based on their deadline status
     for book in books:
-        deadline_str = book.get('deadline')
-        if not deadline_str: continue
-        try:
-            deadline = datetime.strptime(deadline_str, "%Y-%m-%d").date()
-            if book.get('status', '').lower() != 'completed':
-                book_info = (book.get('title'), deadline_str, deadline)
-                if deadline >= today:
-                    upcoming.append(book_info)
-                else:
-                    overdue.append(book_info)
-        except:
+        deadline = book.deadline_date
+        if not deadline or book.is_completed:
             continue
+        book_info = (book.get('title'), book.get('deadline'), deadline)
+        if deadline >= today:
+            upcoming.append(book_info)
+        else:
+            overdue.append(book_info)
     
     # Display the categorized lists in two columns
     col1, col2 = st.columns(2)
@@ -888,7 +1042,7 @@ def show_archive_book():
             st.error("Invalid Book ID format!")
             st.session_state.archive_book_input = ""
         else:
-            book = get_book_details(st.session_state.user_id, book_id)
+            book = find_user_book(st.session_state.user_id, book_id, fields=ARCHIVE_BOOK_FIELDS)
             if not book:
                 st.error("Book not found!")
                 st.session_state.archive_book_input = ""
@@ -905,8 +1059,9 @@ def show_archive_book():
     # Callback to confirm and execute the archiving
     def _handle_confirm_archive():
         try:
-            success = archive_single_book_in_db(st.session_state.user_id, st.session_state.archive_book_id)
-            if success:
+            archived = archive_single_book_in_db(st.session_state.user_id, st.session_state.archive_book_id)
+            if archived is not None:
+                record_book_write(st.session_state.user_id, st.session_state.archive_book_id, archived)
                 st.success("Book archived successfully!")
                 del st.session_state.archive_book
                 del st.session_state.archive_book_id
@@ -935,7 +1090,8 @@ def show_archive_book():
             st.button("❌ Cancel", on_click=_handle_cancel_archive)
 
     # Fetch and display the list of all archived books
-    archived_books = [book for book in get_all_books_for_user(st.session_state.user_id) if book.get('archived') is True]
+    archived_books = [book for book in get_user_books(st.session_state.user_id, fields=BOOK_CARD_FIELDS + ["archived"])
+                      if book.get('archived') is True]
 
     st.title("📚 Archived Books")
     st.markdown("<br>", unsafe_allow_html=True)
@@ -955,7 +1111,7 @@ def show_archive_book():
                     st.markdown(f"Genre: {book.get('genre', 'None')}")
                     rating_display = f"{book.get('rating')} ⭐" if book.get('rating') not in [None, 'None'] else "None"
                     st.markdown(f"Rating: {rating_display}")
-                    progress = float(book.get("progress_percent", 0))
+                    progress = book.get("progress_percent") or 0.0
                     st.progress(progress / 100, text=f"Progress: {book.get('pages_read', 0)}/{book.get('total_pages', 1)} pages ({progress:.1f}%)")
                 with col2: # Metadata
                     st.markdown(f"Book ID: `{book_id}`")
@@ -966,8 +1122,9 @@ def show_archive_book():
                 with col3: # Unarchive button
                     if st.button(f"📤 Unarchive", key=f"unarchive_{book_id}", use_container_width=True):
                         try:
-                            success = unarchive_single_book_in_db(st.session_state.user_id, book_id)
-                            if success:
+                            unarchived = unarchive_single_book_in_db(st.session_state.user_id, book_id)
+                            if unarchived is not None:
+                                record_book_write(st.session_state.user_id, book_id, unarchived)
                                 st.success(f"Book `{book_id}` unarchived successfully!")
                                 st.rerun()
                             else:
@@ -977,6 +1134,87 @@ def show_archive_book():
     else:
         st.info("No archived books found!")
 
+# Fetches and renders only the visible page of a book query, with cursor-based paging controls
+def show_paginated_books(view_key, filter_args, editable=False, found_message="Found {} book(s)...",
+                         empty_message="No books to display!"):
+    user_id = st.session_state.user_id
+    pager_key = f"{view_key}_pager"
+    jump_key = f"{view_key}_jump_page"
+    book_filter = build_book_filter(**filter_args)
+
+    # Page size and sort order controls
+    size_col, sort_col = st.columns(2)
+    with size_col:
+        page_size = st.selectbox("Books per page", PAGE_SIZE_OPTIONS, key=f"{view_key}_page_size")
+    with sort_col:
+        sort_label = st.selectbox("Sort by", list(SORT_OPTIONS), key=f"{view_key}_sort")
+    ascending = SORT_OPTIONS[sort_label]
+
+    # Start over whenever the query, page size or sort order changes
+    signature = (repr(sorted(filter_args.items())), page_size, ascending)
+    pager = st.session_state.get(pager_key)
+    if not pager or pager["signature"] != signature:
+        pager = {"signature": signature, "page": 0}
+        st.session_state[pager_key] = pager
+
+    # Recount and drop the cursors after any write to the library (from any tab), staying on the same page
+    library_version = st.session_state.get("library_version")
+    if "total" not in pager or pager["library_version"] != library_version:
+        pager.update({
+            "library_version": library_version,
+            "cursors": [None],  # cursors[n] is the ExclusiveStartKey of page n
+            "total": count_books(user_id, book_filter)
+        })
+
+    total = pager["total"]
+    if not total:
+        st.info(empty_message)
+        return
+    num_pages = math.ceil(total / page_size)
+    st.success(found_message.format(total))
+
+    # Callbacks for the previous/next buttons and the jump-to-page input
+    def _go_to_page(page):
+        pager["page"] = page
+
+    def _handle_jump():
+        pager["page"] = st.session_state[jump_key] - 1
+
+    page = min(pager["page"], num_pages - 1)
+    cursors = pager["cursors"]
+
+    # Walk forward with key-only pages until the requested page's start cursor is known
+    while len(cursors) <= page:
+        _, next_cursor = get_books_page(user_id, page_size, cursors[-1], book_filter,
+                                        fields=["book_id"], ascending=ascending)
+        if next_cursor is None:
+            break
+        cursors.append(next_cursor)
+    page = min(page, len(cursors) - 1)
+
+    books, next_cursor = get_books_page(user_id, page_size, cursors[page], book_filter,
+                                        fields=BOOK_CARD_FIELDS, ascending=ascending)
+    if next_cursor and len(cursors) == page + 1:
+        cursors.append(next_cursor)
+
+    if editable:
+        display_books_table_edit(books)
+    else:
+        display_books_table(books)
+
+    # Paging controls
+    prev_col, jump_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        st.button("⬅️ Previous", key=f"{view_key}_prev", on_click=_go_to_page, args=(page - 1,),
+                  disabled=page == 0, use_container_width=True)
+    with jump_col:
+        st.session_state[jump_key] = page + 1  # Keep the input in sync with the visible page
+        st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, step=1,
+                        key=jump_key, on_change=_handle_jump)
+    with next_col:
+        st.button("Next ➡️", key=f"{view_key}_next", on_click=_go_to_page, args=(page + 1,),
+                  disabled=page >= num_pages - 1 or next_cursor is None, use_container_width=True)
+
 # Displays a list of books as expandable cards with edit/update/delete buttons
 def display_books_table_edit(books):
     if not books:
@@ -995,7 +1233,7 @@ def display_books_table_edit(books):
                 st.markdown(f"Genre: {book.get('genre', 'None')}")
                 rating_display = f"{book.get('rating')} ⭐" if book.get('rating') not in [None, 'None'] else "None"
                 st.markdown(f"Rating: {rating_display}")
-                progress_float = float(book.get("progress_percent", 0.0))
+                progress_float = book.get("progress_percent") or 0.0
                 st.progress(progress_float / 100, text=f"Progress: {book.get('pages_read', 0)}/{book.get('total_pages', 1)} pages ({progress_float:.1f}%)")
             with col2: # Metadata
                 st.markdown(f"Book ID: `{book_id}`")
@@ -1035,7 +1273,7 @@ def display_books_table(books):
                 st.markdown(f"Genre: {book.get('genre', 'None')}")
                 rating_display = f"{book.get('rating')} ⭐" if book.get('rating') not in [None, 'None'] else "None"
                 st.markdown(f"Rating: {rating_display}")
-                progress_float = float(book.get("progress_percent", 0.0))
+                progress_float = book.get("progress_percent") or 0.0
                 st.progress(progress_float / 100, text=f"Progress: {book.get('pages_read', 0)}/{book.get('total_pages', 1)} pages ({progress_float:.1f}%)")
             with col2: # Metadata
                 st.markdown(f"Book ID: `{book_id}`")
@@ -1044,27 +1282,68 @@ def display_books_table(books):
                 if tags_list:
                     st.markdown("\n".join([f"- `{tag}`" for tag in tags_list]))
 
+# Page handlers by navigation value, each timed by the metrics registry
+PAGE_HANDLERS = {
+    name: instrument_page(name, handler)
+    for name, handler in [
+        ("dashboard", show_dashboard), ("add", show_add_book), ("edit", show_edit_book),
+        ("delete", show_delete_book), ("search", show_search_books), ("filter", show_filter_books),
+        ("history", show_reading_history), ("recommend", show_recommendations),
+        ("progress", show_update_progress), ("deadlines", show_view_deadlines),
+        ("archive", show_archive_book), ("diagnostics", show_diagnostics)
+    ]
+}
+timed_login = instrument_page("login", show_login)
+
+# Fetch the dashboard's library and stats plus the recommendations concurrently right after login
+def warm_up_session(user_id):
+    started = time.perf_counter()
+
+    # Dual table layout: one query of the user's partition covers the dashboard
+    bundle = load_user_bundle(user_id) if dual_layout_enabled() else None
+    if bundle is not None:
+        st.session_state.prefetched_dashboard = {"books": bundle["books"], "stats": bundle["stats"]}
+        # The same read carries the recommendations, so the recommendations page starts from a warm cache
+        seed_recommendations(user_id, bundle["recommendations"])
+    else:
+        ctx = get_script_run_ctx()  # Lets the cached recommendation loader run in worker threads
+        with ThreadPoolExecutor(max_workers=3, initializer=add_script_run_ctx, initargs=(None, ctx)) as pool:
+            futures = {
+                "books": pool.submit(get_user_books, user_id, DASHBOARD_FIELDS),
+                "stats": pool.submit(get_user_stats, user_id),
+                "recommendations": pool.submit(load_recommendations, user_id)
+            }
+            prefetched = {}
+            for name, future in futures.items():
+                try:
+                    prefetched[name] = future.result()
+                except Exception as e:
+                    # The page falls back to fetching this itself
+                    print(f"Error prefetching {name}...")
+
+        # The dashboard consumes the library and stats on its first render
+        st.session_state.prefetched_dashboard = {k: prefetched[k] for k in ("books", "stats") if k in prefetched}
+    elapsed = time.perf_counter() - started
+    registry.observe("session_warmup_duration_ms", elapsed * 1000,
+                     help_text="Time spent prefetching a session's data after login")
+    return elapsed
+
 # Main function to control the application flow
 def main():
-    # Show a loading screen during login
+    # Show a loading screen during login while the user's data is prefetched
     if st.session_state.get("show_loading_screen", False):
         st.markdown('<div class="loading-text">🔄 Logging you in, please wait...</div>', unsafe_allow_html=True)
         with st.spinner("Loading Dashboard..."):
-            import time
-            time.sleep(2.5) # Simulate loading time
+            st.session_state.warmup_seconds = warm_up_session(st.session_state.user_id)
         st.session_state.show_loading_screen = False
         st.rerun()
-    # Show a logout screen during logout
+    # Clear the session on logout
     elif st.session_state.get("show_logout_screen", False):
-        st.markdown('<div class="loading-text">👋 Logging you out, see you soon...</div>', unsafe_allow_html=True)
-        with st.spinner("Clearing session..."):
-            import time
-            time.sleep(2) # Simulate clearing session
         st.session_state.clear()
         st.rerun()
     # If not logged in, show the login page
     elif not st.session_state.logged_in:
-        show_login()
+        timed_login()
     # If logged in, show the main application
     else:
         main_app()
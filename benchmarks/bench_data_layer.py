@@ -0,0 +1,246 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Benchmarks always run against the in-process backend so results are deterministic and network-free
+os.environ["SMARTREADS_STORAGE_BACKEND"] = "local"
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from config.aws_config import get_dynamodb_resource
+from db_module.local_backend import clear_local_data
+from db_module.dynamo_handler import books_table, search_books, filter_books, get_user_history, VERSION_ATTRIBUTE
+from db_module.filter_engine import status_keys_complete
+from db_module.stats_handler import rebuild_user_stats, get_user_stats
+from db_module.codec import encode_progress, encode_status_key, STATUS_KEY_ATTRIBUTE
+from db_module.tag_index import normalize_tags, rebuild_tag_index
+from reading_tracker.tracker import get_all_books_for_user
+from dashboard.dashboard_cli import compute_dashboard_metrics, DASHBOARD_FIELDS
+from dashboard.report_generator import generate_pdf_summary
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+
+# Vocabulary for synthetic books
+GENRES = ["Fantasy", "Science Fiction", "Mystery", "Romance", "Thriller", "Classics",
+          "Historical Fiction", "Nonfiction", "Horror", "Young Adult", "Biography", "Poetry"]
+STATUSES = ["to-read", "reading", "completed"]
+STATUS_WEIGHTS = [2, 1, 3]
+TITLE_WORDS = ["Shadow", "River", "Crown", "Garden", "Empire", "Silent", "Winter", "Glass",
+               "Night", "Forgotten", "Iron", "Golden", "Storm", "Secret", "House", "Star"]
+AUTHOR_FIRST = ["Anne", "Jorge", "Mei", "Tomas", "Priya", "Ian", "Lucia", "Kwame", "Sofia", "Hiro"]
+AUTHOR_LAST = ["Marlowe", "Okafor", "Lindqvist", "Reyes", "Tanaka", "Brennan", "Novak", "Haddad"]
+TAGS = ["book-club", "favorite", "reread", "gift", "audiobook", "library", "kindle"]
+
+# Build one synthetic book shaped like the items written by add_book_to_db
+def make_book(rng, user_id, number, start):
+    total_pages = rng.randint(80, 900)
+    status = rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+    if status == "completed":
+        pages_read = total_pages
+    elif status == "to-read":
+        pages_read = 0
+    else:
+        pages_read = rng.randint(1, total_pages - 1)
+
+    added = start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+    rating = rng.choice([None, 1, 2, 3, 4, 5])
+    item = {
+        "user_id": user_id,
+        "book_id": f"B{number}",
+        "title": f"The {rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {number}",
+        "author": f"{rng.choice(AUTHOR_FIRST)} {rng.choice(AUTHOR_LAST)}",
+        "genre": rng.choice(GENRES),
+        "status": status,
+        STATUS_KEY_ATTRIBUTE: encode_status_key(user_id, status),
+        "tags": normalize_tags(rng.sample(TAGS, rng.randint(0, 3))),
+        "total_pages": total_pages,
+        "pages_read": pages_read,
+        "progress_bp": encode_progress(pages_read, total_pages),
+        "timestamp": added.strftime("%Y-%m-%d %H:%M:%S"),
+        "archived": rng.random() < 0.05,
+        VERSION_ATTRIBUTE: 1
+    }
+    if rating:
+        item["rating"] = rating
+    if status == "completed":
+        item["completed_at"] = (added + timedelta(days=rng.randint(1, 60))).strftime("%Y-%m-%d %H:%M:%S")
+    if rng.random() < 0.2:
+        item["deadline"] = (added + timedelta(days=rng.randint(7, 400))).strftime("%Y-%m-%d")
+    return item
+
+# Load a synthetic user with the given number of books and build their stats rollup and tag index;
+# returns the generated items so each operation's result size can be checked
+def load_user(rng, user_id, num_books, first_book_number):
+    start = datetime(2023, 1, 1)
+    items = [make_book(rng, user_id, first_book_number + offset, start) for offset in range(num_books)]
+    with books_table.batch_writer() as writer:
+        for item in items:
+            writer.put_item(Item=item)
+    rebuild_user_stats(user_id)
+    rebuild_tag_index(user_id)
+    status_keys_complete(user_id)  # Every book carries the key, this only records that outside the timed runs
+    return items
+
+def percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+# Time an operation repeatedly (within a time budget) and collect latency, memory and capacity figures
+def measure(operation, repeat, budget, expected=None):
+    resource = get_dynamodb_resource()
+    resource.reset_capacity()
+
+    samples = []
+    result = None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = operation()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if time.perf_counter() - started > budget:
+            break
+    capacity = resource.capacity_totals()
+
+    # Peak memory is measured on a separate run, tracemalloc slows the timed runs down
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = len(samples)
+    ordered = sorted(samples)
+    returned = len(result) if isinstance(result, (list, bytes)) else None
+    return {
+        "runs": runs,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p90": round(percentile(ordered, 0.90), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "max": round(ordered[-1], 3),
+            "mean": round(sum(ordered) / runs, 3)
+        },
+        "peak_memory_kb": round(peak / 1024, 1),
+        "read_units_per_call": round(sum(c["read_units"] for c in capacity.values()) / runs, 2),
+        "requests_per_call": round(sum(c["calls"] for c in capacity.values()) / runs, 2),
+        "items_returned": returned,
+        "items_expected": expected,
+        "truncated": expected is not None and returned != expected
+    }
+
+# How many books each list operation must return for the generated items, so a read that stops after
+# one page is reported instead of being timed as if it were complete
+def expected_counts(items):
+    visible = [item for item in items if not item["archived"]]
+    return {
+        "get_all_books_for_user": len(items),
+        "search_books": sum(1 for item in items if "Shadow" in item["title"] or "Shadow" in item["author"]),
+        "filter_books": sum(1 for item in items if item["genre"] == "Fantasy" and item["status"] == "completed"),
+        "get_user_history": len(visible)
+    }
+
+# The data-layer calls and dashboard pipeline stages under test for one user
+def build_operations(user_id):
+    dashboard_books = get_all_books_for_user(user_id, fields=DASHBOARD_FIELDS)
+    stats = get_user_stats(user_id)
+    metrics, top_rated_books, genre_counts = compute_dashboard_metrics(dashboard_books, stats)
+    return {
+        "get_all_books_for_user": lambda: get_all_books_for_user(user_id),
+        "search_books": lambda: search_books(user_id, "Shadow"),
+        "filter_books": lambda: filter_books(user_id, genre="Fantasy", status="completed"),
+        "get_user_history": lambda: get_user_history(user_id),
+        "dashboard_aggregation": lambda: compute_dashboard_metrics(dashboard_books, stats),
+        "generate_pdf_summary": lambda: generate_pdf_summary(
+            "Benchmark", dashboard_books, metrics, top_rated_books, genre_counts)
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+def run_benchmarks(sizes, repeat, budget, seed, operations=None):
+    clear_local_data()
+    rng = random.Random(seed)
+    results = []
+    next_book_number = 100000
+    for i, size in enumerate(sizes):
+        user_id = f"U{9000 + i}"
+        load_started = time.perf_counter()
+        items = load_user(rng, user_id, size, next_book_number)
+        next_book_number += size
+        print(f"Loaded {size} books for {user_id} in {time.perf_counter() - load_started:.1f}s", file=sys.stderr)
+
+        expected = expected_counts(items)
+        for name, operation in build_operations(user_id).items():
+            if operations and name not in operations:
+                continue
+            result = measure(operation, repeat, budget, expected.get(name))
+            results.append({"books": size, "operation": name, **result})
+            print(f"  {name:<24} p50={result['latency_ms']['p50']:>10.3f} ms  "
+                  f"RCU/call={result['read_units_per_call']}", file=sys.stderr)
+            if result["truncated"]:
+                print(f"  WARNING: {name} returned {result['items_returned']} of {result['items_expected']} books",
+                      file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "budget_seconds": budget
+        },
+        "results": results
+    }
+
+# Print p50 latency and read-unit ratios against an earlier results file
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["books"], r["operation"]): r for r in baseline["results"]}
+    print(f"{'books':>7}  {'operation':<24} {'p50 old':>10} {'p50 new':>10} {'ratio':>7} {'RCU old':>9} {'RCU new':>9}")
+    for result in current["results"]:
+        old = previous.get((result["books"], result["operation"]))
+        if not old:
+            continue
+        old_p50, new_p50 = old["latency_ms"]["p50"], result["latency_ms"]["p50"]
+        ratio = new_p50 / old_p50 if old_p50 else float("inf")
+        print(f"{result['books']:>7}  {result['operation']:<24} {old_p50:>10.3f} {new_p50:>10.3f} {ratio:>6.2f}x "
+              f"{old['read_units_per_call']:>9} {result['read_units_per_call']:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data access layer and dashboard pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Library sizes to generate")
+    parser.add_argument("--repeat", type=int, default=20, help="Maximum timed runs per operation")
+    parser.add_argument("--budget", type=float, default=5.0, help="Time budget in seconds per operation")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic libraries")
+    parser.add_argument("--operations", nargs="+", help="Only run these operations")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.budget, args.seed, args.operations)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+# Run with e.g. `python benchmarks/bench_data_layer.py --sizes 10 1000 --output bench.json`
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+import csv
+import json
+import threading
+from array import array
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+CATALOG_JSON = os.path.join(DATA_DIR, 'book_dataset.json')
+CATALOG_CSV = os.path.join(DATA_DIR, 'book_dataset.csv')
+
+# One catalog entry; author and genre strings are interned and shared between entries
+class CatalogBook:
+    __slots__ = ("book_id", "title", "author", "genres", "avg_rating")
+
+    def __init__(self, book_id, title, author, genres, avg_rating):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self.genres = genres
+        self.avg_rating = avg_rating
+
+    def to_dict(self):
+        return {"book_id": self.book_id, "title": self.title, "author": self.author,
+                "genres": list(self.genres), "avg_rating": self.avg_rating}
+
+    def __repr__(self):
+        return f"CatalogBook({self.book_id}, {self.title!r}, {self.author!r})"
+
+def normalize_title(title):
+    return " ".join(str(title).casefold().split())
+
+# Read-only catalog of the book dataset, built once per process and shared by every session
+class Catalog:
+    def __init__(self, rows):
+        self.books = []  # Position in this list is the catalog book_id
+        self.ratings = array('f')  # Avg_Rating per book_id, for vectorized scoring
+        self.title_index = {}  # Normalized title -> book_id, or tuple of book_ids for duplicate titles
+        self.genre_index = {}  # Genre -> array of book_ids
+        self.author_index = {}  # Author -> array of book_ids
+
+        genre_lists = {}
+        author_lists = {}
+        for row in rows:
+            book_id = len(self.books)
+            author = sys.intern(str(row["Author"]).strip())
+            genres = tuple(sys.intern(str(genre).strip()) for genre in row["Genres"] if str(genre).strip())
+            rating = float(row["Avg_Rating"] or 0)
+            self.books.append(CatalogBook(book_id, str(row["Book"]).strip(), author, genres, rating))
+            self.ratings.append(rating)
+
+            key = normalize_title(row["Book"])
+            existing = self.title_index.get(key)
+            if existing is None:
+                self.title_index[key] = book_id
+            else:
+                self.title_index[key] = (existing if isinstance(existing, tuple) else (existing,)) + (book_id,)
+            author_lists.setdefault(author, []).append(book_id)
+            for genre in genres:
+                genre_lists.setdefault(genre, []).append(book_id)
+
+        # Compact id lists once loading is done
+        self.genre_index = {genre: array('I', ids) for genre, ids in genre_lists.items()}
+        self.author_index = {author: array('I', ids) for author, ids in author_lists.items()}
+
+    def __len__(self):
+        return len(self.books)
+
+    def get(self, book_id):
+        try:
+            return self.books[int(book_id)]
+        except (IndexError, ValueError, TypeError):
+            return None
+
+    # Case- and whitespace-insensitive exact title match (several books may share a title)
+    def find_by_title(self, title):
+        ids = self.title_index.get(normalize_title(title))
+        if ids is None:
+            return []
+        return [self.books[i] for i in (ids if isinstance(ids, tuple) else (ids,))]
+
+    def find_by_genre(self, genre, limit=None):
+        ids = self.genre_index.get(genre)
+        if ids is None:
+            # Fall back to a case-insensitive genre name
+            wanted = str(genre).casefold()
+            ids = next((v for k, v in self.genre_index.items() if k.casefold() == wanted), array('I'))
+        ids = ids if limit is None else ids[:limit]
+        return [self.books[i] for i in ids]
+
+    def find_by_author(self, author):
+        return [self.books[i] for i in self.author_index.get(str(author).strip(), ())]
+
+    def genres(self):
+        return sorted(self.genre_index, key=lambda genre: len(self.genre_index[genre]), reverse=True)
+
+    # Rough resident size of the catalog structures, shown on the diagnostics page
+    def memory_bytes(self):
+        seen = set()
+
+        def size(obj):
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            return sys.getsizeof(obj)
+
+        total = size(self.books) + size(self.ratings) + size(self.title_index)
+        total += size(self.genre_index) + size(self.author_index)
+        for book in self.books:
+            total += size(book) + size(book.title) + size(book.author) + size(book.genres)
+            total += sum(size(genre) for genre in book.genres)
+        total += sum(size(key) for key in self.title_index)
+        total += sum(size(ids) for ids in self.genre_index.values())
+        total += sum(size(ids) for ids in self.author_index.values())
+        return total
+
+# Load the dataset rows from the JSON export, or the CSV when the JSON is missing
+def load_catalog_rows(json_path=CATALOG_JSON, csv_path=CATALOG_CSV):
+    if os.path.exists(json_path):
+        with open(json_path, encoding="utf-8") as f:
+            return json.load(f)
+    rows = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                row["Genres"] = ast.literal_eval(row["Genres"])
+            except (ValueError, SyntaxError):
+                row["Genres"] = []
+            rows.append(row)
+    return rows
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+# Process-wide catalog singleton; every Streamlit session shares the same instance
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                try:
+                    _catalog = Catalog(load_catalog_rows())
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Error loading book catalog...")
+                    return Catalog([])
+    return _catalog
+
+def is_catalog_loaded():
+    return _catalog is not None
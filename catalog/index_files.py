@@ -0,0 +1,198 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import hashlib
+import mmap
+import struct
+import threading
+import time
+
+import numpy as np
+
+from catalog.catalog import Catalog, load_catalog_rows, CATALOG_CSV, CATALOG_JSON, DATA_DIR
+
+INDEX_PATH = os.path.join(DATA_DIR, 'book_catalog.idx')
+
+# File layout: a fixed header, a table of named sections, then the sections themselves, each
+# 8-byte aligned so they can be viewed in place as NumPy arrays over a read-only mmap.
+INDEX_MAGIC = b"SRINDEX\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII32s")  # magic, format version, section count, dataset SHA-256
+SECTION = struct.Struct("<16s4sQQ")  # name, dtype, byte offset, item count
+DTYPES = {"u1": np.uint8, "u4": np.uint32, "u8": np.uint64, "f4": np.float32}
+
+# The dataset file the catalog (and so the index) is loaded from
+def dataset_path():
+    return CATALOG_JSON if os.path.exists(CATALOG_JSON) else CATALOG_CSV
+
+# Content hash of the dataset, stored in the header to tell whether an index file is stale
+def dataset_hash(path=None):
+    digest = hashlib.sha256()
+    with open(path or dataset_path(), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+# Variable-length strings as one UTF-8 blob plus an offsets array (offsets[i]:offsets[i + 1])
+def pack_strings(strings):
+    encoded = [str(s).encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+# Read-only sequence over packed strings, decoded on access; bisect works on it directly
+class PackedStrings:
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+# One packed bitset per genre: row g of the (genres x words) uint64 matrix has bit b set when book b has genre g
+def build_genre_sections(catalog):
+    genres = catalog.genres()
+    words = (len(catalog) + 63) // 64
+    bits = np.zeros((len(genres), words * 64), dtype=bool)
+    for row, genre in enumerate(genres):
+        bits[row, np.frombuffer(catalog.genre_index[genre], dtype=np.uint32)] = True
+    bitmaps = np.packbits(bits, axis=1, bitorder="little").view(np.uint64) if genres else np.zeros((0, words), dtype=np.uint64)
+    names_blob, name_offsets = pack_strings(genres)
+    return {"genre_names": names_blob, "genre_name_offs": name_offsets, "genre_bitmaps": bitmaps.ravel()}
+
+# Write sections atomically: readers either see the old file or the complete new one
+def write_index(path, sections, content_hash):
+    table_size = HEADER.size + SECTION.size * len(sections)
+    offset = (table_size + 7) & ~7
+    entries = []
+    for name, values in sections.items():
+        values = np.ascontiguousarray(values)
+        dtype = next(code for code, dtype in DTYPES.items() if values.dtype == dtype)
+        entries.append((name, dtype, offset, values))
+        offset = (offset + values.nbytes + 7) & ~7
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, FORMAT_VERSION, len(entries), content_hash))
+        for name, dtype, start, values in entries:
+            f.write(SECTION.pack(name.encode("ascii"), dtype.encode("ascii"), start, values.size))
+        for name, dtype, start, values in entries:
+            f.write(b"\0" * (start - f.tell()))
+            f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+# An index file mapped read-only; sections are zero-copy views shared through the page cache
+class MappedIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.content_hash = HEADER.unpack_from(self.buffer, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a catalog index file")
+        self.version = version
+        self.sections = {}
+        for i in range(count if version == FORMAT_VERSION else 0):
+            name, dtype, offset, length = SECTION.unpack_from(self.buffer, HEADER.size + i * SECTION.size)
+            self.sections[name.rstrip(b"\0").decode("ascii")] = (DTYPES[dtype.rstrip(b"\0").decode("ascii")], offset, length)
+
+    def is_current(self, content_hash):
+        return self.version == FORMAT_VERSION and self.content_hash == content_hash
+
+    def section(self, name):
+        dtype, offset, length = self.sections[name]
+        return np.frombuffer(self.buffer, dtype=dtype, count=length, offset=offset)
+
+    def strings(self, name, offsets_name):
+        return PackedStrings(self.section(name), self.section(offsets_name))
+
+    def genre_bitmaps(self):
+        genres = self.strings("genre_names", "genre_name_offs")
+        return genres, self.section("genre_bitmaps").reshape(len(genres), -1)
+
+# Build every index section from the current dataset and write the file
+def build_index_file(path=INDEX_PATH):
+    from catalog.search_engine import build_search_sections  # search_engine reads the file through this module
+
+    content_hash = dataset_hash()
+    catalog = Catalog(load_catalog_rows())
+    sections = {"doc_count": np.array([len(catalog)], dtype=np.uint64)}
+    sections.update(build_search_sections(catalog))
+    sections.update(build_genre_sections(catalog))
+    write_index(path, sections, content_hash)
+    return len(catalog)
+
+_mapped_index = None
+_rebuild_thread = None
+_rebuild_failed = False
+_index_lock = threading.Lock()
+
+def _rebuild_in_background(path):
+    global _mapped_index, _rebuild_failed
+    try:
+        started = time.perf_counter()
+        build_index_file(path)
+        index = MappedIndex(path)
+        with _index_lock:
+            _mapped_index = index
+        print(f"✅ Catalog index rebuilt in {time.perf_counter() - started:.2f}s!")
+    except Exception as e:
+        _rebuild_failed = True  # Not retried on every lookup; run the CLI to rebuild
+        print(f"Error rebuilding catalog index...")
+
+# Process-wide mapped index file. A missing or stale file (built from another dataset or format)
+# is rebuilt on a background thread; None is returned until the rebuilt file is ready.
+def get_mapped_index(path=INDEX_PATH):
+    global _mapped_index, _rebuild_thread
+    if _mapped_index is not None:
+        return _mapped_index
+    with _index_lock:
+        if _mapped_index is not None or _rebuild_failed or (_rebuild_thread is not None and _rebuild_thread.is_alive()):
+            return _mapped_index
+        try:
+            index = MappedIndex(path)
+            if index.is_current(dataset_hash()):
+                _mapped_index = index
+                return index
+            print(f"Catalog index is stale, rebuilding...")
+        except (OSError, ValueError, KeyError, struct.error):
+            print(f"Catalog index missing or unreadable, rebuilding...")
+        _rebuild_thread = threading.Thread(target=_rebuild_in_background, args=(path,), daemon=True)
+        _rebuild_thread.start()
+    return None
+
+# Build the index files with `python -m catalog.index_files` (data/convert.py also does this)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or check the catalog index file.")
+    parser.add_argument("--check", action="store_true", help="Only report whether the index is current")
+    parser.add_argument("--path", default=INDEX_PATH, help="Index file location")
+    args = parser.parse_args()
+
+    if args.check:
+        try:
+            current = MappedIndex(args.path).is_current(dataset_hash())
+        except (OSError, ValueError, KeyError, struct.error):
+            current = False
+        print("✅ Catalog index is current!" if current else "⚠️ Catalog index is missing or stale!")
+        sys.exit(0 if current else 1)
+
+    started = time.perf_counter()
+    count = build_index_file(args.path)
+    size = os.path.getsize(args.path) / (1024 * 1024)
+    print(f"✅ Indexed {count} books into {args.path} ({size:.1f} MB) in {time.perf_counter() - started:.2f}s!")
@@ -0,0 +1,225 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import bisect
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from catalog.catalog import get_catalog
+from catalog.index_files import get_mapped_index, pack_strings
+
+# BM25 parameters and the weight of each field in a book's term frequencies (BM25F style)
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {"title": 1.0, "author": 0.75}
+
+PREFIX_WEIGHT = 0.85  # Completions of the word being typed score below exact matches of it
+TYPO_WEIGHT = 0.6  # Spelling corrections score below both
+MAX_PREFIX_EXPANSIONS = 24  # Most frequent completions kept per prefix
+MIN_TYPO_LENGTH = 4  # Shorter words are too ambiguous to correct
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Lowercase, accent-free word tokens ("Gabriel García Márquez" -> gabriel, garcia, marquez)
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text or "").casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_PATTERN.findall(text)
+
+# Every string one deletion away from a word, the keys of the typo lookup (symmetric delete)
+def deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+# Stable 64-bit key of a typo-lookup string, so the lookup can be stored as sorted arrays
+def deletion_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+# Index file sections for title/author search (see catalog/index_files.py). Postings are CSR-style:
+# the postings of term t are doc_ids/impacts[post_offs[t]:post_offs[t + 1]], where the impact is
+# the document's precomputed BM25 term-frequency component, so a query is a few vectorized adds.
+def build_search_sections(catalog):
+    field_postings = {}  # term -> {book_id: weighted term frequency}
+    lengths = np.zeros(len(catalog), dtype=np.float32)
+    for book in catalog.books:
+        for field, weight in FIELD_WEIGHTS.items():
+            tokens = tokenize(getattr(book, field))
+            lengths[book.book_id] += weight * len(tokens)
+            for token in tokens:
+                postings = field_postings.setdefault(token, {})
+                postings[book.book_id] = postings.get(book.book_id, 0.0) + weight
+
+    average_length = float(lengths.mean()) if len(lengths) else 1.0
+    norms = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / (average_length or 1.0))
+    terms = sorted(field_postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.uint32)
+    doc_ids, impacts = [np.zeros(0, dtype=np.uint32)], [np.zeros(0, dtype=np.float32)]
+    deletes = []
+    for term_id, term in enumerate(terms):
+        postings = field_postings[term]
+        ids = np.fromiter(postings, dtype=np.uint32, count=len(postings))
+        frequencies = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+        doc_ids.append(ids)
+        impacts.append((frequencies * (BM25_K1 + 1.0) / (frequencies + norms[ids])).astype(np.float32))
+        offsets[term_id + 1] = offsets[term_id] + len(postings)
+        if len(term) >= MIN_TYPO_LENGTH:
+            deletes.extend((deletion_hash(key), term_id) for key in deletions(term) | {term})
+
+    deletes.sort()
+    terms_blob, term_offsets = pack_strings(terms)
+    return {
+        "terms": terms_blob, "term_offs": term_offsets, "post_offs": offsets,
+        "doc_ids": np.concatenate(doc_ids), "impacts": np.concatenate(impacts),
+        "delete_hashes": np.array([key for key, _ in deletes], dtype=np.uint64),
+        "delete_terms": np.array([term_id for _, term_id in deletes], dtype=np.uint32)
+    }
+
+# BM25 search over the index file sections; every array is a view over the mapped file
+class SearchIndex:
+    def __init__(self, terms, offsets, doc_ids, impacts, doc_count, delete_hashes, delete_terms):
+        self.terms = terms  # Sorted vocabulary; the position is the term id
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.doc_count = doc_count
+        self.delete_hashes = delete_hashes
+        self.delete_terms = delete_terms
+        self.doc_frequencies = np.diff(offsets)
+        frequencies = self.doc_frequencies.astype(np.float32)
+        self.idf = np.log(1.0 + (doc_count - frequencies + 0.5) / (frequencies + 0.5)).astype(np.float32)
+
+    @classmethod
+    def from_mapped(cls, mapped):
+        return cls(mapped.strings("terms", "term_offs"), mapped.section("post_offs"), mapped.section("doc_ids"),
+                   mapped.section("impacts"), int(mapped.section("doc_count")[0]),
+                   mapped.section("delete_hashes"), mapped.section("delete_terms"))
+
+    # Term id of a vocabulary word, or None
+    def term_id(self, word):
+        position = bisect.bisect_left(self.terms, word)
+        if position < len(self.terms) and self.terms[position] == word:
+            return position
+        return None
+
+    # --- Lookup ---
+    def postings(self, term_id):
+        start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+        return self.doc_ids[start:end], self.impacts[start:end]
+
+    # Most frequent vocabulary terms starting with a prefix
+    def complete(self, prefix, limit=MAX_PREFIX_EXPANSIONS):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\uffff", lo=start)
+        if end - start <= limit:
+            return list(range(start, end))
+        frequencies = self.doc_frequencies[start:end]
+        return (start + np.argpartition(-frequencies, limit - 1)[:limit]).tolist()
+
+    # Vocabulary terms within one edit (delete, insert, substitute or transpose) of a word
+    def corrections(self, word):
+        matches = set()
+        for key in deletions(word) | {word}:
+            key_hash = np.uint64(deletion_hash(key))
+            start = np.searchsorted(self.delete_hashes, key_hash, side="left")
+            end = np.searchsorted(self.delete_hashes, key_hash, side="right")
+            matches.update(self.delete_terms[start:end].tolist())
+        return sorted(matches)
+
+    # Weighted vocabulary terms a query word stands for: itself, its completions when it is
+    # still being typed, and spelling corrections when it matches nothing
+    def expand(self, word, is_prefix=False):
+        expansions = {}
+        term_id = self.term_id(word)
+        if term_id is not None:
+            expansions[term_id] = 1.0
+        if is_prefix:
+            for completion in self.complete(word):
+                expansions.setdefault(completion, PREFIX_WEIGHT)
+        if not expansions and len(word) >= MIN_TYPO_LENGTH:
+            for correction in self.corrections(word):
+                expansions[correction] = TYPO_WEIGHT
+        return expansions
+
+    # Top `limit` (book_id, score) pairs for a free-text query; the last word is treated as a prefix
+    def search(self, query, limit=10, prefix=True):
+        words = tokenize(query)
+        if not words or not self.doc_count:
+            return []
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        word_scores = np.empty(self.doc_count, dtype=np.float32)
+        for position, word in enumerate(words):
+            expansions = self.expand(word, is_prefix=prefix and position == len(words) - 1)
+            if not expansions:
+                continue
+            # Completions often have a higher IDF than the word typed; when that word is itself in the
+            # vocabulary, they are capped below its weakest match so an exact match always ranks first
+            exact_id = self.term_id(word) if len(expansions) > 1 else None
+            cap = np.inf
+            if exact_id is not None:
+                ids, impacts = self.postings(exact_id)
+                cap = float((impacts * self.idf[exact_id]).min()) * PREFIX_WEIGHT
+            # A word counts once per book, through its best-scoring expansion
+            word_scores.fill(0.0)
+            for term_id, weight in expansions.items():
+                ids, impacts = self.postings(term_id)
+                contributions = impacts * (self.idf[term_id] * weight)
+                if term_id != exact_id:
+                    contributions = np.minimum(contributions, cap)
+                np.maximum.at(word_scores, ids, contributions)
+            scores += word_scores
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(book_id), float(scores[book_id])) for book_id in matched]
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+# Process-wide search index over the mapped index file; None while the file is being (re)built
+def get_search_index():
+    global _search_index
+    mapped = get_mapped_index()
+    if mapped is None:
+        return None
+    with _search_index_lock:
+        if _search_index is None or _search_index[0] is not mapped:
+            _search_index = (mapped, SearchIndex.from_mapped(mapped))
+    return _search_index[1]
+
+# Catalog books best matching a query, for the add-book autocomplete; None while the index is not ready
+def search_catalog(query, limit=10):
+    index = get_search_index()
+    if index is None:
+        return None
+    catalog = get_catalog()
+    return [catalog.get(book_id) for book_id, _ in index.search(query, limit)]
+
+# Try a query with `python -m catalog.search_engine <words>` (build the index with `python -m catalog.index_files`)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catalog full-text search.")
+    parser.add_argument("query", nargs="+", help="Search the catalog for these words")
+    args = parser.parse_args()
+
+    index = get_search_index()
+    if index is None:
+        print("⚠️ Catalog index is missing or stale, build it with `python -m catalog.index_files`!")
+        sys.exit(1)
+    started = time.perf_counter()
+    results = index.search(" ".join(args.query))
+    elapsed = (time.perf_counter() - started) * 1000
+    for book_id, score in results:
+        book = get_catalog().get(book_id)
+        print(f"{score:7.3f}  {book.title} - {book.author}")
+    print(f"{len(results)} result(s) in {elapsed:.2f} ms")
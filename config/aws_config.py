@@ -1,7 +1,46 @@
 import boto3
 import os
 
+# Storage backend selected via SMARTREADS_STORAGE_BACKEND ("dynamodb" by default, or "local")
+def get_storage_backend():
+    return os.environ.get("SMARTREADS_STORAGE_BACKEND", "dynamodb").strip().lower()
+
+# Table layout: "multi" (default) uses the per-entity tables only; "dual" also keeps the single-table
+# layout (db_module/single_table.py) in sync and reads login and dashboard data from it when migrated
+def get_table_layout():
+    return os.environ.get("SMARTREADS_TABLE_LAYOUT", "multi").strip().lower()
+
+# Where derived views (stats rollup, single-table mirror, recommendations) are updated after a book write:
+# "sync" (default) runs them inside the write, "local" hands them to an in-process background queue and
+# "streams" leaves them to the Streams consumer (`python db_module/change_feed.py --consume`)
+CHANGE_FEED_MODES = ("sync", "local", "streams")
+
+def get_change_feed_mode():
+    mode = os.environ.get("SMARTREADS_CHANGE_FEED", "sync").strip().lower()
+    if mode not in CHANGE_FEED_MODES:
+        raise ValueError(f"Unknown change feed mode '{mode}', expected one of: {', '.join(CHANGE_FEED_MODES)}")
+    return mode
+
+# Per-call latency/capacity metrics are on unless SMARTREADS_INSTRUMENTATION is set to "off"
+def instrumentation_enabled():
+    return os.environ.get("SMARTREADS_INSTRUMENTATION", "on").strip().lower() not in ("off", "0", "false")
+
 def get_dynamodb_resource():
+    backend = get_storage_backend()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}', expected one of: {', '.join(STORAGE_BACKENDS)}")
+    resource = STORAGE_BACKENDS[backend]()
+    if instrumentation_enabled():
+        from monitoring.dynamo_instrumentation import instrument_resource
+        resource = instrument_resource(resource)
+    return resource
+
+# In-process stand-in with the same Table API, for benchmarks and offline runs
+def get_local_resource():
+    from db_module.local_backend import get_local_dynamodb_resource
+    return get_local_dynamodb_resource()
+
+def get_aws_session():
     # Read AWS credentials and region from environment variables
     aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
     aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
@@ -24,5 +63,13 @@ def get_dynamodb_resource():
         print("Using default AWS CLI credentials...")
         # Create session with default AWS CLI configuration
         session = boto3.Session(region_name=aws_region)
+    return session
+
+def get_aws_resource():
+    return get_aws_session().resource('dynamodb')  # Return DynamoDB resource
 
-    return session.resource('dynamodb')  # Return DynamoDB resource
\ No newline at end of file
+# Every backend returns an object exposing the boto3 DynamoDB resource API (Table, create_table, meta.client)
+STORAGE_BACKENDS = {
+    "dynamodb": get_aws_resource,
+    "local": get_local_resource
+}
\ No newline at end of file
@@ -3,31 +3,18 @@ import pandas as pd
 from datetime import date
 import plotly.express as px
 
-from reading_tracker.tracker import get_all_books_for_user
+from reading_tracker.library_hub import get_user_books
+from db_module.stats_handler import get_user_stats
 from dashboard.report_generator import generate_pdf_summary
+from db_module.book_record import BookColumns
 
-def show_dashboard():
-    st.title("📊 Dashboard")
+# Attributes the dashboard metrics, charts and PDF summary actually use
+DASHBOARD_FIELDS = ["title", "author", "genre", "rating", "status", "timestamp", "completed_at", "deadline"]
 
-    # Custom CSS styling for buttons and layout
-    st.markdown("""
-        <style>
-            .stDownloadButton>button { display: block; margin: 0 auto; }
-            .st-emotion-cache-z5fcl4 { border-left: 1px solid #3c3d44; padding-left: 20px; }
-            .calendar-container {
-                background: #f8f9fa;
-                border-radius: 10px;
-                padding: 20px;
-                margin: 10px 0;
-            }
-        </style>
-        """, unsafe_allow_html=True)
-
-    books = get_all_books_for_user(st.session_state.user_id)  # Fetch user's books
-    df = pd.DataFrame(books)  # Convert to DataFrame for easier processing
-
-    # --- 1. Key Metrics Section ---
-    st.subheader("🚀 Reading Snapshot")
+# Compute the snapshot metrics, top rated books and genre counts shown on the dashboard
+def compute_dashboard_metrics(books, stats=None):
+    # Typed columns straight from the book records (numbers and dates are already parsed)
+    df = BookColumns.from_books(books).to_dataframe()
 
     # Initialize metric values
     total_books = 0
@@ -38,19 +25,34 @@ def show_dashboard():
     avg_books_per_month = 0.0
     top_rated_books = pd.DataFrame()
 
-    # --- Compute metrics if books exist ---
+    # Headline counts come straight from the stats rollup
+    if stats:
+        total_books = stats["total_books"]
+        completed = stats["completed_books"]
+        pending_books = stats["pending_books"]
+        avg_rating = stats["avg_rating"]
+
+        # Average over the months in which at least one book was completed
+        active_months = [point["books_completed"] for point in stats["monthly"] if point["books_completed"]]
+        if active_months:
+            avg_books_per_month = sum(active_months) / len(active_months)
+
+    # --- Compute remaining metrics if books exist ---
     if not df.empty:
-        total_books = len(df)
+        # Only recount from raw books if the rollup is unavailable
+        if not stats:
+            total_books = len(df)
 
         # Calculate completed & pending books
-        if 'status' in df.columns:
+        if 'status' in df.columns and not stats:
             completed_df = df[df['status'] == 'completed'].copy()
             completed = len(completed_df)
             pending_books = len(df[df['status'].str.lower() != 'completed'])
 
             # Monthly reading trend
             if not completed_df.empty and 'timestamp' in completed_df.columns:
-                completed_df['timestamp'] = pd.to_datetime(completed_df['timestamp'])
+                if 'completed_at' in completed_df.columns:
+                    completed_df['timestamp'] = completed_df['completed_at'].fillna(completed_df['timestamp'])
                 completed_df['month_year'] = completed_df['timestamp'].dt.to_period('M')
                 monthly_counts = completed_df['month_year'].value_counts()
                 if not monthly_counts.empty:
@@ -58,19 +60,26 @@ def show_dashboard():
 
         # Average rating and top 5 rated books
         if 'rating' in df.columns:
-            df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
-            avg_rating = df['rating'].mean()
+            if not stats:
+                avg_rating = df['rating'].mean()
             top_rated_books = df.dropna(subset=['rating']).sort_values('rating', ascending=False).head(5)
 
         # Upcoming deadlines
         if 'deadline' in df.columns:
-            df['deadline'] = pd.to_datetime(df['deadline'], errors='coerce')
             approaching_deadlines = len(df[
                 (df['status'].str.lower() != 'completed') &
                 (df['deadline'].notna()) &
                 (df['deadline'].dt.date >= date.today())
             ])
 
+    # Genre counts from the rollup, falling back to the raw books
+    if stats:
+        genre_counts = pd.Series(stats["genre_counts"], dtype="int64")
+    elif 'genre' in df.columns and not df['genre'].dropna().empty:
+        genre_counts = df['genre'].str.lower().value_counts()
+    else:
+        genre_counts = pd.Series(dtype="int64")
+
     # Format metrics for display
     metrics = {
         "Total Books": total_books,
@@ -81,6 +90,41 @@ def show_dashboard():
         "Approaching Deadlines": approaching_deadlines
     }
 
+    return metrics, top_rated_books, genre_counts
+
+def show_dashboard():
+    st.title("📊 Dashboard")
+
+    # Custom CSS styling for buttons and layout
+    st.markdown("""
+        <style>
+            .stDownloadButton>button { display: block; margin: 0 auto; }
+            .st-emotion-cache-z5fcl4 { border-left: 1px solid #3c3d44; padding-left: 20px; }
+            .calendar-container {
+                background: #f8f9fa;
+                border-radius: 10px;
+                padding: 20px;
+                margin: 10px 0;
+            }
+        </style>
+        """, unsafe_allow_html=True)
+
+    # The first render after login uses the data prefetched during the loading screen
+    prefetched = st.session_state.pop("prefetched_dashboard", None) or {}
+    stats = prefetched.get("stats") or get_user_stats(st.session_state.user_id)  # Precomputed headline metrics (single get_item)
+    books = prefetched.get("books")
+    if books is None:
+        books = get_user_books(st.session_state.user_id, fields=DASHBOARD_FIELDS)  # User's books, shared across their tabs
+
+    warmup_seconds = st.session_state.pop("warmup_seconds", None)
+    if warmup_seconds is not None:
+        st.toast(f"Loaded your library in {warmup_seconds:.2f}s")
+
+    # --- 1. Key Metrics Section ---
+    st.subheader("🚀 Reading Snapshot")
+
+    metrics, top_rated_books, genre_counts = compute_dashboard_metrics(books, stats)
+
     # Display key metrics in a 2-row layout
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1: st.metric("📚 Total Books", metrics["Total Books"])
@@ -106,13 +150,13 @@ def show_dashboard():
 
     with col1:
         st.markdown("##### Top 3 Favorite Genres")
-        if 'genre' in df.columns and not df['genre'].dropna().empty:
-            genre_counts = df['genre'].str.lower().value_counts().nlargest(3)
-            capitalized_labels = genre_counts.index.str.capitalize()
+        if not genre_counts.empty:
+            top_genres = genre_counts.nlargest(3)
+            capitalized_labels = top_genres.index.str.capitalize()
             fig = px.bar(
-                genre_counts,
+                top_genres,
                 x=capitalized_labels,
-                y=genre_counts.values,
+                y=top_genres.values,
                 labels={'x': 'Genre', 'y': 'Number of Books'},
                 color=capitalized_labels,
                 color_discrete_sequence=px.colors.qualitative.Pastel
@@ -125,8 +169,7 @@ def show_dashboard():
 
     with col2:
         st.markdown("##### Books per Genre")
-        if 'genre' in df.columns and not df['genre'].dropna().empty:
-            genre_counts = df['genre'].str.lower().value_counts()
+        if not genre_counts.empty:
             capitalized_labels = genre_counts.index.str.capitalize()
             pie_fig = px.pie(
                 names=capitalized_labels,
@@ -138,6 +181,20 @@ def show_dashboard():
         else:
             st.info("No genre stats to show!")
 
+    # Monthly completions, plotted from the pre-aggregated time series
+    monthly = stats["monthly"] if stats else []
+    if monthly:
+        st.markdown("##### Monthly Reading Trend")
+        trend_fig = px.line(
+            pd.DataFrame(monthly),
+            x="month",
+            y="books_completed",
+            markers=True,
+            hover_data={"pages_completed": True},
+            labels={'month': 'Month', 'books_completed': 'Books Completed', 'pages_completed': 'Pages'}
+        )
+        st.plotly_chart(trend_fig, use_container_width=True)
+
     st.divider()
 
     # --- 3. Your Library Section ---
@@ -147,16 +204,10 @@ def show_dashboard():
     with st.expander("🏆 Top 5 Rated Books"):
         if not top_rated_books.empty:
             for _, book in top_rated_books.iterrows():
-                st.markdown(f"- {book['title']} by {book['author']} ({book['rating']} ⭐)")
+                st.markdown(f"- {book['title']} by {book['author']} ({book['rating']:g} ⭐)")
         else:
             st.write("Rate your books to see your top 5!")
 
-    # Genre count for PDF summary
-    if 'genre' in df.columns and not df['genre'].dropna().empty:
-        genre_counts = df['genre'].str.lower().value_counts()
-    else:
-        genre_counts = pd.Series()  # Empty if no genres
-
     # --- Generate and allow downloading of the reading summary PDF ---
     pdf_data = generate_pdf_summary(
         st.session_state.user_name,
@@ -90,7 +90,7 @@ def generate_pdf_summary(user_name, books, metrics, top_rated_books, genre_count
             # Encode text safely for PDF
             title = book['title'].encode('latin-1', 'replace').decode('latin-1')
             author = book['author'].encode('latin-1', 'replace').decode('latin-1')
-            pdf.cell(0, 6, f"  * {title} by {author} ({book['rating']})", 0, 1)
+            pdf.cell(0, 6, f"  * {title} by {author} ({book['rating']:g})", 0, 1)
 
     pdf.ln(5)
 
@@ -3,6 +3,9 @@ import pandas as pd
 import ast
 # Import json to read and write JSON files.
 import json
+# Import sys and os to make the project's catalog package importable.
+import sys
+import os
 
 # Try to read the CSV file into a DataFrame.
 try:
@@ -37,4 +40,10 @@ with open(output_json_path, 'w', encoding='utf-8') as f:
     json.dump(records, f, ensure_ascii=False, indent=2)
 
 # Print success message after conversion.
-print(f"File successfully converted to JSON!")
\ No newline at end of file
+print(f"File successfully converted to JSON!")
+
+# Rebuild the catalog index file (search terms, postings and genre bitmaps) for the new dataset.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from catalog.index_files import build_index_file
+build_index_file()
+print(f"Catalog index successfully rebuilt!")
\ No newline at end of file
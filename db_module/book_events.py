@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.aws_config import get_change_feed_mode
+from db_module.stats_handler import record_book_changes, record_stream_changes
+
+# Callables run for every book write as listener(user_id, old_item, new_item); either item may be None.
+# Batch listeners instead take a list of (user_id, old_item, new_item) changes in one call.
+BOOK_CHANGE_LISTENERS = []
+BATCH_CHANGE_LISTENERS = []
+
+def register_book_listener(listener, batch=False):
+    listeners = BATCH_CHANGE_LISTENERS if batch else BOOK_CHANGE_LISTENERS
+    if listener not in listeners:
+        listeners.append(listener)
+
+# Net change per book: a book written several times within one batch is reported once, from its
+# first old image to its last new image, since every derived view only depends on the net change
+def coalesce_changes(changes):
+    net = {}
+    for user_id, old_item, new_item in changes:
+        key = (user_id, (new_item or old_item or {}).get("book_id"))
+        net[key] = (user_id, net[key][1] if key in net else old_item, new_item)
+    return [change for change in net.values() if change[1] != change[2]]
+
+# Apply a batch of book writes to the stats rollup, then notify the listeners. Changes read from the
+# stream come with their sequence numbers, which make the rollup update safe to redeliver.
+def dispatch_book_changes(changes, sequence_numbers=None):
+    if sequence_numbers is not None:
+        record_stream_changes(changes, sequence_numbers)
+    changes = coalesce_changes(changes)
+    if not changes:
+        return 0
+    if sequence_numbers is None:
+        record_book_changes(changes)
+    for listener in list(BATCH_CHANGE_LISTENERS):
+        try:
+            listener(changes)
+        except Exception as e:
+            print(f"Error in book change listener...")
+    for listener in list(BOOK_CHANGE_LISTENERS):
+        for change in changes:
+            try:
+                listener(*change)
+            except Exception as e:
+                # A failing listener never fails the write that triggered it
+                print(f"Error in book change listener...")
+    return len(changes)
+
+# Called after every book write; where the derived views get updated depends on the change feed mode
+def publish_book_change(user_id, old_item, new_item):
+    mode = get_change_feed_mode()
+    if mode == "local":
+        from db_module.change_feed import get_local_feed  # The feed dispatches back through this module
+        get_local_feed().publish(user_id, old_item, new_item)
+    elif mode == "sync":
+        dispatch_book_changes([(user_id, old_item, new_item)])
+    # "streams": the consumer process reads the write from the books table's stream
@@ -0,0 +1,207 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from array import array
+from datetime import datetime
+from decimal import Decimal
+
+from db_module.codec import decode_progress, decode_rating
+
+# Attributes of a book item in ReadingTrackerBooks
+BOOK_FIELDS = (
+    "user_id", "book_id", "title", "author", "genre", "rating", "status", "tags",
+    "total_pages", "pages_read", "progress_bp", "progress_percent", "timestamp", "completed_at", "deadline", "archived", "version"
+)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEADLINE_FORMAT = "%Y-%m-%d"
+
+def _parse_datetime(value, fmt):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value), fmt)
+    except ValueError:
+        return None
+
+# One book, converted from the DynamoDB item once at the data-layer boundary.
+# Numbers are native ints/floats and dates are parsed lazily and cached. Attributes
+# left out by a projection are simply unset, so get() falls back to its default.
+class Book:
+    __slots__ = BOOK_FIELDS + ("extra", "_added_at", "_completed_on", "_deadline_date")
+
+    def __init__(self, **attributes):
+        self.extra = None
+        for name, value in attributes.items():
+            self[name] = value
+
+    @classmethod
+    def from_item(cls, item):
+        return None if item is None else cls(**item)
+
+    # Convert each attribute to its native type as it is set
+    def __setitem__(self, name, value):
+        if name == "rating":
+            # Star ratings stay ints so they render and compare like the form values (4, not 4.0)
+            value = decode_rating(value)
+        elif name in ("total_pages", "pages_read", "version"):
+            value = int(value) if value is not None else None
+        elif name == "progress_bp":
+            value = int(value)
+            self.progress_percent = decode_progress(value)
+        elif name == "progress_percent":
+            # Items written before the basis-point codec; progress_bp wins when both exist
+            if hasattr(self, "progress_bp"):
+                return
+            value = float(value) if value is not None else None
+        elif name == "tags":
+            value = list(value) if value else []
+        elif name == "archived":
+            value = bool(value)
+
+        if name in BOOK_FIELDS:
+            setattr(self, name, value)
+            # Drop the cached parsed date when its source changes
+            for source, cached in (("timestamp", "_added_at"), ("completed_at", "_completed_on"), ("deadline", "_deadline_date")):
+                if name == source and hasattr(self, cached):
+                    delattr(self, cached)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    # Dict-style access, so display code written against raw items keeps working
+    def get(self, name, default=None):
+        if name in BOOK_FIELDS:
+            return getattr(self, name, default)
+        return self.extra.get(name, default) if self.extra else default
+
+    def __getitem__(self, name):
+        value = self.get(name, KeyError)
+        if value is KeyError:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, KeyError) is not KeyError
+
+    def keys(self):
+        names = [name for name in BOOK_FIELDS if hasattr(self, name)]
+        return names + list(self.extra or ())
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    # Back to a DynamoDB-ready item (progress is written as basis points only)
+    def to_item(self):
+        item = dict(self.items())
+        if "progress_bp" in item:
+            item.pop("progress_percent", None)
+        elif isinstance(item.get("progress_percent"), float):
+            item["progress_percent"] = Decimal(str(item["progress_percent"]))
+        if isinstance(item.get("rating"), float):
+            item["rating"] = Decimal(str(item["rating"]))
+        if item.get("rating") is None:
+            item.pop("rating", None)
+        return item
+
+    def __repr__(self):
+        return f"Book({self.get('book_id')!r}, {self.get('title')!r})"
+
+    # --- Parsed dates, cached on first use ---
+    @property
+    def added_at(self):
+        try:
+            return self._added_at
+        except AttributeError:
+            self._added_at = _parse_datetime(self.get("timestamp"), TIMESTAMP_FORMAT)
+            return self._added_at
+
+    @property
+    def completed_on(self):
+        try:
+            return self._completed_on
+        except AttributeError:
+            self._completed_on = _parse_datetime(self.get("completed_at"), TIMESTAMP_FORMAT)
+            return self._completed_on
+
+    @property
+    def deadline_date(self):
+        try:
+            return self._deadline_date
+        except AttributeError:
+            parsed = _parse_datetime(self.get("deadline"), DEADLINE_FORMAT)
+            self._deadline_date = parsed.date() if parsed else None
+            return self._deadline_date
+
+    @property
+    def is_completed(self):
+        return str(self.get("status") or "").lower() == "completed"
+
+def books_from_items(items):
+    return [Book(**item) for item in items]
+
+# Column-oriented view of a library: one list or typed array per attribute, for large
+# libraries and for building DataFrames without going through per-book dicts
+class BookColumns:
+    __slots__ = ("columns", "length")
+
+    TEXT_FIELDS = ("book_id", "title", "author", "genre", "status", "deadline")
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_books(cls, books):
+        books = [book if isinstance(book, Book) else Book(**book) for book in books]
+        present = set()
+        for book in books:
+            present.update(book.keys())
+
+        columns = {}
+        for name in cls.TEXT_FIELDS:
+            if name in present:
+                columns[name] = [book.get(name) for book in books]
+        nan = float("nan")
+        if "rating" in present:
+            columns["rating"] = array("d", (nan if book.get("rating") is None else book.get("rating") for book in books))
+        for name in ("total_pages", "pages_read"):
+            if name in present:
+                columns[name] = array("q", (book.get(name) or 0 for book in books))
+        if "progress_percent" in present:
+            columns["progress_percent"] = array("d", (book.get("progress_percent") or 0.0 for book in books))
+        if "timestamp" in present:
+            columns["timestamp"] = [book.added_at for book in books]
+        if "completed_at" in present:
+            columns["completed_at"] = [book.completed_on for book in books]
+        if "deadline" in present:
+            columns["deadline"] = [book.deadline_date for book in books]
+        return cls(columns, len(books))
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    # Typed DataFrame: numeric arrays are wrapped without copying, dates are already parsed
+    def to_dataframe(self):
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name, values in self.columns.items():
+            if isinstance(values, array):
+                data[name] = np.frombuffer(values, dtype=np.float64 if values.typecode == "d" else np.int64)
+            elif name in ("timestamp", "completed_at", "deadline"):
+                data[name] = pd.to_datetime(pd.Series(values, dtype="object"))
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
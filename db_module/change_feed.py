@@ -0,0 +1,253 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import queue
+import threading
+import time
+from boto3.dynamodb.types import TypeDeserializer
+
+from config.aws_config import get_aws_session, get_dynamodb_resource
+from db_module.book_events import dispatch_book_changes
+from db_module.stats_handler import rebuild_user_stats
+from monitoring.metrics import registry
+dynamodb = get_dynamodb_resource()
+
+BOOKS_TABLE = 'ReadingTrackerBooks'
+counters_table = dynamodb.Table('ReadingTrackerCounters')
+
+# A batch is dispatched once it holds BATCH_SIZE changes or BATCH_WINDOW seconds after its first change
+BATCH_SIZE = 100
+BATCH_WINDOW = 0.25
+
+# A batch whose dispatch fails is queued again this many times before its users' stats are rebuilt instead
+DISPATCH_RETRIES = 1
+
+# Streams polling: records per GetRecords call, pause when every shard is idle
+STREAM_RECORD_LIMIT = 1000
+STREAM_POLL_INTERVAL = 1.0
+
+# Per-shard checkpoints live in the counters table and expire after the stream's 24h retention
+CHECKPOINT_PREFIX = "stream_checkpoint#"
+CHECKPOINT_TTL = 2 * 24 * 3600
+
+_deserializer = TypeDeserializer()
+
+def _record_batch(source, changes, started):
+    labels = {"source": source}
+    registry.inc("change_feed_events_total", len(changes), labels=labels,
+                 help_text="Book changes dispatched by the change feed")
+    registry.observe("change_feed_lag_ms", (time.time() - started) * 1000, labels=labels,
+                     help_text="Time from the oldest write in a batch to its dispatch")
+
+# In-process stand-in for the stream: book writes are queued and a background thread dispatches them
+# in batches, so the derived views are updated off the request that made the write
+class LocalChangeFeed:
+    def __init__(self, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.changes = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def publish(self, user_id, old_item, new_item):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+        self.changes.put((time.time(), (user_id, old_item, new_item), 0))
+
+    def _next_batch(self):
+        batch = [self.changes.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.changes.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                dispatch_book_changes([change for _, change, _ in batch])
+                _record_batch("local", batch, batch[0][0])
+            except Exception as e:
+                print(f"Error dispatching book changes...")
+                self._retry(batch)
+            finally:
+                for _ in batch:
+                    self.changes.task_done()
+
+    # Queue a failed batch again; changes that keep failing leave the stats rollup behind the books table,
+    # so their users' stats are rebuilt from it instead
+    def _retry(self, batch):
+        failed_users = set()
+        for started, change, attempts in batch:
+            if attempts < DISPATCH_RETRIES:
+                self.changes.put((started, change, attempts + 1))
+            else:
+                failed_users.add(change[0])
+        for user_id in failed_users:
+            if rebuild_user_stats(user_id) is None:
+                print(f"⚠️ Stats for {user_id} may be stale, run `python db_module/reconcile_stats.py {user_id}`")
+
+    # Block until every change published so far has been dispatched (e.g. before reading derived views in a script)
+    def flush(self):
+        self.changes.join()
+
+_local_feed = None
+_local_feed_lock = threading.Lock()
+
+def get_local_feed():
+    global _local_feed
+    with _local_feed_lock:
+        if _local_feed is None:
+            _local_feed = LocalChangeFeed()
+    return _local_feed
+
+def _from_image(image):
+    return {name: _deserializer.deserialize(value) for name, value in image.items()} if image else None
+
+# (user_id, old_item, new_item) for one stream record; the table's stream carries both images
+def stream_record_to_change(record):
+    data = record["dynamodb"]
+    keys = _from_image(data["Keys"])
+    old_item = _from_image(data.get("OldImage")) if record["eventName"] != "INSERT" else None
+    new_item = _from_image(data.get("NewImage")) if record["eventName"] != "REMOVE" else None
+    return keys["user_id"], old_item, new_item
+
+# Consumer of the books table's DynamoDB stream, run as its own process. Shards are read parent
+# first, and the last sequence number dispatched from each shard is checkpointed so a restart resumes there.
+# Records dispatched but not yet checkpointed are delivered again; the stats rollup skips those it applied.
+class StreamsChangeFeed:
+    def __init__(self, table_name=BOOKS_TABLE, start="LATEST", batch_size=BATCH_SIZE):
+        description = dynamodb.meta.client.describe_table(TableName=table_name)["Table"]
+        if "LatestStreamArn" not in description:
+            raise ValueError(f"{table_name} has no stream, enable it with `python db_module/schema_setup.py`")
+        self.stream_arn = description["LatestStreamArn"]
+        self.streams = get_aws_session().client('dynamodbstreams')
+        self.start = start
+        self.batch_size = batch_size
+        self.iterators = {}  # shard id -> next shard iterator, None once reading it failed
+        self.finished = set()
+        self.started = False
+
+    def _shards(self):
+        shards, args = [], {"StreamArn": self.stream_arn}
+        while True:
+            description = self.streams.describe_stream(**args)["StreamDescription"]
+            shards.extend(description.get("Shards", []))
+            if "LastEvaluatedShardId" not in description:
+                return shards
+            args["ExclusiveStartShardId"] = description["LastEvaluatedShardId"]
+
+    def _checkpoint(self, shard_id):
+        item = counters_table.get_item(Key={"counter_name": CHECKPOINT_PREFIX + shard_id}).get("Item")
+        return item.get("sequence_number") if item else None
+
+    def _save_checkpoint(self, shard_id, sequence_number):
+        counters_table.put_item(Item={"counter_name": CHECKPOINT_PREFIX + shard_id, "sequence_number": sequence_number,
+                                      "expires_at": int(time.time()) + CHECKPOINT_TTL})
+
+    # Iterator just after the shard's checkpoint, or at `first_type` when it has none. A checkpoint older than
+    # the stream's retention can no longer be resumed from, reading then restarts at the oldest record kept.
+    def _open_iterator(self, shard_id, first_type):
+        args = {"StreamArn": self.stream_arn, "ShardId": shard_id}
+        checkpoint = self._checkpoint(shard_id)
+        if checkpoint:
+            try:
+                return self.streams.get_shard_iterator(ShardIteratorType="AFTER_SEQUENCE_NUMBER",
+                                                       SequenceNumber=checkpoint, **args)["ShardIterator"]
+            except self.streams.exceptions.TrimmedDataAccessException:
+                print(f"⚠️ Records after the checkpoint of {shard_id} were trimmed, resuming at the oldest record kept")
+                first_type = "TRIM_HORIZON"
+        return self.streams.get_shard_iterator(ShardIteratorType=first_type, **args)["ShardIterator"]
+
+    # Start reading new shards and reopen the ones whose reads failed; a child shard waits until its
+    # parent has been read to the end
+    def refresh_shards(self):
+        known = set()
+        # Only the shards open at startup begin at `start`; shards split off later are read from their beginning
+        first_type = "TRIM_HORIZON" if self.started else self.start
+        self.started = True
+        for shard in self._shards():
+            shard_id = shard["ShardId"]
+            known.add(shard_id)
+            if shard_id in self.iterators and self.iterators[shard_id] is None:
+                # Resume after the last checkpointed batch; without a checkpoint nothing from the shard was
+                # dispatched yet, so it is read again from the oldest record kept
+                self.iterators[shard_id] = self._open_iterator(shard_id, "TRIM_HORIZON")
+                continue
+            if shard_id in self.iterators or shard_id in self.finished or shard.get("ParentShardId") in self.iterators:
+                continue
+            self.iterators[shard_id] = self._open_iterator(shard_id, first_type)
+        # A failed shard that is no longer listed has been trimmed away entirely
+        for shard_id, iterator in list(self.iterators.items()):
+            if iterator is None and shard_id not in known:
+                del self.iterators[shard_id]
+        self.finished &= known
+
+    # Read every active shard once and dispatch what arrived; returns the number of records read
+    def poll_once(self):
+        self.refresh_shards()
+        read = 0
+        for shard_id, iterator in list(self.iterators.items()):
+            if iterator is None:
+                continue
+            try:
+                response = self.streams.get_records(ShardIterator=iterator, Limit=STREAM_RECORD_LIMIT)
+                records = response.get("Records", [])
+                for start in range(0, len(records), self.batch_size):
+                    batch = records[start:start + self.batch_size]
+                    dispatch_book_changes([stream_record_to_change(record) for record in batch],
+                                          [record["dynamodb"]["SequenceNumber"] for record in batch])
+                    _record_batch("streams", batch, batch[0]["dynamodb"]["ApproximateCreationDateTime"].timestamp())
+                    self._save_checkpoint(shard_id, batch[-1]["dynamodb"]["SequenceNumber"])
+            except Exception as e:
+                # An expired or trimmed iterator, or a batch that failed to dispatch: retrying the same iterator
+                # would fail for good once it expires, so the shard is reopened from its checkpoint next poll
+                print(f"Error reading stream shard {shard_id}...")
+                self.iterators[shard_id] = None
+                continue
+            read += len(records)
+            if response.get("NextShardIterator"):
+                self.iterators[shard_id] = response["NextShardIterator"]
+            else:
+                # The shard was closed and fully read
+                del self.iterators[shard_id]
+                self.finished.add(shard_id)
+        return read
+
+    def run(self):
+        print(f"▶️  Consuming {self.stream_arn}...")
+        while True:
+            try:
+                if not self.poll_once():
+                    time.sleep(STREAM_POLL_INTERVAL)
+            except Exception as e:
+                print(f"Error polling the change stream...")
+                time.sleep(STREAM_POLL_INTERVAL)
+
+# Run the derived-view handlers for the stream with `python db_module/change_feed.py --consume`
+# while the app runs with SMARTREADS_CHANGE_FEED=streams
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Books table change feed consumer.")
+    parser.add_argument("--consume", action="store_true", help="Poll the books table stream and dispatch its changes")
+    parser.add_argument("--from-start", action="store_true", help="Without checkpoints, start at the oldest record kept")
+    args = parser.parse_args()
+    if args.consume:
+        import db_module.single_table  # Registers the single-table mirror when the dual layout is on
+        from recommender.incremental import enable_incremental_recommendations
+
+        enable_incremental_recommendations()
+        StreamsChangeFeed(start="TRIM_HORIZON" if args.from_start else "LATEST").run()
+    else:
+        parser.print_help()
@@ -0,0 +1,49 @@
+# Numeric codec for book items: values are stored as plain integers in DynamoDB and
+# converted to native Python numbers at the boundary, so no Decimal math is needed
+
+PROGRESS_ATTRIBUTE = "progress_bp"  # Reading progress in basis points (0-10000)
+LEGACY_PROGRESS_ATTRIBUTE = "progress_percent"  # Decimal percentage written by older versions
+BASIS_POINTS = 10000
+
+# Attributes to project whenever progress is displayed (new items and not yet rewritten ones)
+PROGRESS_FIELDS = [PROGRESS_ATTRIBUTE, LEGACY_PROGRESS_ATTRIBUTE]
+
+# Progress in basis points using integer math, rounded half up
+def encode_progress(pages_read, total_pages):
+    total_pages = int(total_pages or 0)
+    if total_pages <= 0:
+        return 0
+    pages_read = min(max(int(pages_read or 0), 0), total_pages)
+    return (pages_read * BASIS_POINTS + total_pages // 2) // total_pages
+
+def decode_progress(basis_points):
+    return int(basis_points) / 100.0
+
+# Percentage (float) from whichever progress attribute an item carries
+def progress_from_item(item):
+    if item.get(PROGRESS_ATTRIBUTE) is not None:
+        return decode_progress(item[PROGRESS_ATTRIBUTE])
+    legacy = item.get(LEGACY_PROGRESS_ATTRIBUTE)
+    return float(legacy) if legacy is not None else None
+
+# Star ratings are stored as small ints; None means "not rated" and the attribute is omitted
+def encode_rating(value):
+    if value in (None, "", "None"):
+        return None
+    rating = int(round(float(str(value).rstrip("⭐").strip())))
+    if not 1 <= rating <= 5:
+        raise ValueError(f"Rating must be between 1 and 5, got {value}")
+    return rating
+
+def decode_rating(value):
+    if value in (None, "", "None"):
+        return None
+    number = float(value)
+    # Older items may hold fractional Decimals, keep those as floats
+    return int(number) if number.is_integer() else number
+
+# Partition key of the status index: one partition per user and status, e.g. "U1001#completed"
+STATUS_KEY_ATTRIBUTE = "user_status"
+
+def encode_status_key(user_id, status):
+    return f"{user_id}#{str(status or '').lower()}"
@@ -5,12 +5,17 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from datetime import datetime
-from boto3.dynamodb.conditions import Attr, Key
 from decimal import Decimal
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
 # Import DynamoDB resource from config
 from config.aws_config import get_dynamodb_resource
+from db_module.book_events import publish_book_change
+from db_module.book_record import Book, books_from_items
+from db_module.codec import encode_progress, encode_rating, encode_status_key, STATUS_KEY_ATTRIBUTE
+from db_module.single_table import dual_layout_enabled, get_user_record, mirror_recommendations, mirror_user
+from db_module.tag_index import normalize_tags, tag_actions, to_attribute_values, transact_write
 dynamodb = get_dynamodb_resource()
 
 # Initialize table references
@@ -18,30 +23,115 @@ books_table = dynamodb.Table('ReadingTrackerBooks')
 users_table = dynamodb.Table('ReadingTrackerUsers')
 counters_table = dynamodb.Table('ReadingTrackerCounters')
 
+# Build projection arguments so reads only return the requested attributes
+def build_projection(fields):
+    if not fields:
+        return {}
+    # Alias every attribute to stay clear of reserved words like 'status' and 'name'
+    names = {f"#p{i}": field for i, field in enumerate(fields)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+# Run a books table query to completion: a single query stops after 1 MB of items
+def query_all_books(query_args):
+    items = []
+    while True:
+        response = books_table.query(**query_args)
+        items.extend(response.get('Items', []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Optimistic concurrency: every book write adds 1 to the book's version. A write made with the version
+# the caller read only applies while it is still current; books stored before versioning count as version 0.
+VERSION_ATTRIBUTE = "version"
+
+# ConditionExpression for a write to an existing book, optionally pinned to the version the caller read
+def version_condition(expected_version, expr_names, expr_values):
+    if expected_version is None:
+        return "attribute_exists(book_id)"
+    expr_names["#version"] = VERSION_ATTRIBUTE
+    expr_values[":expected_version"] = expected_version
+    if not expected_version:
+        return "attribute_exists(book_id) AND (attribute_not_exists(#version) OR #version = :expected_version)"
+    return "#version = :expected_version"
+
+# Update clause that bumps the version
+def version_increment(expr_names, expr_values):
+    expr_names["#version"] = VERSION_ATTRIBUTE
+    expr_values[":version_step"] = 1
+    return "ADD #version :version_step"
+
+# True for a failed ConditionExpression, on its own or inside a cancelled transaction
+def is_condition_failure(error):
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get("Error", {}).get("Code")
+    if code == "TransactionCanceledException":
+        return any(reason.get("Code") == "ConditionalCheckFailed" for reason in error.response.get("CancellationReasons", []))
+    return code == "ConditionalCheckFailedException"
+
 # Fetch user details from the database
-def get_user_details(user_id):
+def get_user_details(user_id, fields=None):
     try:
-        response = users_table.get_item(Key={"user_id": user_id})
+        # Dual layout: migrated users are read from the single table, the others from the users table
+        if dual_layout_enabled():
+            item = get_user_record(user_id, fields)
+            if item is not None:
+                return item
+        response = users_table.get_item(Key={"user_id": user_id}, **build_projection(fields))
         return response.get("Item")
     except Exception as e:
         print(f"Error fetching user details...")
         return None
 
+# Store a freshly computed recommendation list (and the preference vector behind it) on the user record
+def save_recommendations(user_id, recommendations, preference=None, drift=0):
+    try:
+        update_expression = "SET recommendations = :r, recommendations_updated_at = :t"
+        expression_values = {
+            ":r": recommendations,
+            ":t": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if preference is not None:
+            # The preference vector they were ranked for, and how far it moved since the last full ranking
+            update_expression += ", preference = :p, preference_drift = :d"
+            expression_values[":p"] = preference
+            expression_values[":d"] = Decimal(f"{drift:.4f}")
+
+        users_table.update_item(
+            Key={"user_id": user_id},
+            UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(user_id)",  # Never create partial user records
+            ExpressionAttributeValues=expression_values
+        )
+        if dual_layout_enabled():
+            mirror_recommendations(user_id, update_expression, expression_values)
+        return True
+    except Exception as e:
+        print(f"Error saving recommendations...")
+        return False
+
 # Register a new user in the users table
 def register_user(user_id, name, email):
     try:
+        item = {
+            "user_id": user_id,
+            "name": name,
+            "email": email,
+            "recommendations": [],
+            "reading_history": [],
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "welcome_sent": False
+        }
         users_table.put_item(
-            Item={
-                "user_id": user_id,
-                "name": name,
-                "email": email,
-                "recommendations": [],
-                "reading_history": [],
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "welcome_sent": False
-            },
+            Item=item,
             ConditionExpression='attribute_not_exists(user_id)'  # Prevent overwrite
         )
+        if dual_layout_enabled():
+            mirror_user(user_id, item)
         return True
     except ClientError as e:
         if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
@@ -63,31 +153,44 @@ def add_book_to_db(user_id, book_data):
 
         book_id = generate_book_id()
 
-        # Calculate reading progress
+        # Calculate reading progress (integer basis points)
         total_pages = book_data.get('total_pages', 0)
         pages_read = book_data.get('pages_read', 0)
-        progress_percent = 0
-        if total_pages > 0:
-            progress_percent = round(Decimal(pages_read) / Decimal(total_pages) * 100, 2)
+        progress_bp = encode_progress(pages_read, total_pages)
 
         # Build item to insert into DynamoDB
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         item = {
             "user_id": user_id,
             "book_id": book_id,
             "title": title,
             "author": author,
             "genre": book_data['genre'],
-            "rating": book_data['rating'],
             "status": book_data['status'],
-            "tags": [tag.strip() for tag in book_data['tags'].split(',')] if book_data['tags'] else [],
+            STATUS_KEY_ATTRIBUTE: encode_status_key(user_id, book_data['status']),  # Status index key
+            "tags": normalize_tags(book_data['tags']),
             "total_pages": total_pages,
             "pages_read": pages_read,
-            "progress_percent": progress_percent,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "archived": False
+            "progress_bp": progress_bp,
+            "timestamp": timestamp,
+            "archived": False,
+            VERSION_ATTRIBUTE: 1
         }
-
-        books_table.put_item(Item=item)
+        if item["status"] == "completed":
+            item["completed_at"] = timestamp
+        # Unrated books carry no rating attribute at all
+        rating = encode_rating(book_data['rating'])
+        if rating is not None:
+            item["rating"] = rating
+
+        # A tagged book is written in one transaction with its tag index entries
+        tag_changes = tag_actions(user_id, book_id, [], item["tags"])
+        if tag_changes:
+            transact_write([{"Put": {"TableName": books_table.name, "Item": to_attribute_values(item),
+                                     "ConditionExpression": "attribute_not_exists(book_id)"}}, *tag_changes])
+        else:
+            books_table.put_item(Item=item)
+        publish_book_change(user_id, None, item)  # Keep the stats rollup and listeners in sync
         print(f"Book added successfully! Book ID: {book_id}")
         return True
 
@@ -96,119 +199,307 @@ def add_book_to_db(user_id, book_data):
         raise e
 
 # Fetch specific book details by user_id and book_id
-def get_book_details(user_id, book_id):
+def get_book_details(user_id, book_id, fields=None):
     try:
-        response = books_table.get_item(Key={'user_id': user_id, 'book_id': book_id})
-        return response.get("Item")
+        response = books_table.get_item(Key={'user_id': user_id, 'book_id': book_id}, **build_projection(fields))
+        return Book.from_item(response.get("Item"))
     except Exception as e:
         print(f"Error fetching book details...")
         return None
 
-# Update existing book information
-def edit_book(user_id, book_id, updated_fields):
+# Update existing book information. With expected_version (the version the caller read) the update only
+# applies while nobody else has changed the book since. Returns the updated Book, or None on failure.
+def edit_book(user_id, book_id, updated_fields, expected_version=None):
     try:
         update_expr_parts = []
+        remove_parts = []
         expr_values = {}
         expr_names = {}
 
         # Build the update expression dynamically
         for k, v in updated_fields.items():
             placeholder = f"#attr_{k}"
-            update_expr_parts.append(f"{placeholder} = :{k}")
             expr_names[placeholder] = k
 
+            # Clearing the rating removes the attribute, like unrated books never carry one
+            # (a NULL would be rejected as the rating index's sort key, and counted by stats and filters)
+            if k == "rating" and encode_rating(v) is None:
+                remove_parts.append(placeholder)
+                continue
+            update_expr_parts.append(f"{placeholder} = :{k}")
+
             # Handle data type conversions
             if k == "rating":
-                expr_values[f":{k}"] = Decimal(v)
+                expr_values[f":{k}"] = encode_rating(v)
             elif k == "tags":
-                expr_values[f":{k}"] = [tag.strip() for tag in v.split(',')] if v else []
+                expr_values[f":{k}"] = normalize_tags(v)
             else:
                 expr_values[f":{k}"] = v
 
-        update_expr = "SET " + ", ".join(update_expr_parts)
-
-        # Perform the update operation
-        books_table.update_item(
-            Key={"user_id": user_id, "book_id": book_id},
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_values,
-            ExpressionAttributeNames=expr_names
-        )
+        # Keep the status index key in step with the status
+        if "status" in updated_fields:
+            update_expr_parts.append(f"{STATUS_KEY_ATTRIBUTE} = :status_key")
+            expr_values[":status_key"] = encode_status_key(user_id, updated_fields["status"])
+
+        update_expr = ("SET " + ", ".join(update_expr_parts) + " " if update_expr_parts else "") + \
+                      ("REMOVE " + ", ".join(remove_parts) + " " if remove_parts else "") + \
+                      version_increment(expr_names, expr_values)
+
+        key = {"user_id": user_id, "book_id": book_id}
+        if "tags" in updated_fields:
+            # Tag edits update the tag index in the same transaction. Transactions cannot return the
+            # old item, so it is read first and the update only applies while its version is unchanged.
+            old_item = books_table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if old_item is None:
+                print("No such book to edit...")
+                return None
+            if expected_version is not None and int(old_item.get(VERSION_ATTRIBUTE, 0)) != expected_version:
+                print("Error: The book was changed since it was read...")
+                return None
+            transact_write([
+                {"Update": {"TableName": books_table.name, "Key": to_attribute_values(key),
+                            "UpdateExpression": update_expr,
+                            "ConditionExpression": version_condition(int(old_item.get(VERSION_ATTRIBUTE, 0)), expr_names, expr_values),
+                            "ExpressionAttributeNames": expr_names,
+                            "ExpressionAttributeValues": to_attribute_values(expr_values)}},
+                *tag_actions(user_id, book_id, old_item.get("tags"), expr_values[":tags"])
+            ])
+        else:
+            # Perform the update operation, returning the previous item for the stats rollup; the
+            # new item follows exactly from it, so it is not read back
+            response = books_table.update_item(
+                Key=key,
+                UpdateExpression=update_expr,
+                ConditionExpression=version_condition(expected_version, expr_names, expr_values),
+                ExpressionAttributeValues=expr_values,
+                ExpressionAttributeNames=expr_names,
+                ReturnValues="ALL_OLD"
+            )
+            old_item = response.get("Attributes")
+        new_item = {**old_item, **{k: expr_values[f":{k}"] for k in updated_fields if f":{k}" in expr_values}}
+        for k in updated_fields:
+            if f":{k}" not in expr_values:
+                new_item.pop(k, None)
+        if "status" in updated_fields:
+            new_item[STATUS_KEY_ATTRIBUTE] = expr_values[":status_key"]
+        new_item[VERSION_ATTRIBUTE] = int(old_item.get(VERSION_ATTRIBUTE, 0)) + 1
+        publish_book_change(user_id, old_item, new_item)
         print("Book updated successfully!")
+        return Book.from_item(new_item)
 
     except Exception as e:
-        print(f"Update failed...")
+        if is_condition_failure(e):
+            print("Error: The book was changed or deleted since it was read...")
+        else:
+            print(f"Update failed...")
+        return None
 
-# Delete a book from the books table
-def delete_book(user_id, book_id):
+# Delete a book from the books table, in one round trip when it has no tags. Returns the deleted Book,
+# or None when it did not exist, failed, or (with expected_version) was changed since it was read.
+def delete_book(user_id, book_id, expected_version=None):
+    key = {"user_id": user_id, "book_id": book_id}
     try:
-        response = books_table.get_item(Key={"user_id": user_id, "book_id": book_id})
-        if "Item" not in response:
-            print("No such book to delete...")
-            return
-
-        books_table.delete_item(Key={"user_id": user_id, "book_id": book_id})
+        try:
+            # An untagged book has no tag index entries to remove alongside it
+            expr_names = {"#attr_tags": "tags"}
+            expr_values = {}
+            condition = version_condition(expected_version, expr_names, expr_values)
+            response = books_table.delete_item(
+                Key=key,
+                ConditionExpression=f"({condition}) AND (attribute_not_exists(#attr_tags) OR size(#attr_tags) = :no_tags)",
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues={**expr_values, ":no_tags": 0},
+                ReturnValues="ALL_OLD"
+            )
+            old_item = response["Attributes"]
+        except ClientError as e:
+            if not is_condition_failure(e):
+                raise
+            # Missing, changed, or tagged: read it to tell which
+            old_item = books_table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if old_item is None:
+                print("No such book to delete...")
+                return None
+            version = int(old_item.get(VERSION_ATTRIBUTE, 0))
+            if expected_version is not None and version != expected_version:
+                print("Error: The book was changed since it was read...")
+                return None
+            # The book's tag index entries go in the same transaction, which only applies to the version read
+            expr_names, expr_values = {}, {}
+            transact_write([{"Delete": {"TableName": books_table.name, "Key": to_attribute_values(key),
+                                        "ConditionExpression": version_condition(version, expr_names, expr_values),
+                                        "ExpressionAttributeNames": expr_names,
+                                        "ExpressionAttributeValues": to_attribute_values(expr_values)}},
+                            *tag_actions(user_id, book_id, old_item.get("tags"), [])])
+        publish_book_change(user_id, old_item, None)
         print("Book deleted successfully!")
+        return Book.from_item(old_item)
     except Exception as e:
-        print(f"Delete failed...")
+        if is_condition_failure(e):
+            print("Error: The book was changed or deleted since it was read...")
+        else:
+            print(f"Delete failed...")
+        return None
 
 # Check for duplicate books based on title and author
 def is_duplicate(user_id, title, author):
     response = books_table.query(
         KeyConditionExpression=Key("user_id").eq(user_id),
-        FilterExpression=Attr("title").eq(title) & Attr("author").eq(author)
+        FilterExpression=Attr("title").eq(title) & Attr("author").eq(author),
+        **build_projection(["book_id"])  # Only the existence of a match matters
     )
     return len(response['Items']) > 0
 
 # Get a user's reading history (excluding archived books)
-def get_user_history(user_id):
+def get_user_history(user_id, fields=None):
+    from db_module.filter_engine import available_indexes  # The filter engine builds on this module
+    from db_module.schema_setup import HISTORY_INDEX
+
     try:
-        response = books_table.query(
-            KeyConditionExpression=Key("user_id").eq(user_id),
-            FilterExpression=Attr('archived').ne(True) | Attr('archived').not_exists()
-        )
-        return sorted(response.get('Items', []), key=lambda x: x.get('timestamp', ''), reverse=True)
+        # Timestamp is always needed for sorting the history
+        if fields and "timestamp" not in fields:
+            fields = list(fields) + ["timestamp"]
+        query_args = {
+            "KeyConditionExpression": Key("user_id").eq(user_id),
+            "FilterExpression": Attr('archived').ne(True) | Attr('archived').not_exists(),
+            **build_projection(fields)
+        }
+        # The history index returns books newest first, so no sort is needed
+        if HISTORY_INDEX in available_indexes():
+            return books_from_items(query_all_books({"IndexName": HISTORY_INDEX, "ScanIndexForward": False, **query_args}))
+        return sorted(books_from_items(query_all_books(query_args)), key=lambda x: x.get('timestamp', ''), reverse=True)
     except Exception as e:
         print(f"Fetching history failed...")
         return []
 
+# Fetch only the user's books that have a deadline, from the sparse deadline index when it exists
+def get_books_with_deadlines(user_id, fields=None):
+    from db_module.filter_engine import available_indexes
+    from db_module.schema_setup import DEADLINE_INDEX
+
+    try:
+        query_args = {"KeyConditionExpression": Key("user_id").eq(user_id), **build_projection(fields)}
+        if DEADLINE_INDEX in available_indexes():
+            query_args["IndexName"] = DEADLINE_INDEX
+        else:
+            query_args["FilterExpression"] = Attr("deadline").exists()
+        return books_from_items(query_all_books(query_args))
+    except Exception as e:
+        print(f"Fetching deadlines failed...")
+        return []
+
 # Search user's books by title or author keyword
-def search_books(user_id, keyword):
+def search_books(user_id, keyword, fields=None):
     try:
-        response = books_table.query(
-            KeyConditionExpression=Key("user_id").eq(user_id),
-            FilterExpression=Attr("title").contains(keyword) | Attr("author").contains(keyword)
-        )
-        return response.get('Items', [])
+        return books_from_items(query_all_books({
+            "KeyConditionExpression": Key("user_id").eq(user_id),
+            "FilterExpression": Attr("title").contains(keyword) | Attr("author").contains(keyword),
+            **build_projection(fields)
+        }))
     except Exception as e:
         print(f"Search failed...")
         return []
 
-# Filter user's books based on genre, rating, or status
-def filter_books(user_id, genre=None, rating=None, status=None):
+# Filter user's books based on genre, rating, or status (see db_module/filter_engine.py for ranges and more)
+def filter_books(user_id, genre=None, rating=None, status=None, fields=None):
+    from db_module.filter_engine import BookQuery, run_book_query  # The filter engine builds on this module
+
+    query = BookQuery(statuses=[status] if status else (), rating_min=rating, rating_max=rating, genre=genre)
+    books, _ = run_book_query(user_id, query, fields)
+    return books
+
+# Build the filter expression shared by the search, filter and history views
+def build_book_filter(keyword=None, genre=None, rating=None, status=None, exclude_archived=False):
+    conditions = []
+    if keyword:
+        conditions.append(Attr("title").contains(keyword) | Attr("author").contains(keyword))
+    if genre:
+        conditions.append(Attr("genre").eq(genre))
+    if rating:
+        conditions.append(Attr("rating").eq(encode_rating(rating)))
+    if status:
+        conditions.append(Attr("status").eq(status))
+    if exclude_archived:
+        conditions.append(Attr('archived').ne(True) | Attr('archived').not_exists())
+
+    filter_expression = None
+    for condition in conditions:
+        filter_expression = filter_expression & condition if filter_expression else condition
+    return filter_expression
+
+# Where paged reads come from: the history index keeps books in the order they were added (by timestamp);
+# tables created before it existed can only page in book_id order. Returns (index name or None, key attributes).
+def _page_source():
+    from db_module.filter_engine import available_indexes  # The filter engine builds on this module
+    from db_module.schema_setup import HISTORY_INDEX
+
+    if HISTORY_INDEX in available_indexes():
+        return HISTORY_INDEX, ["book_id", "timestamp"]
+    return None, ["book_id"]
+
+# Fetch a single page of a user's books in the order they were added, resuming after the given cursor
+def get_books_page(user_id, page_size, cursor=None, book_filter=None, fields=None, ascending=True):
     try:
-        key_condition_expression = Key("user_id").eq(user_id)
-        filter_expression = None
-
-        # Dynamically build filter expression
-        if genre:
-            filter_expression = Attr("genre").eq(genre)
-        if rating:
-            rating_expr = Attr("rating").eq(Decimal(rating))
-            filter_expression = filter_expression & rating_expr if filter_expression else rating_expr
-        if status:
-            status_expr = Attr("status").eq(status)
-            filter_expression = filter_expression & status_expr if filter_expression else status_expr
-
-        query_args = {'KeyConditionExpression': key_condition_expression}
-        if filter_expression:
-            query_args['FilterExpression'] = filter_expression
+        # The cursor is built from the last returned key, so the key attributes must be projected
+        index, key_fields = _page_source()
+        if fields:
+            fields = list(fields) + [name for name in key_fields if name not in fields]
+
+        query_args = {
+            "KeyConditionExpression": Key("user_id").eq(user_id),
+            "ScanIndexForward": ascending,
+            "Limit": page_size,
+            **build_projection(fields)
+        }
+        if index:
+            query_args["IndexName"] = index
+        if book_filter is not None:
+            query_args["FilterExpression"] = book_filter
+        if cursor:
+            query_args["ExclusiveStartKey"] = cursor
+
+        # Limit applies before filtering, so keep reading until the page is full
+        items = []
+        exhausted = False
+        while len(items) < page_size:
+            response = books_table.query(**query_args)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                exhausted = True
+                break
+            query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        has_more = len(items) > page_size or not exhausted
+        items = books_from_items(items[:page_size])
+        next_cursor = None
+        if has_more and items:
+            next_cursor = {"user_id": user_id, **{name: items[-1][name] for name in key_fields}}
+        return items, next_cursor
+    except Exception as e:
+        print(f"Fetching books page failed...")
+        return [], None
 
-        response = books_table.query(**query_args)
-        return response.get('Items', [])
+# Count a user's books matching a filter without transferring the items
+def count_books(user_id, book_filter=None):
+    try:
+        # Counted on the same source the pages are read from, so the page count matches
+        index, _ = _page_source()
+        query_args = {"KeyConditionExpression": Key("user_id").eq(user_id), "Select": "COUNT"}
+        if index:
+            query_args["IndexName"] = index
+        if book_filter is not None:
+            query_args["FilterExpression"] = book_filter
+
+        total = 0
+        while True:
+            response = books_table.query(**query_args)
+            total += response.get("Count", 0)
+            if "LastEvaluatedKey" not in response:
+                return total
+            query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
     except Exception as e:
-        print(f"Filtering failed...")
-        return []
+        print(f"Counting books failed...")
+        return 0
 
 # Generate a new user ID by incrementing the highest existing one
 def generate_user_id():
@@ -0,0 +1,335 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import math
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from boto3.dynamodb.conditions import Attr, Key
+
+from db_module.book_record import books_from_items
+from db_module.codec import encode_progress, encode_rating, encode_status_key, STATUS_KEY_ATTRIBUTE
+from db_module.dynamo_handler import books_table, build_book_filter, build_projection, dynamodb
+from db_module.schema_setup import RATING_INDEX, STATUS_INDEX
+from db_module.stats_handler import get_user_stats
+from db_module.tag_index import book_ids_by_tag, get_book_items, tag_counts, tag_index_complete, TAGS_TABLE
+
+counters_table = dynamodb.Table('ReadingTrackerCounters')
+
+# Index plans whose size cannot be estimated are assumed to read this share of the partition
+UNKNOWN_INDEX_SELECTIVITY = 0.5
+
+# Marker item in the counters table, written once every book of a user carries the status index key
+STATUS_KEYS_PREFIX = "status_keys#"
+
+# Accept date objects or "YYYY-MM-DD" strings; timestamps are stored as "YYYY-MM-DD HH:MM:SS"
+def _day(value):
+    if value in (None, ""):
+        return None
+    return value.strftime("%Y-%m-%d") if isinstance(value, (date, datetime)) else str(value)[:10]
+
+# A filter over one user's books. Ranges are inclusive and every criterion is optional:
+# ratings are stars (1-5), progress is a percentage and dates are days.
+class BookQuery:
+    __slots__ = ("statuses", "rating_min", "rating_max", "tags", "progress_min", "progress_max",
+                 "added_from", "added_to", "completed_from", "completed_to", "genre", "keyword", "exclude_archived")
+
+    def __init__(self, statuses=(), rating_min=None, rating_max=None, tags=(), progress_min=None, progress_max=None,
+                 added_from=None, added_to=None, completed_from=None, completed_to=None,
+                 genre=None, keyword=None, exclude_archived=False):
+        self.statuses = tuple(sorted({str(status).lower() for status in statuses if status}))
+        self.rating_min = encode_rating(rating_min)
+        self.rating_max = encode_rating(rating_max)
+        self.tags = tuple(tag.strip() for tag in tags if tag and tag.strip())
+        self.progress_min = progress_min
+        self.progress_max = progress_max
+        self.added_from, self.added_to = _day(added_from), _day(added_to)
+        self.completed_from, self.completed_to = _day(completed_from), _day(completed_to)
+        self.genre = genre or None
+        self.keyword = keyword or None
+        self.exclude_archived = exclude_archived
+
+    @property
+    def has_rating_range(self):
+        return self.rating_min is not None or self.rating_max is not None
+
+    def rating_bounds(self):
+        return self.rating_min or 1, self.rating_max or 5
+
+    def _progress_bounds(self):
+        low = encode_progress(self.progress_min or 0, 100)
+        high = encode_progress(100 if self.progress_max is None else self.progress_max, 100)
+        return low, high
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    # FilterExpression for every criterion the chosen key condition does not already cover
+    def filter_expression(self, covered=()):
+        conditions = []
+        base = build_book_filter(keyword=self.keyword, genre=self.genre, exclude_archived=self.exclude_archived)
+        if base is not None:
+            conditions.append(base)
+        if self.statuses and "status" not in covered:
+            conditions.append(Attr("status").is_in(list(self.statuses)))
+        if self.has_rating_range and "rating" not in covered:
+            conditions.append(Attr("rating").between(*self.rating_bounds()))
+        if self.tags:
+            tag_condition = None
+            for tag in self.tags:
+                tag_condition = tag_condition | Attr("tags").contains(tag) if tag_condition else Attr("tags").contains(tag)
+            conditions.append(tag_condition)
+        if self.progress_min is not None or self.progress_max is not None:
+            low, high = self._progress_bounds()
+            # Items not yet rewritten by the basis-point codec only carry progress_percent
+            conditions.append(Attr("progress_bp").between(low, high) | (
+                Attr("progress_bp").not_exists() & Attr("progress_percent").between(Decimal(low) / 100, Decimal(high) / 100)))
+        for name, start, end in (("timestamp", self.added_from, self.added_to),
+                                 ("completed_at", self.completed_from, self.completed_to)):
+            if start or end:
+                conditions.append(Attr(name).between(f"{start or '0000-00-00'} 00:00:00", f"{end or '9999-12-31'} 23:59:59"))
+
+        expression = None
+        for condition in conditions:
+            expression = expression & condition if expression else condition
+        return expression
+
+    # Attributes the criteria read, added to a projection when matches() checks them on fetched books
+    def attributes(self):
+        names = set()
+        for active, attributes in ((self.statuses, ["status"]), (self.has_rating_range, ["rating"]),
+                                   (self.tags, ["tags"]),
+                                   (self.progress_min is not None or self.progress_max is not None,
+                                    ["progress_bp", "progress_percent"]),
+                                   (self.added_from or self.added_to, ["timestamp"]),
+                                   (self.completed_from or self.completed_to, ["completed_at"]),
+                                   (self.genre, ["genre"]), (self.keyword, ["title", "author"]),
+                                   (self.exclude_archived, ["archived"])):
+            if active:
+                names.update(attributes)
+        return names
+
+    # The same criteria evaluated on Book records already in memory
+    def matches(self, book):
+        if self.statuses and str(book.get("status") or "").lower() not in self.statuses:
+            return False
+        if self.has_rating_range:
+            low, high = self.rating_bounds()
+            if book.get("rating") is None or not low <= book.get("rating") <= high:
+                return False
+        if self.tags and not set(self.tags) & set(book.get("tags") or []):
+            return False
+        if self.progress_min is not None or self.progress_max is not None:
+            low, high = self._progress_bounds()
+            if not low / 100 <= (book.get("progress_percent") or 0.0) <= high / 100:
+                return False
+        for value, start, end in ((book.get("timestamp"), self.added_from, self.added_to),
+                                  (book.get("completed_at"), self.completed_from, self.completed_to)):
+            if (start or end) and not (value and (start or "") <= str(value)[:10] <= (end or "9999-12-31")):
+                return False
+        if self.genre and book.get("genre") != self.genre:
+            return False
+        if self.keyword and self.keyword not in f"{book.get('title') or ''}\n{book.get('author') or ''}":
+            return False
+        if self.exclude_archived and book.get("archived"):
+            return False
+        return True
+
+# How a query is (or was) executed, with the planner's estimate and the items actually read
+class QueryPlan:
+    __slots__ = ("name", "index", "estimated_reads", "description", "items_read", "requests")
+
+    LABELS = {"memory": "In-memory filter", "status_index": "Status index query",
+              "rating_index": "Rating index range query", "tag_index": "Tag index lookup",
+              "partition": "Partition query with filter"}
+
+    def __init__(self, name, index=None, estimated_reads=None, description=""):
+        self.name = name
+        self.index = index
+        self.estimated_reads = estimated_reads
+        self.description = description
+        self.items_read = 0
+        self.requests = 0
+
+    def cost(self, partition_size):
+        if self.estimated_reads is not None:
+            return self.estimated_reads
+        if partition_size is None:
+            return math.inf if self.name == "partition" else 0
+        return partition_size * (1.0 if self.name == "partition" else UNKNOWN_INDEX_SELECTIVITY)
+
+    def summary(self):
+        estimate = "" if self.estimated_reads is None else f", estimated {self.estimated_reads}"
+        return (f"{self.LABELS[self.name]} ({self.description}): read {self.items_read} item(s) "
+                f"in {self.requests} request(s){estimate}")
+
+_available_indexes = None
+_indexes_lock = threading.Lock()
+
+# Secondary indexes that exist on the books table (tables created before an index was added lack it)
+def available_indexes():
+    global _available_indexes
+    with _indexes_lock:
+        if _available_indexes is None:
+            try:
+                table = dynamodb.meta.client.describe_table(TableName=books_table.table_name)["Table"]
+                _available_indexes = {
+                    index["IndexName"]
+                    for index in table.get("LocalSecondaryIndexes", []) + table.get("GlobalSecondaryIndexes", [])
+                    if index.get("IndexStatus", "ACTIVE") == "ACTIVE"
+                }
+            except Exception as e:
+                print(f"Error describing the books table...")
+                return set()
+    return _available_indexes
+
+_status_keys_ready = set()
+_status_keys_lock = threading.Lock()
+
+# Whether the status index holds all of a user's books. Books stored before the index existed lack
+# its key, so the first status query of such a user backfills them; a marker item records that it
+# was done, and this process remembers it after the first check.
+def status_keys_complete(user_id):
+    with _status_keys_lock:
+        if user_id in _status_keys_ready:
+            return True
+    marker_key = {"counter_name": f"{STATUS_KEYS_PREFIX}{user_id}"}
+    try:
+        if "Item" not in counters_table.get_item(Key=marker_key):
+            _backfill_user_status_keys(user_id)
+            counters_table.put_item(Item={**marker_key, "backfilled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    except Exception as e:
+        print(f"Error backfilling the status index...")
+        return False
+    with _status_keys_lock:
+        _status_keys_ready.add(user_id)
+    return True
+
+# Pick the cheapest way to answer a query, estimating reads from the user's stats rollup counters
+def plan_query(user_id, query, library=None):
+    if library is not None:
+        return QueryPlan("memory", description="library already loaded")
+
+    stats = get_user_stats(user_id, rebuild_missing=False) or {}
+    total = stats.get("total_books")
+    plans = [QueryPlan("partition", estimated_reads=total, description="all of the user's books")]
+    indexes = available_indexes()
+
+    if query.statuses and STATUS_INDEX in indexes and status_keys_complete(user_id):
+        counts = stats.get("status_counts", {})
+        # Rollups built before per-status counters existed cannot be used for estimates
+        known = total is not None and sum(counts.values()) == total
+        plans.append(QueryPlan("status_index", STATUS_INDEX,
+                               sum(counts.get(status, 0) for status in query.statuses) if known else None,
+                               f"{len(query.statuses)} status partition(s)"))
+    if query.has_rating_range and RATING_INDEX in indexes:
+        low, high = query.rating_bounds()
+        counts = stats.get("rating_counts", {})
+        known = total is not None and sum(counts.values()) == stats.get("rated_books")
+        plans.append(QueryPlan("rating_index", RATING_INDEX,
+                               sum(count for rating, count in counts.items() if low <= rating <= high) if known else None,
+                               f"rating {low}-{high}"))
+    if query.tags and tag_index_complete(user_id):
+        counts = tag_counts(user_id)
+        # A book carrying several of the tags is counted once per tag, so this is an upper bound
+        plans.append(QueryPlan("tag_index", TAGS_TABLE, sum(counts.get(tag, 0) for tag in set(query.tags)),
+                               f"{len(set(query.tags))} tag(s), then key lookups"))
+
+    # Cheapest plan wins; ties go to the index plans, which never read more than the partition
+    return min(reversed(plans), key=lambda plan: plan.cost(total))
+
+# Run one query to completion, following pagination
+def _query_all(plan, query_args):
+    items = []
+    while True:
+        response = books_table.query(**query_args)
+        plan.requests += 1
+        plan.items_read += response.get("ScannedCount", len(response.get("Items", [])))
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def _query_args(key_condition, filter_expression, fields, index=None):
+    query_args = {"KeyConditionExpression": key_condition, **build_projection(fields)}
+    if index:
+        query_args["IndexName"] = index
+    if filter_expression is not None:
+        query_args["FilterExpression"] = filter_expression
+    return query_args
+
+# Execute a query with the chosen plan; returns (books sorted by book_id, plan with read counts)
+def run_book_query(user_id, query, fields=None, library=None):
+    plan = plan_query(user_id, query, library)
+    try:
+        if plan.name == "memory":
+            books = [book for book in library if query.matches(book)]
+            plan.items_read = len(library)
+        elif plan.name == "status_index":
+            items = []
+            for status in query.statuses:
+                items.extend(_query_all(plan, _query_args(
+                    Key(STATUS_KEY_ATTRIBUTE).eq(encode_status_key(user_id, status)),
+                    query.filter_expression(covered=("status",)), fields, STATUS_INDEX)))
+            books = books_from_items(items)
+        elif plan.name == "rating_index":
+            books = books_from_items(_query_all(plan, _query_args(
+                Key("user_id").eq(user_id) & Key("rating").between(*query.rating_bounds()),
+                query.filter_expression(covered=("rating",)), fields, RATING_INDEX)))
+        elif plan.name == "tag_index":
+            # Key lookups cannot filter, so the other criteria are checked on the fetched books
+            book_ids = sorted({book_id for tag in set(query.tags) for book_id in book_ids_by_tag(user_id, tag)})
+            items, plan.requests = get_book_items(user_id, book_ids, fields and sorted(set(fields) | query.attributes()))
+            plan.requests += len(set(query.tags))
+            plan.items_read = len(items)
+            books = [book for book in books_from_items(items) if query.matches(book)]
+        else:
+            books = books_from_items(_query_all(plan, _query_args(
+                Key("user_id").eq(user_id), query.filter_expression(), fields)))
+        return sorted(books, key=lambda book: book.get("book_id") or ""), plan
+    except Exception as e:
+        print(f"Filtering failed...")
+        return [], plan
+
+# Write the status index key on one user's books stored before the index existed; returns how many
+def _backfill_user_status_keys(user_id):
+    query_args = {
+        "KeyConditionExpression": Key("user_id").eq(user_id),
+        "FilterExpression": Attr(STATUS_KEY_ATTRIBUTE).not_exists() & Attr("status").exists(),
+        **build_projection(["book_id", "status"])
+    }
+    updated = 0
+    for item in _query_all(QueryPlan("partition"), query_args):
+        books_table.update_item(
+            Key={"user_id": user_id, "book_id": item["book_id"]},
+            UpdateExpression=f"SET {STATUS_KEY_ATTRIBUTE} = :sk",
+            ConditionExpression="attribute_exists(book_id)",  # Never recreate a book deleted meanwhile
+            ExpressionAttributeValues={":sk": encode_status_key(user_id, item["status"])}
+        )
+        updated += 1
+    return updated
+
+# Backfill ahead of time instead of on each user's first status query, e.g.
+# `python db_module/filter_engine.py --backfill U1001` (all users when none are given)
+def backfill_status_keys(user_ids=None):
+    from db_module.reconcile_stats import get_all_user_ids
+
+    updated = 0
+    for user_id in user_ids or get_all_user_ids():
+        updated += _backfill_user_status_keys(user_id)
+        counters_table.put_item(Item={"counter_name": f"{STATUS_KEYS_PREFIX}{user_id}",
+                                      "backfilled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    print(f"✅ Backfilled the status index key on {updated} book(s)!")
+    return updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter engine maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="Write missing status index keys")
+    parser.add_argument("user_ids", nargs="*", help="Only these users")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill_status_keys(args.user_ids)
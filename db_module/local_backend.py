@@ -0,0 +1,1261 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import atexit
+import bisect
+import math
+import pickle
+import re
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from functools import lru_cache
+from types import SimpleNamespace
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import Binary, TypeDeserializer
+from botocore.exceptions import ClientError
+
+# In-process stand-in for the DynamoDB resource (enable with SMARTREADS_STORAGE_BACKEND=local).
+# It implements the subset of the boto3 Table API the data layer uses with DynamoDB's expression,
+# pagination and type semantics, giving a deterministic, network-free backend for benchmarks.
+
+# DynamoDB returns at most 1 MB of evaluated items per query/scan page
+MAX_PAGE_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+# Request size limits of TransactWriteItems and BatchGetItem
+MAX_TRANSACT_ITEMS = 100
+MAX_BATCH_GET_KEYS = 100
+
+
+# --- Errors mirroring the boto3 client exceptions ---
+
+class LocalClientError(ClientError):
+    code = "InternalServerError"
+
+    def __init__(self, message, operation_name):
+        super().__init__({"Error": {"Code": self.code, "Message": message}}, operation_name)
+
+class ConditionalCheckFailedException(LocalClientError):
+    code = "ConditionalCheckFailedException"
+
+class ResourceInUseException(LocalClientError):
+    code = "ResourceInUseException"
+
+class ResourceNotFoundException(LocalClientError):
+    code = "ResourceNotFoundException"
+
+class ValidationException(LocalClientError):
+    code = "ValidationException"
+
+class TransactionCanceledException(LocalClientError):
+    code = "TransactionCanceledException"
+
+    def __init__(self, reasons, operation_name):
+        codes = ", ".join(reason["Code"] for reason in reasons)
+        super().__init__(f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                         operation_name)
+        self.response["CancellationReasons"] = reasons
+
+
+# --- Value normalization (what a round trip through DynamoDB does to Python values) ---
+
+def normalize_value(value):
+    if isinstance(value, bool) or value is None or isinstance(value, (str, Decimal, Binary)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, (bytes, bytearray)):
+        return Binary(bytes(value))
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            raise ValueError("Sets must not be empty")
+        return {normalize_value(v) for v in value}
+    raise TypeError(f"Unsupported type {type(value)} for value {value!r}")
+
+def copy_value(value):
+    # Scalars are immutable, only containers need copying
+    if isinstance(value, dict):
+        return {k: copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_value(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+def value_size(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, Decimal):
+        return len(value.as_tuple().digits) // 2 + 2
+    if isinstance(value, Binary):
+        return len(value.value)
+    if isinstance(value, dict):
+        return 3 + sum(len(k) + value_size(v) + 1 for k, v in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(value_size(v) + 1 for v in value)
+    return 1
+
+def item_size(item):
+    if not item:
+        return 0
+    return sum(len(name.encode("utf-8")) + value_size(value) for name, value in item.items())
+
+def type_code(value):
+    if isinstance(value, bool):
+        return "BOOL"
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return "S"
+    if isinstance(value, Decimal):
+        return "N"
+    if isinstance(value, Binary):
+        return "B"
+    if isinstance(value, dict):
+        return "M"
+    if isinstance(value, list):
+        return "L"
+    if isinstance(value, set):
+        sample = next(iter(value))
+        return {"S": "SS", "N": "NS", "B": "BS"}[type_code(sample)]
+    return None
+
+
+# --- Expression parsing ---
+
+_TOKEN_RE = re.compile(r"\s*(?:(#[A-Za-z0-9_]+)|(:[A-Za-z0-9_]+)|([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]|(<>|<=|>=|[=<>(),.+\-]))")
+_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IN", "SET", "REMOVE", "ADD", "DELETE"}
+_CONDITION_FUNCTIONS = {"attribute_exists", "attribute_not_exists", "attribute_type", "begins_with", "contains"}
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match:
+            raise ValidationException(f"Invalid expression near: {expression[position:]!r}", "Expression")
+        name_ref, value_ref, ident, index, symbol = match.groups()
+        if name_ref:
+            tokens.append(("name", name_ref))
+        elif value_ref:
+            tokens.append(("value", value_ref))
+        elif ident:
+            upper = ident.upper()
+            tokens.append(("kw", upper) if upper in _KEYWORDS else ("ident", ident))
+        elif index is not None:
+            tokens.append(("index", int(index)))
+        else:
+            tokens.append(("sym", symbol))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    def __init__(self, expression):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValidationException(f"Unexpected token {token[1]!r}", "Expression")
+        self.position += 1
+        return token
+
+    def accept(self, kind, value):
+        if self.peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    # path := name ('.' name | [n])*
+    def path(self):
+        kind, value = self.take()
+        if kind not in ("name", "ident"):
+            raise ValidationException(f"Expected attribute name, got {value!r}", "Expression")
+        elements = [value]
+        while True:
+            if self.accept("sym", "."):
+                elements.append(self.take()[1])
+            elif self.peek()[0] == "index":
+                elements.append(self.take()[1])
+            else:
+                return ("path", tuple(elements))
+
+    # --- conditions ---
+    def condition(self):
+        node = self.conjunction()
+        while self.accept("kw", "OR"):
+            node = ("or", node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept("kw", "AND"):
+            node = ("and", node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept("kw", "NOT"):
+            return ("not", self.negation())
+        return self.primary()
+
+    def primary(self):
+        if self.accept("sym", "("):
+            node = self.condition()
+            self.take("sym", ")")
+            return node
+        kind, value = self.peek()
+        if kind == "ident" and value in _CONDITION_FUNCTIONS and self.peek(1) == ("sym", "("):
+            self.take()
+            self.take("sym", "(")
+            args = [self.path()]
+            while self.accept("sym", ","):
+                args.append(self.operand())
+            self.take("sym", ")")
+            return ("func", value, tuple(args))
+
+        left = self.operand()
+        if self.accept("kw", "BETWEEN"):
+            low = self.operand()
+            self.take("kw", "AND")
+            return ("between", left, low, self.operand())
+        if self.accept("kw", "IN"):
+            self.take("sym", "(")
+            options = [self.operand()]
+            while self.accept("sym", ","):
+                options.append(self.operand())
+            self.take("sym", ")")
+            return ("in", left, tuple(options))
+        kind, op = self.take("sym")
+        if op not in ("=", "<>", "<", "<=", ">", ">="):
+            raise ValidationException(f"Invalid comparator {op!r}", "Expression")
+        return ("cmp", op, left, self.operand())
+
+    def operand(self):
+        kind, value = self.peek()
+        if kind == "value":
+            self.take()
+            return ("value", value)
+        if kind == "ident" and value == "size" and self.peek(1) == ("sym", "("):
+            self.take()
+            self.take("sym", "(")
+            node = ("size", self.path())
+            self.take("sym", ")")
+            return node
+        return self.path()
+
+    # --- update expressions ---
+    def update(self):
+        actions = []
+        while not self.done():
+            clause = self.take("kw")[1]
+            while True:
+                if clause == "SET":
+                    target = self.path()
+                    self.take("sym", "=")
+                    actions.append(("SET", target, self.set_value()))
+                elif clause == "REMOVE":
+                    actions.append(("REMOVE", self.path(), None))
+                elif clause in ("ADD", "DELETE"):
+                    target = self.path()
+                    actions.append((clause, target, self.operand()))
+                else:
+                    raise ValidationException(f"Invalid update clause {clause!r}", "UpdateExpression")
+                if not self.accept("sym", ","):
+                    break
+        return tuple(actions)
+
+    def set_value(self):
+        node = self.set_operand()
+        kind, value = self.peek()
+        if kind == "sym" and value in ("+", "-"):
+            self.take()
+            return ("arith", value, node, self.set_operand())
+        return node
+
+    def set_operand(self):
+        kind, value = self.peek()
+        if kind == "ident" and value in ("if_not_exists", "list_append") and self.peek(1) == ("sym", "("):
+            self.take()
+            self.take("sym", "(")
+            first = self.path() if value == "if_not_exists" else self.set_value()
+            self.take("sym", ",")
+            second = self.set_value()
+            self.take("sym", ")")
+            return (value, first, second)
+        return self.operand()
+
+    # --- projections ---
+    def projection(self):
+        paths = [self.path()]
+        while self.accept("sym", ","):
+            paths.append(self.path())
+        return tuple(paths)
+
+def _parse_complete(expression, rule):
+    parser = _Parser(expression)
+    node = getattr(parser, rule)()
+    if not parser.done():
+        raise ValidationException(f"Unexpected trailing input in {expression!r}", "Expression")
+    return node
+
+@lru_cache(maxsize=1024)
+def parse_condition(expression):
+    return _parse_complete(expression, "condition")
+
+@lru_cache(maxsize=1024)
+def parse_update(expression):
+    return _parse_complete(expression, "update")
+
+@lru_cache(maxsize=1024)
+def parse_projection(expression):
+    return _parse_complete(expression, "projection")
+
+
+# --- Expression evaluation ---
+
+_MISSING = object()
+
+class _Context:
+    def __init__(self, names, values):
+        self.names = names or {}
+        self.values = values or {}
+
+    def element(self, element):
+        if isinstance(element, str) and element.startswith("#"):
+            if element not in self.names:
+                raise ValidationException(f"Undefined attribute name {element}", "Expression")
+            return self.names[element]
+        return element
+
+    def value(self, reference):
+        if reference not in self.values:
+            raise ValidationException(f"Undefined attribute value {reference}", "Expression")
+        return self.values[reference]
+
+    def resolve_path(self, item, path):
+        current = item
+        for element in path[1]:
+            element = self.element(element)
+            if isinstance(element, int):
+                if not isinstance(current, list) or element >= len(current):
+                    return _MISSING
+                current = current[element]
+            else:
+                if not isinstance(current, dict) or element not in current:
+                    return _MISSING
+                current = current[element]
+        return current
+
+    def operand(self, item, node):
+        kind = node[0]
+        if kind == "value":
+            return self.value(node[1])
+        if kind == "path":
+            return self.resolve_path(item, node)
+        if kind == "size":
+            target = self.resolve_path(item, node[1])
+            if isinstance(target, (str, list, dict, set)):
+                return Decimal(len(target.encode("utf-8") if isinstance(target, str) else target))
+            if isinstance(target, Binary):
+                return Decimal(len(target.value))
+            return _MISSING
+        raise ValidationException(f"Invalid operand {node!r}", "Expression")
+
+def _comparable(left, right):
+    if left is _MISSING or right is _MISSING:
+        return False
+    for kind in (str, Decimal):
+        if isinstance(left, kind) and isinstance(right, kind) and not isinstance(left, bool):
+            return True
+    return isinstance(left, Binary) and isinstance(right, Binary)
+
+def _compare(op, left, right):
+    if op in ("=", "<>"):
+        if left is _MISSING or right is _MISSING:
+            return False
+        # Values of different DynamoDB types never compare equal (e.g. true vs 1)
+        equal = type_code(left) == type_code(right) and left == right
+        return equal if op == "=" else not equal
+    if not _comparable(left, right):
+        return False
+    if isinstance(left, Binary):
+        left, right = left.value, right.value
+    return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+def evaluate_condition(node, item, context):
+    kind = node[0]
+    if kind == "and":
+        return evaluate_condition(node[1], item, context) and evaluate_condition(node[2], item, context)
+    if kind == "or":
+        return evaluate_condition(node[1], item, context) or evaluate_condition(node[2], item, context)
+    if kind == "not":
+        return not evaluate_condition(node[1], item, context)
+    if kind == "cmp":
+        return _compare(node[1], context.operand(item, node[2]), context.operand(item, node[3]))
+    if kind == "between":
+        value = context.operand(item, node[1])
+        return (_compare(">=", value, context.operand(item, node[2]))
+                and _compare("<=", value, context.operand(item, node[3])))
+    if kind == "in":
+        value = context.operand(item, node[1])
+        return any(_compare("=", value, context.operand(item, option)) for option in node[2])
+    if kind == "func":
+        name, args = node[1], node[2]
+        target = context.resolve_path(item, args[0])
+        if name == "attribute_exists":
+            return target is not _MISSING
+        if name == "attribute_not_exists":
+            return target is _MISSING
+        if target is _MISSING:
+            return False
+        operand = context.operand(item, args[1])
+        if name == "attribute_type":
+            return type_code(target) == operand
+        if name == "begins_with":
+            if isinstance(target, str) and isinstance(operand, str):
+                return target.startswith(operand)
+            if isinstance(target, Binary) and isinstance(operand, Binary):
+                return target.value.startswith(operand.value)
+            return False
+        if name == "contains":
+            if isinstance(target, str):
+                return isinstance(operand, str) and operand in target
+            if isinstance(target, (set, list)):
+                return operand in target
+            return False
+    raise ValidationException(f"Invalid condition {node!r}", "Expression")
+
+
+# --- Path mutation for update expressions ---
+
+def _set_path(item, path, value, context):
+    elements = [context.element(e) for e in path[1]]
+    current = item
+    for element in elements[:-1]:
+        current = current[element] if isinstance(element, int) else current.setdefault(element, {})
+    last = elements[-1]
+    if isinstance(last, int):
+        if last >= len(current):
+            current.append(value)
+        else:
+            current[last] = value
+    else:
+        current[last] = value
+
+def _remove_path(item, path, context):
+    elements = [context.element(e) for e in path[1]]
+    current = item
+    for element in elements[:-1]:
+        try:
+            current = current[element]
+        except (KeyError, IndexError, TypeError):
+            return
+    last = elements[-1]
+    if isinstance(last, int):
+        if isinstance(current, list) and last < len(current):
+            del current[last]
+    elif isinstance(current, dict):
+        current.pop(last, None)
+
+def _set_value(node, item, context):
+    kind = node[0]
+    if kind == "arith":
+        left = _set_value(node[2], item, context)
+        right = _set_value(node[3], item, context)
+        if not (isinstance(left, Decimal) and isinstance(right, Decimal)):
+            raise ValidationException("An operand in the update expression has an incorrect data type", "UpdateItem")
+        return left + right if node[1] == "+" else left - right
+    if kind == "if_not_exists":
+        existing = context.resolve_path(item, node[1])
+        return _set_value(node[2], item, context) if existing is _MISSING else existing
+    if kind == "list_append":
+        first = _set_value(node[1], item, context)
+        second = _set_value(node[2], item, context)
+        if not (isinstance(first, list) and isinstance(second, list)):
+            raise ValidationException("list_append requires list operands", "UpdateItem")
+        return first + second
+    value = context.operand(item, node)
+    if value is _MISSING:
+        raise ValidationException("The provided expression refers to an attribute that does not exist in the item", "UpdateItem")
+    return copy_value(value)
+
+def apply_update(item, actions, context):
+    # All right-hand sides are evaluated against the item before the update
+    original = copy_value(item)
+    updated_paths = []
+    for action, path, operand in actions:
+        updated_paths.append(path)
+        if action == "SET":
+            _set_path(item, path, _set_value(operand, original, context), context)
+        elif action == "REMOVE":
+            _remove_path(item, path, context)
+        elif action == "ADD":
+            increment = context.operand(original, operand)
+            current = context.resolve_path(item, path)
+            if current is _MISSING:
+                _set_path(item, path, copy_value(increment), context)
+            elif isinstance(current, Decimal) and isinstance(increment, Decimal):
+                _set_path(item, path, current + increment, context)
+            elif isinstance(current, set) and isinstance(increment, set):
+                current.update(increment)
+            else:
+                raise ValidationException("An operand in the update expression has an incorrect data type", "UpdateItem")
+        elif action == "DELETE":
+            removal = context.operand(original, operand)
+            current = context.resolve_path(item, path)
+            if isinstance(current, set) and isinstance(removal, set):
+                current.difference_update(removal)
+                if not current:
+                    _remove_path(item, path, context)
+    return updated_paths
+
+
+# --- Tables ---
+
+class _Index:
+    # A secondary index kept as sorted (range value, base hash, base range) entries per partition
+    def __init__(self, name, key_schema, projection, is_local):
+        self.name = name
+        self.hash_key = next(k["AttributeName"] for k in key_schema if k["KeyType"] == "HASH")
+        self.range_key = next((k["AttributeName"] for k in key_schema if k["KeyType"] == "RANGE"), None)
+        self.projection = projection or {"ProjectionType": "ALL"}
+        self.is_local = is_local
+        self.partitions = defaultdict(list)
+
+    def entry(self, item, table):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return None
+        range_value = item[self.range_key] if self.range_key else ""
+        return item[self.hash_key], (range_value, item[table.hash_key], item.get(table.range_key, "") if table.range_key else "")
+
+    def add(self, item, table):
+        entry = self.entry(item, table)
+        if entry:
+            bisect.insort(self.partitions[entry[0]], entry[1])
+
+    def remove(self, item, table):
+        entry = self.entry(item, table)
+        if entry:
+            entries = self.partitions[entry[0]]
+            position = bisect.bisect_left(entries, entry[1])
+            if position < len(entries) and entries[position] == entry[1]:
+                del entries[position]
+
+    def project(self, item, table):
+        projection_type = self.projection.get("ProjectionType", "ALL")
+        if projection_type == "ALL":
+            return item
+        keep = {table.hash_key, self.hash_key}
+        keep.update(k for k in (table.range_key, self.range_key) if k)
+        if projection_type == "INCLUDE":
+            keep.update(self.projection.get("NonKeyAttributes", []))
+        return {name: value for name, value in item.items() if name in keep}
+
+class LocalTable:
+    def __init__(self, resource, name, key_schema, attribute_definitions, local_indexes=(), global_indexes=(),
+                 billing_mode="PAY_PER_REQUEST", provisioned_throughput=None):
+        self.resource = resource
+        self.name = name
+        self.table_name = name
+        self.key_schema = key_schema
+        self.attribute_definitions = attribute_definitions
+        self.hash_key = next(k["AttributeName"] for k in key_schema if k["KeyType"] == "HASH")
+        self.range_key = next((k["AttributeName"] for k in key_schema if k["KeyType"] == "RANGE"), None)
+        self.billing_mode = billing_mode
+        self.provisioned_throughput = provisioned_throughput
+        self.stream_specification = {"StreamEnabled": False}
+        self.ttl_attribute = None  # Recorded for DescribeTimeToLive; expired items are not deleted locally
+        self.partitions = {}  # hash value -> {range value: item}
+        self.sorted_keys = defaultdict(list)  # hash value -> sorted range values
+        self.indexes = {}
+        for spec in local_indexes:
+            self.indexes[spec["IndexName"]] = _Index(spec["IndexName"], spec["KeySchema"], spec.get("Projection"), True)
+        for spec in global_indexes:
+            self.indexes[spec["IndexName"]] = _Index(spec["IndexName"], spec["KeySchema"], spec.get("Projection"), False)
+        self.lock = threading.RLock()
+
+    # --- boto3 Table compatibility ---
+    def wait_until_exists(self):
+        return None
+
+    def wait_until_not_exists(self):
+        return None
+
+    def load(self):
+        return None
+
+    @property
+    def item_count(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _LocalBatchWriter(self)
+
+    # --- helpers ---
+    def _key_of(self, key, operation):
+        if self.hash_key not in key or (self.range_key and self.range_key not in key):
+            raise ValidationException("The provided key element does not match the schema", operation)
+        hash_value = normalize_value(key[self.hash_key])
+        range_value = normalize_value(key[self.range_key]) if self.range_key else ""
+        return hash_value, range_value
+
+    def _get(self, hash_value, range_value):
+        partition = self.partitions.get(hash_value)
+        return partition.get(range_value) if partition else None
+
+    def _index_key_mismatch(self, index, item):
+        types = {d["AttributeName"]: d["AttributeType"] for d in self.attribute_definitions}
+        expected = {"S": str, "N": Decimal, "B": Binary}
+        for name in (index.hash_key, index.range_key):
+            if name and name in item and not isinstance(item[name], expected.get(types.get(name), object)):
+                return name
+        return None
+
+    # Like DynamoDB, reject items whose index key attributes have the wrong type (e.g. a NULL sort key)
+    def _check_index_keys(self, item, operation):
+        for index in self.indexes.values():
+            name = self._index_key_mismatch(index, item)
+            if name:
+                types = {d["AttributeName"]: d["AttributeType"] for d in self.attribute_definitions}
+                raise ValidationException(
+                    f"One or more parameter values were invalid: Type mismatch for Index Key {name} "
+                    f"Expected: {types.get(name)} IndexName: {index.name}", operation)
+
+    # --- schema changes (UpdateTable) ---
+    # A new global index is backfilled at once; items whose key attributes have the wrong type are left out
+    def add_global_index(self, spec):
+        with self.lock:
+            if spec["IndexName"] in self.indexes:
+                raise ValidationException(f"Attempting to create an index which already exists: {spec['IndexName']}", "UpdateTable")
+            index = _Index(spec["IndexName"], spec["KeySchema"], spec.get("Projection"), False)
+            for partition in self.partitions.values():
+                for item in partition.values():
+                    if not self._index_key_mismatch(index, item):
+                        index.add(item, self)
+            self.indexes[index.name] = index
+
+    def delete_global_index(self, name):
+        with self.lock:
+            index = self.indexes.get(name)
+            if index is None or index.is_local:
+                raise ResourceNotFoundException(f"Requested resource not found: Index: {name}", "UpdateTable")
+            del self.indexes[name]
+
+    def _store(self, hash_value, range_value, item, old_item):
+        if old_item is not None:
+            for index in self.indexes.values():
+                index.remove(old_item, self)
+        partition = self.partitions.setdefault(hash_value, {})
+        if range_value not in partition:
+            bisect.insort(self.sorted_keys[hash_value], range_value)
+        partition[range_value] = item
+        for index in self.indexes.values():
+            index.add(item, self)
+
+    def _delete(self, hash_value, range_value, old_item):
+        for index in self.indexes.values():
+            index.remove(old_item, self)
+        del self.partitions[hash_value][range_value]
+        keys = self.sorted_keys[hash_value]
+        del keys[bisect.bisect_left(keys, range_value)]
+        if not keys:
+            del self.partitions[hash_value]
+            del self.sorted_keys[hash_value]
+
+    def _context(self, kwargs, expression_keys):
+        # Condition objects are rendered to strings exactly like boto3 does before sending
+        names = dict(kwargs.get("ExpressionAttributeNames") or {})
+        values = {k: normalize_value(v) for k, v in (kwargs.get("ExpressionAttributeValues") or {}).items()}
+        builder = ConditionExpressionBuilder()
+        expressions = {}
+        for key in expression_keys:
+            expression = kwargs.get(key)
+            if isinstance(expression, ConditionBase):
+                built = builder.build_expression(expression, is_key_condition=key == "KeyConditionExpression")
+                names.update(built.attribute_name_placeholders)
+                values.update({k: normalize_value(v) for k, v in built.attribute_value_placeholders.items()})
+                expression = built.condition_expression
+            expressions[key] = expression
+        return _Context(names, values), expressions
+
+    def _check_condition(self, expression, item, context, operation):
+        if expression and not evaluate_condition(parse_condition(expression), item or {}, context):
+            raise ConditionalCheckFailedException("The conditional request failed", operation)
+
+    def _project(self, item, projection, context):
+        if not projection:
+            return copy_value(item)
+        projected = {}
+        for path in parse_projection(projection):
+            value = context.resolve_path(item, path)
+            if value is not _MISSING:
+                _set_path(projected, path, copy_value(value), context)
+        return projected
+
+    def _write_units(self, *items):
+        size = max(item_size(item) for item in items)
+        return max(1, math.ceil(size / WRITE_UNIT_BYTES))
+
+    def _read_units(self, size, consistent):
+        units = max(1, math.ceil(size / READ_UNIT_BYTES))
+        return units if consistent else units / 2
+
+    def _respond(self, response, kwargs, operation, read_units=0.0, write_units=0.0, items=0):
+        self.resource.record_capacity(self.name, operation, read_units, write_units, items)
+        if kwargs.get("ReturnConsumedCapacity") in ("TOTAL", "INDEXES"):
+            response["ConsumedCapacity"] = {
+                "TableName": self.name,
+                "CapacityUnits": read_units + write_units,
+                "ReadCapacityUnits": read_units,
+                "WriteCapacityUnits": write_units
+            }
+        response["ResponseMetadata"] = {"HTTPStatusCode": 200, "RetryAttempts": 0}
+        return response
+
+    def _return_values(self, mode, old_item, new_item, updated_paths, context):
+        if mode == "ALL_OLD":
+            return copy_value(old_item) if old_item else None
+        if mode == "ALL_NEW":
+            return copy_value(new_item) if new_item else None
+        if mode in ("UPDATED_OLD", "UPDATED_NEW"):
+            source = old_item if mode == "UPDATED_OLD" else new_item
+            if not source:
+                return None
+            attributes = {}
+            for path in updated_paths:
+                name = context.element(path[1][0])
+                if name in source:
+                    attributes[name] = copy_value(source[name])
+            return attributes or None
+        return None
+
+    # --- item operations ---
+    def get_item(self, **kwargs):
+        with self.lock:
+            hash_value, range_value = self._key_of(kwargs["Key"], "GetItem")
+            context, _ = self._context(kwargs, ())
+            item = self._get(hash_value, range_value)
+            response = {}
+            if item is not None:
+                response["Item"] = self._project(item, kwargs.get("ProjectionExpression"), context)
+            units = self._read_units(item_size(item), kwargs.get("ConsistentRead", False))
+            return self._respond(response, kwargs, "GetItem", read_units=units, items=int(item is not None))
+
+    def put_item(self, **kwargs):
+        with self.lock:
+            item = normalize_value(kwargs["Item"])
+            hash_value, range_value = self._key_of(item, "PutItem")
+            context, expressions = self._context(kwargs, ("ConditionExpression",))
+            old_item = self._get(hash_value, range_value)
+            self._check_condition(expressions["ConditionExpression"], old_item, context, "PutItem")
+            self._check_index_keys(item, "PutItem")
+            self._store(hash_value, range_value, item, old_item)
+            response = {}
+            if kwargs.get("ReturnValues") == "ALL_OLD" and old_item:
+                response["Attributes"] = copy_value(old_item)
+            return self._respond(response, kwargs, "PutItem", write_units=self._write_units(old_item, item), items=1)
+
+    def update_item(self, **kwargs):
+        with self.lock:
+            key = kwargs["Key"]
+            hash_value, range_value = self._key_of(key, "UpdateItem")
+            context, expressions = self._context(kwargs, ("ConditionExpression",))
+            old_item = self._get(hash_value, range_value)
+            self._check_condition(expressions["ConditionExpression"], old_item, context, "UpdateItem")
+
+            new_item = copy_value(old_item) if old_item else normalize_value(dict(key))
+            updated_paths = []
+            if kwargs.get("UpdateExpression"):
+                updated_paths = apply_update(new_item, parse_update(kwargs["UpdateExpression"]), context)
+                for path in updated_paths:
+                    if context.element(path[1][0]) in (self.hash_key, self.range_key):
+                        raise ValidationException("Cannot update attribute that is part of the key", "UpdateItem")
+            self._check_index_keys(new_item, "UpdateItem")
+            self._store(hash_value, range_value, new_item, old_item)
+
+            response = {}
+            attributes = self._return_values(kwargs.get("ReturnValues", "NONE"), old_item, new_item, updated_paths, context)
+            if attributes:
+                response["Attributes"] = attributes
+            return self._respond(response, kwargs, "UpdateItem", write_units=self._write_units(old_item, new_item), items=1)
+
+    def delete_item(self, **kwargs):
+        with self.lock:
+            hash_value, range_value = self._key_of(kwargs["Key"], "DeleteItem")
+            context, expressions = self._context(kwargs, ("ConditionExpression",))
+            old_item = self._get(hash_value, range_value)
+            self._check_condition(expressions["ConditionExpression"], old_item, context, "DeleteItem")
+            if old_item is not None:
+                self._delete(hash_value, range_value, old_item)
+            response = {}
+            if kwargs.get("ReturnValues") == "ALL_OLD" and old_item:
+                response["Attributes"] = copy_value(old_item)
+            return self._respond(response, kwargs, "DeleteItem", write_units=self._write_units(old_item), items=1)
+
+    # --- query & scan ---
+    def _key_conditions(self, node, hash_key, range_key, context):
+        # Split a key condition into the partition value and an optional sort key predicate
+        conditions = []
+        def collect(n):
+            if n[0] == "and":
+                collect(n[1])
+                collect(n[2])
+            else:
+                conditions.append(n)
+        collect(node)
+
+        hash_value, range_condition = _MISSING, None
+        for condition in conditions:
+            if condition[0] == "cmp" and condition[2][0] == "path" and context.element(condition[2][1][0]) == hash_key:
+                hash_value = context.operand({}, condition[3])
+            elif range_key is not None:
+                range_condition = condition
+        if hash_value is _MISSING:
+            raise ValidationException("Query condition missed key schema element", "Query")
+        return hash_value, range_condition
+
+    def _range_bounds(self, keys, condition, context):
+        # Narrow the sorted sort keys with bisect for the supported key predicates
+        if condition is None:
+            return 0, len(keys)
+        kind = condition[0]
+        if kind == "between":
+            low, high = context.operand({}, condition[2]), context.operand({}, condition[3])
+            return bisect.bisect_left(keys, low), bisect.bisect_right(keys, high)
+        if kind == "func" and condition[1] == "begins_with":
+            prefix = context.operand({}, condition[2][1])
+            start = bisect.bisect_left(keys, prefix)
+            end = start
+            while end < len(keys) and isinstance(keys[end], str) and keys[end].startswith(prefix):
+                end += 1
+            return start, end
+        if kind == "cmp":
+            op, value = condition[1], context.operand({}, condition[3])
+            if op == "=":
+                return bisect.bisect_left(keys, value), bisect.bisect_right(keys, value)
+            if op == "<":
+                return 0, bisect.bisect_left(keys, value)
+            if op == "<=":
+                return 0, bisect.bisect_right(keys, value)
+            if op == ">":
+                return bisect.bisect_right(keys, value), len(keys)
+            if op == ">=":
+                return bisect.bisect_left(keys, value), len(keys)
+        raise ValidationException("Unsupported key condition", "Query")
+
+    def query(self, **kwargs):
+        with self.lock:
+            context, expressions = self._context(kwargs, ("KeyConditionExpression", "FilterExpression"))
+            index = None
+            if kwargs.get("IndexName"):
+                index = self.indexes.get(kwargs["IndexName"])
+                if index is None:
+                    raise ValidationException(f"The table does not have the specified index: {kwargs['IndexName']}", "Query")
+            hash_key = index.hash_key if index else self.hash_key
+            range_key = index.range_key if index else self.range_key
+            hash_value, range_condition = self._key_conditions(
+                parse_condition(expressions["KeyConditionExpression"]), hash_key, range_key, context)
+
+            # Positions are sort key values, or (index sort value, base keys) entries for indexes
+            if index:
+                positions = index.partitions.get(hash_value, [])
+                sort_values = [entry[0] for entry in positions]
+                partitions = self.partitions
+                fetch = lambda entry: index.project(partitions[entry[1]][entry[2]], self)
+            else:
+                positions = self.sorted_keys.get(hash_value, [])
+                sort_values = positions
+                partition = self.partitions.get(hash_value, {})
+                fetch = partition.__getitem__
+            start, end = self._range_bounds(sort_values, range_condition, context) if range_key else (0, len(positions))
+
+            # Resume strictly after the ExclusiveStartKey
+            forward = kwargs.get("ScanIndexForward", True)
+            start_key = kwargs.get("ExclusiveStartKey")
+            if start_key:
+                start_key = normalize_value(start_key)
+                base_range = start_key.get(self.range_key, "") if self.range_key else ""
+                if index:
+                    marker = (start_key.get(range_key, "") if range_key else "", start_key[self.hash_key], base_range)
+                else:
+                    marker = base_range
+                if forward:
+                    start = max(start, bisect.bisect_right(positions, marker))
+                else:
+                    end = min(end, bisect.bisect_left(positions, marker))
+
+            selected = positions[start:end] if forward else positions[start:end][::-1]
+            return self._page(selected, fetch, kwargs, expressions, context, "Query")
+
+    def scan(self, **kwargs):
+        with self.lock:
+            context, expressions = self._context(kwargs, ("FilterExpression",))
+            positions = [
+                (hash_value, range_value)
+                for hash_value in self.partitions
+                for range_value in self.sorted_keys[hash_value]
+            ]
+            start_key = kwargs.get("ExclusiveStartKey")
+            if start_key:
+                start_key = normalize_value(start_key)
+                marker = (start_key[self.hash_key], start_key.get(self.range_key, "") if self.range_key else "")
+                if marker in positions:
+                    positions = positions[positions.index(marker) + 1:]
+            fetch = lambda position: self.partitions[position[0]][position[1]]
+            return self._page(positions, fetch, kwargs, expressions, context, "Scan")
+
+    def _page(self, positions, fetch, kwargs, expressions, context, operation):
+        limit = kwargs.get("Limit")
+        filter_node = parse_condition(expressions["FilterExpression"]) if expressions.get("FilterExpression") else None
+        projection = kwargs.get("ProjectionExpression")
+        count_only = kwargs.get("Select") == "COUNT"
+
+        results = []
+        scanned = 0
+        scanned_bytes = 0
+        last_item = None
+        for position in positions:
+            if (limit is not None and scanned >= limit) or scanned_bytes >= MAX_PAGE_BYTES:
+                break
+            item = fetch(position)
+            scanned += 1
+            scanned_bytes += item_size(item)
+            last_item = item
+            if filter_node is None or evaluate_condition(filter_node, item, context):
+                if not count_only:
+                    results.append(self._project(item, projection, context))
+                else:
+                    results.append(None)
+
+        response = {"Count": len(results), "ScannedCount": scanned}
+        if not count_only:
+            response["Items"] = results
+        # As in DynamoDB, a read cut short by Limit or the page size returns LastEvaluatedKey even when
+        # nothing is left after it; only a read that ran out of items omits it
+        stopped = (limit is not None and scanned >= limit) or scanned_bytes >= MAX_PAGE_BYTES
+        if stopped and last_item is not None:
+            response["LastEvaluatedKey"] = self._last_key(last_item, kwargs.get("IndexName"))
+        units = self._read_units(scanned_bytes, kwargs.get("ConsistentRead", False))
+        return self._respond(response, kwargs, operation, read_units=units, items=scanned)
+
+    def _last_key(self, item, index_name):
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        if index_name:
+            index = self.indexes[index_name]
+            key[index.hash_key] = item[index.hash_key]
+            if index.range_key:
+                key[index.range_key] = item[index.range_key]
+        return copy_value(key)
+
+    def describe(self):
+        description = {
+            "TableName": self.name,
+            "TableStatus": "ACTIVE",
+            "KeySchema": self.key_schema,
+            "AttributeDefinitions": self.attribute_definitions,
+            "ItemCount": self.item_count,
+            "BillingModeSummary": {"BillingMode": self.billing_mode}
+        }
+        if self.provisioned_throughput:
+            description["ProvisionedThroughput"] = self.provisioned_throughput
+        if self.stream_specification.get("StreamEnabled"):
+            description["StreamSpecification"] = dict(self.stream_specification)
+            description["LatestStreamArn"] = f"arn:local:dynamodb:table/{self.name}/stream/local"
+        local_indexes = [self._describe_index(i) for i in self.indexes.values() if i.is_local]
+        global_indexes = [self._describe_index(i) for i in self.indexes.values() if not i.is_local]
+        if local_indexes:
+            description["LocalSecondaryIndexes"] = local_indexes
+        if global_indexes:
+            description["GlobalSecondaryIndexes"] = global_indexes
+        return description
+
+    def _describe_index(self, index):
+        key_schema = [{"AttributeName": index.hash_key, "KeyType": "HASH"}]
+        if index.range_key:
+            key_schema.append({"AttributeName": index.range_key, "KeyType": "RANGE"})
+        return {"IndexName": index.name, "KeySchema": key_schema, "Projection": index.projection, "IndexStatus": "ACTIVE"}
+
+class _LocalBatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.delete_item(Key=Key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# --- Resource ---
+
+class LocalDynamoDBResource:
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.capacity = defaultdict(lambda: {"calls": 0, "read_units": 0.0, "write_units": 0.0, "items": 0})
+        exceptions = SimpleNamespace(
+            ConditionalCheckFailedException=ConditionalCheckFailedException,
+            ResourceInUseException=ResourceInUseException,
+            ResourceNotFoundException=ResourceNotFoundException,
+            ValidationException=ValidationException,
+            TransactionCanceledException=TransactionCanceledException,
+            ClientError=ClientError
+        )
+        client = SimpleNamespace(exceptions=exceptions, describe_table=self._describe_table,
+                                 transact_write_items=self._transact_write_items, update_table=self._update_table,
+                                 update_time_to_live=self._update_time_to_live,
+                                 describe_time_to_live=self._describe_time_to_live)
+        self.meta = SimpleNamespace(client=client)
+
+    def Table(self, name):
+        with self.lock:
+            if name not in self.tables:
+                raise ResourceNotFoundException(f"Requested resource not found: Table: {name} not found", "DescribeTable")
+            return self.tables[name]
+
+    def create_table(self, TableName, KeySchema, AttributeDefinitions, LocalSecondaryIndexes=(),
+                     GlobalSecondaryIndexes=(), BillingMode="PROVISIONED", ProvisionedThroughput=None,
+                     StreamSpecification=None, **kwargs):
+        with self.lock:
+            if TableName in self.tables:
+                raise ResourceInUseException(f"Table already exists: {TableName}", "CreateTable")
+            table = LocalTable(self, TableName, KeySchema, AttributeDefinitions, LocalSecondaryIndexes,
+                               GlobalSecondaryIndexes, BillingMode, ProvisionedThroughput)
+            if StreamSpecification:
+                table.stream_specification = dict(StreamSpecification)
+            self.tables[TableName] = table
+            return table
+
+    def _describe_table(self, TableName):
+        return {"Table": self.Table(TableName).describe()}
+
+    # Client-level UpdateTable; changes apply at once, so the table never leaves ACTIVE.
+    # Provisioned units are recorded but not enforced.
+    def _update_table(self, TableName, AttributeDefinitions=(), BillingMode=None, ProvisionedThroughput=None,
+                      GlobalSecondaryIndexUpdates=(), StreamSpecification=None, **kwargs):
+        table = self.Table(TableName)
+        with table.lock:
+            definitions = {d["AttributeName"]: d for d in table.attribute_definitions}
+            definitions.update({d["AttributeName"]: d for d in AttributeDefinitions})
+            table.attribute_definitions = list(definitions.values())
+            if BillingMode:
+                table.billing_mode = BillingMode
+                table.provisioned_throughput = ProvisionedThroughput if BillingMode == "PROVISIONED" else None
+            elif ProvisionedThroughput:
+                table.provisioned_throughput = ProvisionedThroughput
+            for update in GlobalSecondaryIndexUpdates:
+                if "Create" in update:
+                    table.add_global_index(update["Create"])
+                elif "Delete" in update:
+                    table.delete_global_index(update["Delete"]["IndexName"])
+            if StreamSpecification is not None:
+                table.stream_specification = dict(StreamSpecification)
+            return {"TableDescription": table.describe()}
+
+    def _update_time_to_live(self, TableName, TimeToLiveSpecification):
+        table = self.Table(TableName)
+        table.ttl_attribute = TimeToLiveSpecification["AttributeName"] if TimeToLiveSpecification["Enabled"] else None
+        return {"TimeToLiveSpecification": dict(TimeToLiveSpecification)}
+
+    def _describe_time_to_live(self, TableName):
+        table = self.Table(TableName)
+        if table.ttl_attribute:
+            return {"TimeToLiveDescription": {"TimeToLiveStatus": "ENABLED", "AttributeName": table.ttl_attribute}}
+        return {"TimeToLiveDescription": {"TimeToLiveStatus": "DISABLED"}}
+
+    # Resource-level BatchGetItem: keys and items are plain Python values, like boto3's resource
+    def batch_get_item(self, RequestItems, **kwargs):
+        if sum(len(request["Keys"]) for request in RequestItems.values()) > MAX_BATCH_GET_KEYS:
+            raise ValidationException("Too many items requested for the BatchGetItem call", "BatchGetItem")
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            options = {k: v for k, v in request.items() if k in ("ProjectionExpression", "ExpressionAttributeNames", "ConsistentRead")}
+            responses[name] = [
+                response["Item"] for response in (table.get_item(Key=key, **options) for key in request["Keys"])
+                if "Item" in response
+            ]
+        return {"Responses": responses, "UnprocessedKeys": {}, "ResponseMetadata": {"HTTPStatusCode": 200, "RetryAttempts": 0}}
+
+    # Client-level TransactWriteItems: attribute values use the low-level typed format ({"S": ...}).
+    # Every condition is checked before anything is written, and a write rejected part way
+    # restores the items already written, so the actions apply all together or not at all.
+    def _transact_write_items(self, TransactItems, **kwargs):
+        operation = "TransactWriteItems"
+        if not 0 < len(TransactItems) <= MAX_TRANSACT_ITEMS:
+            raise ValidationException(f"Member must have length less than or equal to {MAX_TRANSACT_ITEMS}", operation)
+        deserializer = TypeDeserializer()
+        actions, targets = [], set()
+        for action in TransactItems:
+            (kind, spec), = action.items()
+            table = self.Table(spec["TableName"])
+            request = {k: v for k, v in spec.items() if k not in ("TableName", "ReturnValuesOnConditionCheckFailure")}
+            for name in ("Item", "Key", "ExpressionAttributeValues"):
+                if name in request:
+                    request[name] = {k: deserializer.deserialize(v) for k, v in request[name].items()}
+            key = table._key_of(normalize_value(request.get("Item") or request["Key"]), operation)
+            if (table.name, key) in targets:
+                raise ValidationException("Transaction request cannot include multiple operations on one item", operation)
+            targets.add((table.name, key))
+            actions.append((kind, table, key, request))
+
+        # Lock the tables in a fixed order so concurrent transactions cannot deadlock
+        tables = sorted({table.name: table for _, table, _, _ in actions}.values(), key=lambda table: table.name)
+        for table in tables:
+            table.lock.acquire()
+        try:
+            reasons = []
+            for kind, table, key, request in actions:
+                context, expressions = table._context(request, ("ConditionExpression",))
+                try:
+                    table._check_condition(expressions["ConditionExpression"], table._get(*key), context, operation)
+                    reasons.append({"Code": "None"})
+                except ConditionalCheckFailedException:
+                    reasons.append({"Code": "ConditionalCheckFailed", "Message": "The conditional request failed"})
+            if any(reason["Code"] != "None" for reason in reasons):
+                raise TransactionCanceledException(reasons, operation)
+
+            originals = [(table, key, copy_value(table._get(*key))) for _, table, key, _ in actions]
+            try:
+                for kind, table, key, request in actions:
+                    request = {k: v for k, v in request.items() if k != "ConditionExpression"}
+                    if kind == "Put":
+                        table.put_item(**request)
+                    elif kind == "Update":
+                        table.update_item(**request)
+                    elif kind == "Delete":
+                        table.delete_item(**request)
+                    elif kind != "ConditionCheck":
+                        raise ValidationException(f"Unknown transaction action: {kind}", operation)
+            except Exception:
+                for table, key, item in originals:
+                    current = table._get(*key)
+                    if current is not None:
+                        table._delete(*key, current)
+                    if item is not None:
+                        table._store(*key, item, None)
+                raise
+        finally:
+            for table in reversed(tables):
+                table.lock.release()
+        return {"ResponseMetadata": {"HTTPStatusCode": 200, "RetryAttempts": 0}}
+
+    # --- capacity accounting for benchmarks ---
+    def record_capacity(self, table_name, operation, read_units, write_units, items):
+        with self.lock:
+            totals = self.capacity[(table_name, operation)]
+            totals["calls"] += 1
+            totals["read_units"] += read_units
+            totals["write_units"] += write_units
+            totals["items"] += items
+
+    def capacity_totals(self):
+        with self.lock:
+            return {f"{table}.{operation}": dict(totals) for (table, operation), totals in self.capacity.items()}
+
+    def reset_capacity(self):
+        with self.lock:
+            self.capacity.clear()
+
+    # --- snapshots for offline runs ---
+    def save_snapshot(self, path):
+        with self.lock:
+            state = {
+                name: {
+                    "spec": (table.key_schema, table.attribute_definitions,
+                             [table._describe_index(i) for i in table.indexes.values() if i.is_local],
+                             [table._describe_index(i) for i in table.indexes.values() if not i.is_local],
+                             table.billing_mode, table.provisioned_throughput),
+                    "items": [item for partition in table.partitions.values() for item in partition.values()]
+                }
+                for name, table in self.tables.items()
+            }
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    def load_snapshot(self, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        with self.lock:
+            for name, table_state in state.items():
+                key_schema, attribute_definitions, local_indexes, global_indexes, billing_mode, throughput = table_state["spec"]
+                table = self.tables.get(name) or self.create_table(
+                    TableName=name, KeySchema=key_schema, AttributeDefinitions=attribute_definitions,
+                    LocalSecondaryIndexes=local_indexes, GlobalSecondaryIndexes=global_indexes,
+                    BillingMode=billing_mode, ProvisionedThroughput=throughput)
+                for item in table_state["items"]:
+                    table.put_item(Item=item)
+
+
+_resource = None
+_building = None  # The resource being provisioned, seen only by the thread holding the lock
+_resource_lock = threading.RLock()
+
+# Process-wide local resource, with the app's tables created on first use. It is published only
+# once its tables exist and its snapshot is loaded; other threads wait for that on the lock.
+def get_local_dynamodb_resource():
+    global _resource, _building
+    with _resource_lock:
+        if _resource is not None:
+            return _resource
+        if _building is not None:
+            # schema_setup asks for the resource while it provisions it
+            return _building
+        resource = _building = LocalDynamoDBResource()
+        try:
+            # Provision the app's tables through the regular setup script
+            from db_module import schema_setup
+            schema_setup.provision_tables()
+
+            # Optionally persist data between runs
+            snapshot_path = os.environ.get("SMARTREADS_LOCAL_DATA_FILE")
+            if snapshot_path:
+                if os.path.exists(snapshot_path):
+                    resource.load_snapshot(snapshot_path)
+                atexit.register(resource.save_snapshot, snapshot_path)
+        finally:
+            _building = None
+        _resource = resource
+    return _resource
+
+# Empty every local table in place (table objects stay bound in the data layer modules)
+def clear_local_data():
+    resource = get_local_dynamodb_resource()
+    with resource.lock:
+        for table in resource.tables.values():
+            with table.lock:
+                table.partitions.clear()
+                table.sorted_keys.clear()
+                for index in table.indexes.values():
+                    index.partitions.clear()
+        resource.reset_capacity()
+    return resource
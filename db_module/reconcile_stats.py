@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db_module.stats_handler import rebuild_user_stats
+from db_module.dynamo_handler import users_table
+
+# Collect every registered user ID, following scan pagination
+def get_all_user_ids():
+    scan_args = {"ProjectionExpression": "user_id"}
+    user_ids = []
+    while True:
+        response = users_table.scan(**scan_args)
+        user_ids.extend(item["user_id"] for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return user_ids
+        scan_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Rebuild the stats rollup for the given users (all users when none are given)
+def reconcile_stats(user_ids=None):
+    user_ids = user_ids or get_all_user_ids()
+    failed = []
+    for user_id in user_ids:
+        if rebuild_user_stats(user_id) is None:
+            failed.append(user_id)
+    print(f"✅ Rebuilt stats for {len(user_ids) - len(failed)} user(s)!")
+    if failed:
+        print(f"⚠️ Failed to rebuild stats for: {', '.join(failed)}")
+    return failed
+
+# Run reconciliation when this script is run directly, e.g. `python db_module/reconcile_stats.py U1001`
+if __name__ == "__main__":
+    reconcile_stats(sys.argv[1:])
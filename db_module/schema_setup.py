@@ -4,79 +4,348 @@ import os
 # Add parent directory to system path to enable module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
+import time
+
 # Import custom AWS DynamoDB resource
-from config.aws_config import get_dynamodb_resource
+from config.aws_config import get_dynamodb_resource, get_storage_backend
 dynamodb = get_dynamodb_resource()
 
-# Create the books table with user_id as partition key and book_id as sort key
-def create_books_table():
-    try:
-        table = dynamodb.create_table(
-            TableName='ReadingTrackerBooks',
-            KeySchema=[
-                {'AttributeName': 'user_id', 'KeyType': 'HASH'},  # Partition key
-                {'AttributeName': 'book_id', 'KeyType': 'RANGE'}  # Sort key
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'user_id', 'AttributeType': 'S'},  # String type
-                {'AttributeName': 'book_id', 'AttributeType': 'S'}
-            ],
-            BillingMode='PAY_PER_REQUEST'  # On-demand billing
-        )
-        table.wait_until_exists()  # Wait until table is fully created
-        print("✅ ReadingTrackerBooks table created successfully!")
-    except dynamodb.meta.client.exceptions.ResourceInUseException:
-        # Table already exists
-        print("💡 ReadingTrackerBooks table already exists!")
-
-# Create the users table with only user_id as primary key
-def create_users_table():
-    try:
-        table = dynamodb.create_table(
-            TableName='ReadingTrackerUsers',
-            KeySchema=[
-                {'AttributeName': 'user_id', 'KeyType': 'HASH'}  # Partition key
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'user_id', 'AttributeType': 'S'}  # String type
-            ],
-            BillingMode='PAY_PER_REQUEST'  # On-demand billing
-        )
-        table.wait_until_exists()
-        print("✅ ReadingTrackerUsers table created successfully!")
-    except dynamodb.meta.client.exceptions.ResourceInUseException:
-        # Table already exists
-        print("💡 ReadingTrackerUsers table already exists!")
-
-# Create the counters table to store app-wide counters like book ID generator
-def create_counters_table():
+# Secondary indexes and the access patterns they serve
+STATUS_INDEX = 'StatusIndex'  # GSI: a user's books with one status (user_status = "<user_id>#<status>")
+RATING_INDEX = 'RatingIndex'  # LSI: a user's rated books sorted by rating
+HISTORY_INDEX = 'HistoryIndex'  # GSI: a user's books by when they were added
+DEADLINE_INDEX = 'DeadlineIndex'  # GSI: only books with a deadline (sparse), by deadline
+
+# Items carrying this attribute (epoch seconds) are deleted by DynamoDB some time after it passes
+TTL_ATTRIBUTE = 'expires_at'
+
+# Capacity of every table: "on-demand" (default), "provisioned" (the spec's fixed read/write units)
+# or "autoscaling" (provisioned, with target tracking between the spec's min and max units)
+CAPACITY_MODES = ("on-demand", "provisioned", "autoscaling")
+DEFAULT_CAPACITY = {"read": 5, "write": 5, "min": 1, "max": 50, "target": 70.0}
+
+# Seconds between status checks while a table or index change is in progress
+WAIT_INTERVAL = 5
+
+def get_capacity_mode():
+    mode = os.environ.get("SMARTREADS_CAPACITY_MODE", "on-demand").strip().lower()
+    if mode not in CAPACITY_MODES:
+        raise ValueError(f"Unknown capacity mode '{mode}', expected one of: {', '.join(CAPACITY_MODES)}")
+    return mode
+
+# Declarative description of every table. Key attributes are (hash, range) names typed through
+# "attributes"; indexes list (name, hash, range, projection), where projection is "ALL",
+# "KEYS_ONLY" or a list of included attributes. Changes here are applied by provision_tables().
+TABLE_SPECS = {
+    'ReadingTrackerBooks': {
+        "keys": ("user_id", "book_id"),
+        "attributes": {"user_id": "S", "book_id": "S", "user_status": "S", "rating": "N", "timestamp": "S", "deadline": "S"},
+        # Local indexes can only be created with the table; unrated books are simply not in it
+        "local_indexes": [(RATING_INDEX, "user_id", "rating", "ALL")],
+        "global_indexes": [
+            (STATUS_INDEX, "user_status", "book_id", "ALL"),
+            (HISTORY_INDEX, "user_id", "timestamp", "ALL"),
+            (DEADLINE_INDEX, "user_id", "deadline", ["title", "status", "archived"])
+        ],
+        "capacity": {"read": 10, "write": 5},
+        # Feeds the change feed consumer (db_module/change_feed.py)
+        "stream": "NEW_AND_OLD_IMAGES"
+    },
+    'ReadingTrackerUsers': {
+        "keys": ("user_id",),
+        "attributes": {"user_id": "S"}
+    },
+    # App-wide counters such as the book ID generator, plus per-user stats rollups; change feed
+    # checkpoints (db_module/change_feed.py) expire through the TTL attribute
+    'ReadingTrackerCounters': {
+        "keys": ("counter_name",),
+        "attributes": {"counter_name": "S"},
+        "ttl": TTL_ATTRIBUTE,
+        # Global book ID counter (e.g., B1001, B1002, etc.), written when the table is created
+        "seed_items": [{'counter_name': 'book_id_counter', 'current_value': 1000}]
+    },
+    # Tag index maintained by db_module/tag_index.py: per user, one item per (tag, book) pair
+    # ("book#<tag>#<book_id>") plus one counter per tag ("count#<tag>")
+    'ReadingTrackerTags': {
+        "keys": ("user_id", "tag_key"),
+        "attributes": {"user_id": "S", "tag_key": "S"}
+    },
+    # Single-table layout (see db_module/single_table.py): every item of a user shares the partition
+    # key "USER#<user_id>" and the sort key names the entity ("PROFILE", "BOOK#<book_id>"...)
+    'SmartReads': {
+        "keys": ("pk", "sk"),
+        "attributes": {"pk": "S", "sk": "S"}
+    }
+}
+
+def _key_schema(hash_key, range_key=None):
+    schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key:
+        schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return schema
+
+def _projection(projection):
+    if isinstance(projection, str):
+        return {'ProjectionType': projection}
+    return {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': list(projection)}
+
+def _capacity(spec):
+    return {**DEFAULT_CAPACITY, **spec.get("capacity", {})}
+
+def _throughput(spec):
+    capacity = _capacity(spec)
+    return {'ReadCapacityUnits': capacity["read"], 'WriteCapacityUnits': capacity["write"]}
+
+def _index_definition(index, spec, mode):
+    name, hash_key, range_key, projection = index
+    definition = {'IndexName': name, 'KeySchema': _key_schema(hash_key, range_key), 'Projection': _projection(projection)}
+    if mode != "on-demand":
+        definition['ProvisionedThroughput'] = _throughput(spec)
+    return definition
+
+# Only attributes used by a key of the table or one of its indexes may be defined
+def _attribute_definitions(spec, indexes=None):
+    names = list(spec["keys"])
+    for _, hash_key, range_key, _ in spec.get("local_indexes", []) + (spec.get("global_indexes", []) if indexes is None else indexes):
+        names.extend(name for name in (hash_key, range_key) if name)
+    return [{'AttributeName': name, 'AttributeType': spec["attributes"][name]} for name in dict.fromkeys(names)]
+
+def _stream_specification(spec):
+    if spec.get("stream"):
+        return {'StreamEnabled': True, 'StreamViewType': spec["stream"]}
+    return {'StreamEnabled': False}
+
+# create_table arguments for a spec
+def build_create_args(name, spec, mode):
+    args = {
+        'TableName': name,
+        'KeySchema': _key_schema(*spec["keys"]),
+        'AttributeDefinitions': _attribute_definitions(spec)
+    }
+    if spec.get("local_indexes"):
+        args['LocalSecondaryIndexes'] = [_index_definition(index, spec, "on-demand") for index in spec["local_indexes"]]
+    if spec.get("global_indexes"):
+        args['GlobalSecondaryIndexes'] = [_index_definition(index, spec, mode) for index in spec["global_indexes"]]
+    if mode == "on-demand":
+        args['BillingMode'] = 'PAY_PER_REQUEST'  # On-demand billing
+    else:
+        args['BillingMode'] = 'PROVISIONED'
+        args['ProvisionedThroughput'] = _throughput(spec)
+    if spec.get("stream"):
+        args['StreamSpecification'] = _stream_specification(spec)
+    return args
+
+# Current table description, or None when the table does not exist
+def describe_table(name):
     try:
-        table = dynamodb.create_table(
-            TableName='ReadingTrackerCounters',
-            KeySchema=[
-                {'AttributeName': 'counter_name', 'KeyType': 'HASH'}  # Partition key
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'counter_name', 'AttributeType': 'S'}  # String type
-            ],
-            BillingMode='PAY_PER_REQUEST'  # On-demand billing
-        )
-        table.wait_until_exists()
-        print("✅ ReadingTrackerCounters table created successfully!")
-        
-        # Initialize the global book ID counter (e.g., B1001, B1002, etc.)
-        table.put_item(Item={
-            'counter_name': 'book_id_counter',
-            'current_value': 1000  # Starting counter value
-        })
-        print("▶️  Global book ID counter initialized...")
-        
-    except dynamodb.meta.client.exceptions.ResourceInUseException:
-        # Table already exists
-        print("💡 ReadingTrackerCounters table already exists!")
-
-# Execute table creation when this script is run directly
+        return dynamodb.meta.client.describe_table(TableName=name)["Table"]
+    except dynamodb.meta.client.exceptions.ResourceNotFoundException:
+        return None
+
+def describe_ttl(name):
+    description = dynamodb.meta.client.describe_time_to_live(TableName=name).get("TimeToLiveDescription", {})
+    if description.get("TimeToLiveStatus") in ("ENABLED", "ENABLING"):
+        return description.get("AttributeName")
+    return None
+
+def _described_index(index):
+    key_schema = {key['KeyType']: key['AttributeName'] for key in index['KeySchema']}
+    projection = index.get('Projection', {'ProjectionType': 'ALL'})
+    if projection['ProjectionType'] == 'INCLUDE':
+        projection = {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': sorted(projection.get('NonKeyAttributes', []))}
+    return key_schema.get('HASH'), key_schema.get('RANGE'), projection
+
+def _wanted_index(index):
+    projection = _projection(index[3])
+    if 'NonKeyAttributes' in projection:
+        projection['NonKeyAttributes'] = sorted(projection['NonKeyAttributes'])
+    return index[1], index[2], projection
+
+# Changes that bring an existing table in line with its spec, as (action, detail) pairs. Removing
+# indexes or TTL that the spec no longer lists only happens with prune=True; what DynamoDB cannot
+# change in place (keys, local indexes) is reported as a "warn" action.
+def plan_changes(name, spec, mode, prune=False):
+    description = describe_table(name)
+    if description is None:
+        # TTL and auto scaling are set on the table once it exists
+        changes = [("create_table", build_create_args(name, spec, mode))]
+        if spec.get("ttl"):
+            changes.append(("update_ttl", {'Enabled': True, 'AttributeName': spec["ttl"]}))
+        if mode == "autoscaling":
+            changes.append(("autoscaling", spec))
+        return changes
+
+    changes = []
+    key_schema = {key['KeyType']: key['AttributeName'] for key in description['KeySchema']}
+    if (key_schema.get('HASH'), key_schema.get('RANGE')) != tuple(spec["keys"]) + (None,) * (2 - len(spec["keys"])):
+        changes.append(("warn", f"{name} keys differ from the spec; a new table and a data copy are needed"))
+
+    current_local = {index['IndexName']: _described_index(index) for index in description.get('LocalSecondaryIndexes', [])}
+    wanted_local = {index[0]: _wanted_index(index) for index in spec.get("local_indexes", [])}
+    if current_local != wanted_local:
+        changes.append(("warn", f"{name} local indexes differ from the spec; they can only be set when the table is created"))
+
+    billing = description.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+    current_global = {index['IndexName']: _described_index(index) for index in description.get('GlobalSecondaryIndexes', [])}
+    if mode == "on-demand" and billing != 'PAY_PER_REQUEST':
+        changes.append(("update_capacity", {'BillingMode': 'PAY_PER_REQUEST'}))
+    elif mode != "on-demand":
+        throughput = description.get('ProvisionedThroughput', {})
+        current = {'ReadCapacityUnits': throughput.get('ReadCapacityUnits'), 'WriteCapacityUnits': throughput.get('WriteCapacityUnits')}
+        # Under auto scaling the current units are the scaler's to set
+        if billing != 'PROVISIONED' or (mode == "provisioned" and current != _throughput(spec)):
+            update = {'BillingMode': 'PROVISIONED', 'ProvisionedThroughput': _throughput(spec)}
+            # Existing global indexes need their own units when the table leaves on-demand billing
+            if billing != 'PROVISIONED' and current_global:
+                update['GlobalSecondaryIndexUpdates'] = [
+                    {'Update': {'IndexName': index_name, 'ProvisionedThroughput': _throughput(spec)}} for index_name in current_global
+                ]
+            changes.append(("update_capacity", update))
+
+    for index in spec.get("global_indexes", []):
+        if index[0] not in current_global:
+            changes.append(("create_index", index))
+        elif current_global[index[0]] != _wanted_index(index):
+            if prune:
+                changes.extend([("delete_index", index[0]), ("create_index", index)])
+            else:
+                changes.append(("warn", f"{name}.{index[0]} differs from the spec; rerun with --prune to rebuild it"))
+    if prune:
+        wanted_global = {index[0] for index in spec.get("global_indexes", [])}
+        changes.extend(("delete_index", index_name) for index_name in current_global if index_name not in wanted_global)
+
+    current_stream = description.get('StreamSpecification', {'StreamEnabled': False})
+    if spec.get("stream") and current_stream != _stream_specification(spec):
+        changes.append(("update_stream", _stream_specification(spec)))
+    elif not spec.get("stream") and current_stream.get('StreamEnabled') and prune:
+        changes.append(("update_stream", {'StreamEnabled': False}))
+
+    ttl = describe_ttl(name)
+    if spec.get("ttl") and ttl != spec["ttl"]:
+        if ttl:
+            changes.append(("warn", f"{name} has TTL on '{ttl}'; disable it before enabling it on '{spec['ttl']}'"))
+        else:
+            changes.append(("update_ttl", {'Enabled': True, 'AttributeName': spec["ttl"]}))
+    elif not spec.get("ttl") and ttl and prune:
+        changes.append(("update_ttl", {'Enabled': False, 'AttributeName': ttl}))
+
+    if mode == "autoscaling":
+        changes.append(("autoscaling", spec))  # Registering targets and policies is idempotent
+    return changes
+
+# Block until the table and all of its global indexes are ACTIVE again
+def wait_until_active(name):
+    while True:
+        description = describe_table(name)
+        statuses = [description['TableStatus']] + [index.get('IndexStatus', 'ACTIVE') for index in description.get('GlobalSecondaryIndexes', [])]
+        if all(status == 'ACTIVE' for status in statuses):
+            return
+        time.sleep(WAIT_INTERVAL)
+
+# Target tracking on read and write units for the table and each of its global indexes
+def apply_autoscaling(name, spec):
+    if get_storage_backend() != "dynamodb":
+        print(f"💡 Auto scaling is not simulated by the {get_storage_backend()} backend, skipping {name}...")
+        return
+    from config.aws_config import get_aws_session
+
+    client = get_aws_session().client('application-autoscaling')
+    capacity = _capacity(spec)
+    resources = [(f"table/{name}", "table")] + [(f"table/{name}/index/{index[0]}", "index") for index in spec.get("global_indexes", [])]
+    for resource_id, kind in resources:
+        for unit, metric in (("Read", "DynamoDBReadCapacityUtilization"), ("Write", "DynamoDBWriteCapacityUtilization")):
+            dimension = f"dynamodb:{kind}:{unit}CapacityUnits"
+            client.register_scalable_target(ServiceNamespace='dynamodb', ResourceId=resource_id, ScalableDimension=dimension,
+                                            MinCapacity=capacity["min"], MaxCapacity=capacity["max"])
+            client.put_scaling_policy(
+                PolicyName=f"{resource_id.replace('/', '-')}-{unit.lower()}", ServiceNamespace='dynamodb',
+                ResourceId=resource_id, ScalableDimension=dimension, PolicyType='TargetTrackingScaling',
+                TargetTrackingScalingPolicyConfiguration={
+                    'TargetValue': capacity["target"],
+                    'PredefinedMetricSpecification': {'PredefinedMetricType': metric}
+                }
+            )
+
+# One-line summary of a planned change, for --plan
+def describe_change(action, detail):
+    if action == "create_table":
+        return f"create table with {len(detail.get('GlobalSecondaryIndexes', []))} global index(es)"
+    if action == "update_capacity":
+        return f"set billing to {detail['BillingMode']}"
+    if action == "create_index":
+        return f"create index {detail[0]}"
+    if action == "delete_index":
+        return f"delete index {detail}"
+    if action == "update_stream":
+        return f"enable stream ({detail['StreamViewType']})" if detail['StreamEnabled'] else "disable stream"
+    if action == "update_ttl":
+        return f"enable TTL on {detail['AttributeName']}" if detail['Enabled'] else "disable TTL"
+    if action == "autoscaling":
+        return "apply auto scaling targets and policies"
+    return detail
+
+# Apply planned changes one at a time; DynamoDB accepts one index change per update and each must finish first
+def apply_changes(name, spec, changes, mode):
+    client = dynamodb.meta.client
+    for action, detail in changes:
+        if action == "warn":
+            print(f"⚠️ {detail}")
+        elif action == "create_table":
+            table = dynamodb.create_table(**detail)
+            table.wait_until_exists()  # Wait until table is fully created
+            print(f"✅ {name} table created successfully!")
+            for item in spec.get("seed_items", []):
+                table.put_item(Item=item)
+        elif action == "update_capacity":
+            client.update_table(TableName=name, **detail)
+            print(f"▶️  {name}: billing set to {detail['BillingMode']}...")
+        elif action == "create_index":
+            update = {'Create': _index_definition(detail, spec, mode)}
+            client.update_table(TableName=name, AttributeDefinitions=_attribute_definitions(spec, [detail]),
+                                GlobalSecondaryIndexUpdates=[update])
+            print(f"▶️  {name}: creating index {detail[0]}...")
+        elif action == "delete_index":
+            client.update_table(TableName=name, GlobalSecondaryIndexUpdates=[{'Delete': {'IndexName': detail}}])
+            print(f"▶️  {name}: deleting index {detail}...")
+        elif action == "update_stream":
+            client.update_table(TableName=name, StreamSpecification=detail)
+            print(f"▶️  {name}: stream {'enabled' if detail['StreamEnabled'] else 'disabled'}...")
+        elif action == "update_ttl":
+            client.update_time_to_live(TableName=name, TimeToLiveSpecification=detail)
+            print(f"▶️  {name}: TTL {'enabled on ' + detail['AttributeName'] if detail['Enabled'] else 'disabled'}...")
+        elif action == "autoscaling":
+            apply_autoscaling(name, detail)
+        if action not in ("warn", "autoscaling"):
+            wait_until_active(name)
+
+# Create missing tables and update existing ones to match TABLE_SPECS; safe to run repeatedly.
+# With dry_run the planned changes are only printed.
+def provision_tables(names=None, dry_run=False, prune=False, mode=None):
+    mode = mode or get_capacity_mode()
+    planned = {}
+    for name in names or TABLE_SPECS:
+        spec = TABLE_SPECS[name]
+        changes = plan_changes(name, spec, mode, prune)
+        planned[name] = changes
+        if dry_run:
+            for action, detail in changes:
+                print(f"{name}: {describe_change(action, detail)}")
+        elif changes:
+            apply_changes(name, spec, changes, mode)
+        if not changes:
+            print(f"💡 {name} table is up to date!")
+    return planned
+
+# Provision every table when this script is run directly (`--plan` only prints the changes)
 if __name__ == "__main__":
-    create_books_table()
-    create_users_table()
-    create_counters_table()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create or update the app's DynamoDB tables.")
+    parser.add_argument("--plan", action="store_true", help="Print the changes without applying them")
+    parser.add_argument("--prune", action="store_true", help="Also remove indexes, streams and TTL the specs no longer list")
+    parser.add_argument("--capacity", choices=CAPACITY_MODES, help="Override SMARTREADS_CAPACITY_MODE")
+    parser.add_argument("tables", nargs="*", help=f"Only these tables ({', '.join(TABLE_SPECS)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.tables if name not in TABLE_SPECS]
+    if unknown:
+        parser.error(f"unknown table(s): {', '.join(unknown)}")
+    provision_tables(args.tables, dry_run=args.plan, prune=args.prune, mode=args.capacity)
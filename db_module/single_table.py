@@ -0,0 +1,254 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+
+from botocore.exceptions import ClientError
+
+from config.aws_config import get_dynamodb_resource, get_table_layout
+from db_module.book_events import register_book_listener
+from db_module.book_record import books_from_items
+from db_module.stats_handler import apply_stats_delta, format_stats, rebuild_user_stats, stats_delta, STATS_PREFIX
+dynamodb = get_dynamodb_resource()
+
+# Single-table layout: every item of a user lives under the partition key "USER#<user_id>", with
+# the sort key naming the entity, so one query returns a user's whole record set
+single_table = dynamodb.Table('SmartReads')
+
+# Per-entity tables the migration copies from
+books_table = dynamodb.Table('ReadingTrackerBooks')
+users_table = dynamodb.Table('ReadingTrackerUsers')
+counters_table = dynamodb.Table('ReadingTrackerCounters')
+
+# Sort keys within a user's partition; they sort as BOOK#... < PROFILE < RECS < STATS
+BOOK_PREFIX = "BOOK#"
+PROFILE_KEY = "PROFILE"
+RECS_KEY = "RECS"
+STATS_KEY = "STATS"
+
+# User record attributes kept on the RECS item, so profile reads (e.g. login) stay small
+RECOMMENDATION_FIELDS = ["recommendations", "recommendations_updated_at", "preference", "preference_drift"]
+
+MIGRATION_WORKERS = 8
+
+def dual_layout_enabled():
+    return get_table_layout() == "dual"
+
+def user_pk(user_id):
+    return f"USER#{user_id}"
+
+def user_key(user_id, sort_key):
+    return {"pk": user_pk(user_id), "sk": sort_key}
+
+def _without_keys(item):
+    return {name: value for name, value in item.items() if name not in ("pk", "sk")}
+
+# Run a query to completion, following pagination
+def _query_all(table, query_args):
+    items = []
+    while True:
+        response = table.query(**query_args)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def _count_all(table, key_condition):
+    query_args = {"KeyConditionExpression": key_condition, "Select": "COUNT"}
+    total = 0
+    while True:
+        response = table.query(**query_args)
+        total += response.get("Count", 0)
+        if "LastEvaluatedKey" not in response:
+            return total
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# --- Writes mirrored from the per-entity tables while the dual layout is enabled ---
+
+# Book listener: copy a book write and its stats rollup change into the user's partition
+def mirror_book_change(user_id, old_item, new_item):
+    if new_item:
+        single_table.put_item(Item={**new_item, **user_key(user_id, BOOK_PREFIX + new_item["book_id"])})
+    elif old_item:
+        single_table.delete_item(Key=user_key(user_id, BOOK_PREFIX + old_item["book_id"]))
+    apply_stats_delta(user_id, stats_delta(old_item, new_item), table=single_table, key=user_key(user_id, STATS_KEY))
+
+# A new user's partition is complete from the start, so it is marked as migrated right away
+def mirror_user(user_id, record):
+    single_table.put_item(Item={**user_key(user_id, RECS_KEY),
+                                **{k: v for k, v in record.items() if k in RECOMMENDATION_FIELDS}})
+    single_table.put_item(Item={**user_key(user_id, PROFILE_KEY),
+                                **{k: v for k, v in record.items() if k not in RECOMMENDATION_FIELDS},
+                                "migrated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+
+# Apply the same SET that save_recommendations made on the user record
+def mirror_recommendations(user_id, update_expression, expression_values):
+    single_table.update_item(Key=user_key(user_id, RECS_KEY), UpdateExpression=update_expression,
+                             ExpressionAttributeValues=expression_values)
+
+# --- Reads ---
+
+# The user record (profile plus recommendation attributes), or None when the user's partition has
+# not been migrated yet and callers should read the users table instead
+def get_user_record(user_id, fields=None):
+    if fields and not set(fields) & set(RECOMMENDATION_FIELDS):
+        sort_key = Key("sk").eq(PROFILE_KEY)
+    else:
+        sort_key = Key("sk").between(PROFILE_KEY, RECS_KEY)
+    items = {item["sk"]: item for item in _query_all(single_table, {"KeyConditionExpression": Key("pk").eq(user_pk(user_id)) & sort_key})}
+    if PROFILE_KEY not in items:
+        return None
+    record = {**_without_keys(items.get(RECS_KEY, {})), **_without_keys(items[PROFILE_KEY])}
+    record.pop("migrated_at", None)
+    return {name: record[name] for name in fields if name in record} if fields else record
+
+# Everything login and the dashboard need, from one query of the user's partition:
+# {"profile", "books", "stats", "recommendations"}, or None when the user has not been migrated
+def load_user_bundle(user_id):
+    records, books = {}, []
+    for item in _query_all(single_table, {"KeyConditionExpression": Key("pk").eq(user_pk(user_id))}):
+        if item["sk"].startswith(BOOK_PREFIX):
+            books.append(_without_keys(item))
+        else:
+            records[item["sk"]] = _without_keys(item)
+    if PROFILE_KEY not in records:
+        return None
+    return {
+        "profile": records[PROFILE_KEY],
+        "books": books_from_items(books),
+        "stats": format_stats(records.get(STATS_KEY, {})),
+        "recommendations": records.get(RECS_KEY, {}).get("recommendations", [])
+    }
+
+# --- Online migration ---
+
+# Copy one user's books, stats and user record into their partition. The profile goes last: dual
+# reads only switch to the partition once everything else is there. Safe to re-run.
+def migrate_user(user_id):
+    user = users_table.get_item(Key={"user_id": user_id}).get("Item")
+    if user is None:
+        return 0
+    books = _query_all(books_table, {"KeyConditionExpression": Key("user_id").eq(user_id)})
+    stats = counters_table.get_item(Key={"counter_name": f"{STATS_PREFIX}{user_id}"}).get("Item") or rebuild_user_stats(user_id) or {}
+    book_ids = {book["book_id"] for book in books}
+    existing = _query_all(single_table, {
+        "KeyConditionExpression": Key("pk").eq(user_pk(user_id)) & Key("sk").begins_with(BOOK_PREFIX),
+        "ProjectionExpression": "sk"
+    })
+
+    with single_table.batch_writer() as batch:
+        for book in books:
+            batch.put_item(Item={**book, **user_key(user_id, BOOK_PREFIX + book["book_id"])})
+        # Books deleted since an earlier run
+        for item in existing:
+            if item["sk"][len(BOOK_PREFIX):] not in book_ids:
+                batch.delete_item(Key=user_key(user_id, item["sk"]))
+        batch.put_item(Item={**{k: v for k, v in stats.items() if k != "counter_name"}, **user_key(user_id, STATS_KEY)})
+        batch.put_item(Item={**{k: v for k, v in user.items() if k in RECOMMENDATION_FIELDS}, **user_key(user_id, RECS_KEY)})
+
+    single_table.put_item(Item={**{k: v for k, v in user.items() if k not in RECOMMENDATION_FIELDS},
+                                **user_key(user_id, PROFILE_KEY),
+                                "migrated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+
+    repaired = repair_user_books(user_id)
+    if repaired:
+        print(f"⚠️ {user_id}: repaired {repaired} book(s) written while the partition was copied")
+    return len(books)
+
+# Book writes mirrored while migrate_user ran can be overwritten (or deleted books brought back) by
+# its older snapshot. Re-diff the two layouts and repair the partition: copies are only replaced by a
+# newer version, so a write mirrored meanwhile is never rolled back. Returns the number of books repaired.
+def repair_user_books(user_id):
+    # The partition is read first: a book missing from the later legacy read was deleted there,
+    # since book ids are never reused
+    migrated = {item["sk"][len(BOOK_PREFIX):]: _without_keys(item) for item in _query_all(single_table, {
+        "KeyConditionExpression": Key("pk").eq(user_pk(user_id)) & Key("sk").begins_with(BOOK_PREFIX)
+    })}
+    legacy = {book["book_id"]: book for book in _query_all(books_table, {"KeyConditionExpression": Key("user_id").eq(user_id)})}
+
+    repaired = 0
+    for book_id, book in legacy.items():
+        if migrated.get(book_id) == book:
+            continue
+        try:
+            single_table.put_item(
+                Item={**book, **user_key(user_id, BOOK_PREFIX + book_id)},
+                ConditionExpression="attribute_not_exists(sk) OR attribute_not_exists(#v) OR #v < :v",
+                ExpressionAttributeNames={"#v": "version"},
+                ExpressionAttributeValues={":v": book.get("version", 0)}
+            )
+            repaired += 1
+        except ClientError as e:
+            # A newer copy was mirrored in the meantime
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+    for book_id in migrated.keys() - legacy.keys():
+        single_table.delete_item(Key=user_key(user_id, BOOK_PREFIX + book_id))
+        repaired += 1
+
+    # The stats copy came from the same snapshot
+    if repaired:
+        rebuild_user_stats(user_id, table=single_table, key=user_key(user_id, STATS_KEY))
+    return repaired
+
+# Compare a user's book count and profile between the two layouts
+def verify_user(user_id):
+    legacy_books = _count_all(books_table, Key("user_id").eq(user_id))
+    migrated_books = _count_all(single_table, Key("pk").eq(user_pk(user_id)) & Key("sk").begins_with(BOOK_PREFIX))
+    has_profile = "Item" in single_table.get_item(Key=user_key(user_id, PROFILE_KEY))
+    return {"user_id": user_id, "legacy_books": legacy_books, "migrated_books": migrated_books,
+            "ok": has_profile and legacy_books == migrated_books}
+
+# Verify users in parallel (all users when none are given); returns the mismatching ones
+def verify_all(user_ids=None, workers=MIGRATION_WORKERS):
+    from db_module.reconcile_stats import get_all_user_ids
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(verify_user, user_ids or get_all_user_ids()))
+    mismatches = [result for result in results if not result["ok"]]
+    for result in mismatches:
+        print(f"⚠️ {result['user_id']}: {result['legacy_books']} book(s) in ReadingTrackerBooks, "
+              f"{result['migrated_books']} in SmartReads")
+    if not mismatches:
+        print(f"✅ Verified {len(results)} user(s)!")
+    return mismatches
+
+# Migrate users in parallel (all users when none are given), then verify every copied partition
+def migrate_all(user_ids=None, workers=MIGRATION_WORKERS, verify=True):
+    from db_module.reconcile_stats import get_all_user_ids
+
+    user_ids = user_ids or get_all_user_ids()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        copied = sum(pool.map(migrate_user, user_ids))
+    print(f"✅ Copied {copied} book(s) of {len(user_ids)} user(s) in {time.perf_counter() - started:.2f}s!")
+    return verify_all(user_ids, workers) if verify else []
+
+# Keep migrated partitions current while both layouts are in use
+if dual_layout_enabled():
+    register_book_listener(mirror_book_change)
+
+# Migrate with `python db_module/single_table.py --migrate [U1001 ...]`, re-check with `--verify`
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-table layout migration.")
+    parser.add_argument("--migrate", action="store_true", help="Copy users into the single table, then verify")
+    parser.add_argument("--verify", action="store_true", help="Only compare book counts between the layouts")
+    parser.add_argument("--workers", type=int, default=MIGRATION_WORKERS, help="Users migrated in parallel")
+    parser.add_argument("user_ids", nargs="*", help="Only these users")
+    args = parser.parse_args()
+
+    if args.migrate:
+        mismatches = migrate_all(args.user_ids, args.workers)
+    elif args.verify:
+        mismatches = verify_all(args.user_ids, args.workers)
+    else:
+        parser.print_help()
+        mismatches = []
+    sys.exit(1 if mismatches else 0)
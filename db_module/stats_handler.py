@@ -0,0 +1,324 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+
+# Import DynamoDB resource from config
+from config.aws_config import get_dynamodb_resource
+dynamodb = get_dynamodb_resource()
+
+# Per-user stats items live next to the global counters
+books_table = dynamodb.Table('ReadingTrackerBooks')
+counters_table = dynamodb.Table('ReadingTrackerCounters')
+
+STATS_PREFIX = "stats#"
+GENRE_PREFIX = "genre#"
+COMPLETED_PREFIX = "completed#"  # Books completed per month, e.g. completed#2025-07
+PAGES_PREFIX = "pages#"  # Pages of the books completed per month
+STATUS_PREFIX = "status#"  # Books per status, e.g. status#reading
+RATING_PREFIX = "rating#"  # Books per star rating, e.g. rating#4
+
+# Counter attributes kept on every stats item
+STATS_COUNTERS = ["total_books", "completed_books", "rating_sum", "rated_books"]
+
+# Attributes a book contributes to the rollup
+STATS_SOURCE_FIELDS = ["status", "rating", "genre", "total_pages", "completed_at", "timestamp"]
+
+# Last stream record applied to a stats item, as a zero-padded string so sequence numbers of any
+# length compare in order
+SEQUENCE_ATTRIBUTE = "stream_sequence"
+SEQUENCE_WIDTH = 40
+
+# Bumped by every write to a stats item, so a rebuild can tell whether deltas landed while it counted
+REVISION_ATTRIBUTE = "stats_revision"
+REBUILD_ATTEMPTS = 5
+
+def _stats_key(user_id):
+    return {"counter_name": f"{STATS_PREFIX}{user_id}"}
+
+# Counters a single book contributes to the rollup
+def book_stats_contribution(book):
+    contribution = {}
+    if not book:
+        return contribution
+    contribution["total_books"] = 1
+    status = str(book.get("status") or "").lower()
+    if status:
+        contribution[f"{STATUS_PREFIX}{status}"] = 1
+    if status == "completed":
+        contribution["completed_books"] = 1
+        # Books completed before completed_at was recorded fall back to when they were added
+        completed_at = book.get("completed_at") or book.get("timestamp")
+        if completed_at:
+            month = str(completed_at)[:7]
+            contribution[f"{COMPLETED_PREFIX}{month}"] = 1
+            contribution[f"{PAGES_PREFIX}{month}"] = int(book.get("total_pages") or 0)
+    rating = book.get("rating")
+    if rating not in (None, "", "None"):
+        contribution["rating_sum"] = Decimal(str(rating))
+        contribution["rated_books"] = 1
+        contribution[f"{RATING_PREFIX}{int(round(float(rating)))}"] = 1
+    genre = str(book.get("genre") or "").strip().lower()
+    if genre:
+        contribution[f"{GENRE_PREFIX}{genre}"] = 1
+    return contribution
+
+# Difference between two snapshots of a book; either side may be None for add/delete
+def stats_delta(old_book, new_book):
+    delta = defaultdict(int)
+    for name, value in book_stats_contribution(new_book).items():
+        delta[name] += value
+    for name, value in book_stats_contribution(old_book).items():
+        delta[name] -= value
+    return {name: value for name, value in delta.items() if value != 0}
+
+# Atomically apply counter deltas to the user's stats item with a single ADD
+# (table and key address a copy of the rollup kept elsewhere, e.g. in the single-table layout)
+def apply_stats_delta(user_id, delta, table=None, key=None):
+    if not delta:
+        return True
+    key = key or _stats_key(user_id)
+    try:
+        expr_names = {"#key": next(iter(key)), "#rev": REVISION_ATTRIBUTE}
+        expr_values = {":one": 1}
+        add_parts = ["#rev :one"]
+        for i, (name, value) in enumerate(delta.items()):
+            expr_names[f"#c{i}"] = name
+            expr_values[f":c{i}"] = value
+            add_parts.append(f"#c{i} :c{i}")
+
+        # Only add to an existing item, so users without one never end up with a partial rollup
+        (table or counters_table).update_item(
+            Key=key,
+            UpdateExpression="ADD " + ", ".join(add_parts),
+            ConditionExpression="attribute_exists(#key)",
+            ExpressionAttributeNames=expr_names,
+            ExpressionAttributeValues=expr_values
+        )
+        return True
+    except Exception as e:
+        from db_module.dynamo_handler import is_condition_failure
+
+        if is_condition_failure(e):
+            # No stats item yet (a user from before the rollup, or a new user): build it from the
+            # books, which already include this change
+            return rebuild_user_stats(user_id, table=table, key=key) is not None
+        # A missed delta is repaired by the reconciliation job
+        print(f"Error updating reading stats...")
+        return False
+
+# Apply the rollup change caused by moving a book from one state to another
+def record_book_change(user_id, old_book, new_book):
+    return apply_stats_delta(user_id, stats_delta(old_book, new_book))
+
+# Apply a batch of (user_id, old_book, new_book) changes with a single ADD per user
+def record_book_changes(changes):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for user_id, old_book, new_book in changes:
+        for name, value in stats_delta(old_book, new_book).items():
+            deltas[user_id][name] += value
+    results = [apply_stats_delta(user_id, {name: value for name, value in delta.items() if value != 0})
+               for user_id, delta in deltas.items()]
+    return all(results)
+
+# Apply a batch of stream records, (user_id, old_book, new_book) changes with their sequence numbers,
+# exactly once: each user's stats item remembers the last record applied, so records redelivered after
+# a consumer failure or restart are skipped instead of being added twice
+def record_stream_changes(changes, sequence_numbers):
+    by_user = defaultdict(list)
+    for (user_id, old_book, new_book), sequence_number in zip(changes, sequence_numbers):
+        by_user[user_id].append((str(sequence_number).zfill(SEQUENCE_WIDTH), old_book, new_book))
+    results = [_apply_user_stream_changes(user_id, records) for user_id, records in by_user.items()]
+    return all(results)
+
+def _apply_user_stream_changes(user_id, records):
+    try:
+        item = counters_table.get_item(Key=_stats_key(user_id), ProjectionExpression="#k, #s",
+                                       ExpressionAttributeNames={"#k": "counter_name", "#s": SEQUENCE_ATTRIBUTE}).get("Item")
+        last_sequence = max(sequence for sequence, _, _ in records)
+        expr_names = {"#s": SEQUENCE_ATTRIBUTE, "#rev": REVISION_ATTRIBUTE}
+        expr_values = {":seq": last_sequence, ":one": 1}
+        if item is None:
+            # The rebuilt item already includes these records
+            if rebuild_user_stats(user_id) is None:
+                return False
+            counters_table.update_item(Key=_stats_key(user_id), UpdateExpression="SET #s = :seq",
+                                       ExpressionAttributeNames=expr_names, ExpressionAttributeValues=expr_values)
+            return True
+
+        applied = item.get(SEQUENCE_ATTRIBUTE, "")
+        if last_sequence <= applied:
+            return True  # Every record was applied before
+        delta = defaultdict(int)
+        for sequence, old_book, new_book in records:
+            if sequence > applied:
+                for name, value in stats_delta(old_book, new_book).items():
+                    delta[name] += value
+
+        add_parts = ["#rev :one"]
+        for i, (name, value) in enumerate((name, value) for name, value in delta.items() if value != 0):
+            expr_names[f"#c{i}"] = name
+            expr_values[f":c{i}"] = value
+            add_parts.append(f"#c{i} :c{i}")
+        if applied:
+            condition = "#s = :applied"
+            expr_values[":applied"] = applied
+        else:
+            condition = "attribute_not_exists(#s)"
+
+        # The condition fails if another consumer applied records since the read; they are then skipped
+        counters_table.update_item(
+            Key=_stats_key(user_id),
+            UpdateExpression="SET #s = :seq ADD " + ", ".join(add_parts),
+            ConditionExpression=condition,
+            ExpressionAttributeNames=expr_names,
+            ExpressionAttributeValues=expr_values
+        )
+        return True
+    except Exception as e:
+        # A missed delta is repaired by the reconciliation job
+        print(f"Error updating reading stats...")
+        return False
+
+# Convert a raw stats item into the headline metrics used by the dashboard
+def format_stats(item):
+    total_books = int(item.get("total_books", 0))
+    completed_books = int(item.get("completed_books", 0))
+    rated_books = int(item.get("rated_books", 0))
+    rating_sum = float(item.get("rating_sum", 0))
+    genre_counts = _prefixed_counts(item, GENRE_PREFIX)
+    return {
+        "monthly": _monthly_series(item, fill_gaps=True),
+        "total_books": total_books,
+        "completed_books": completed_books,
+        "pending_books": total_books - completed_books,
+        "rated_books": rated_books,
+        "avg_rating": rating_sum / rated_books if rated_books else 0.0,
+        "genre_counts": dict(sorted(genre_counts.items(), key=lambda kv: kv[1], reverse=True)),
+        "status_counts": _prefixed_counts(item, STATUS_PREFIX),
+        "rating_counts": {int(rating): count for rating, count in _prefixed_counts(item, RATING_PREFIX).items()}
+    }
+
+# Positive counters sharing a prefix, keyed by the rest of the name
+def _prefixed_counts(item, prefix):
+    return {
+        name[len(prefix):]: int(count)
+        for name, count in item.items()
+        if name.startswith(prefix) and int(count) > 0
+    }
+
+# Build the sorted per-month series of completed books and pages from a stats item
+def _monthly_series(item, fill_gaps=False):
+    months = defaultdict(lambda: {"books_completed": 0, "pages_completed": 0})
+    for name, value in item.items():
+        if name.startswith(COMPLETED_PREFIX):
+            months[name[len(COMPLETED_PREFIX):]]["books_completed"] = int(value)
+        elif name.startswith(PAGES_PREFIX):
+            months[name[len(PAGES_PREFIX):]]["pages_completed"] = int(value)
+
+    # Drop months whose counters have been decremented back to zero
+    series = {month: counts for month, counts in months.items() if counts["books_completed"] > 0}
+    if fill_gaps and series:
+        first, last = min(series), max(series)
+        year, month = int(first[:4]), int(first[5:7])
+        while f"{year:04d}-{month:02d}" <= last:
+            series.setdefault(f"{year:04d}-{month:02d}", {"books_completed": 0, "pages_completed": 0})
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return [{"month": month, **series[month]} for month in sorted(series)]
+
+# Fetch the precomputed stats for a user with a single get_item
+def get_user_stats(user_id, rebuild_missing=True):
+    try:
+        response = counters_table.get_item(Key=_stats_key(user_id))
+        item = response.get("Item")
+        if item is None:
+            # Users created before the rollup existed get it built on first read
+            if not rebuild_missing:
+                return None
+            item = rebuild_user_stats(user_id)
+            if item is None:
+                return None
+        return format_stats(item)
+    except Exception as e:
+        print(f"Error fetching reading stats...")
+        return None
+
+# Sum the rollup counters over all of a user's books
+def _count_user_books(user_id):
+    names = {f"#p{i}": field for i, field in enumerate(STATS_SOURCE_FIELDS)}
+    query_args = {
+        "KeyConditionExpression": Key("user_id").eq(user_id),
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+    totals = defaultdict(int)
+    while True:
+        response = books_table.query(**query_args)
+        for book in response.get("Items", []):
+            for name, value in book_stats_contribution(book).items():
+                totals[name] += value
+        if "LastEvaluatedKey" not in response:
+            return totals
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Recompute a user's stats item from scratch (reconciliation); table and key as for apply_stats_delta.
+# The item is replaced only if no delta landed while the books were counted (retrying otherwise), and
+# keeps the stream checkpoint so redelivered stream records are still recognized.
+def rebuild_user_stats(user_id, table=None, key=None):
+    stats_table = table or counters_table
+    key = key or _stats_key(user_id)
+    from db_module.dynamo_handler import is_condition_failure
+
+    try:
+        for _ in range(REBUILD_ATTEMPTS):
+            current = stats_table.get_item(Key=key, ConsistentRead=True).get("Item")
+            item = {name: 0 for name in STATS_COUNTERS}
+            item.update(_count_user_books(user_id))
+            item.update(key)
+            item["rebuilt_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            expr_values = {}
+            if current is None:
+                expr_names = {"#key": next(iter(key))}
+                condition = "attribute_not_exists(#key)"
+            else:
+                expr_names = {"#rev": REVISION_ATTRIBUTE}
+                if REVISION_ATTRIBUTE in current:
+                    expr_values[":rev"] = current[REVISION_ATTRIBUTE]
+                    condition = "#rev = :rev"
+                else:
+                    condition = "attribute_not_exists(#rev)"
+            item[REVISION_ATTRIBUTE] = int((current or {}).get(REVISION_ATTRIBUTE, 0)) + 1
+            if current and SEQUENCE_ATTRIBUTE in current:
+                item[SEQUENCE_ATTRIBUTE] = current[SEQUENCE_ATTRIBUTE]
+
+            try:
+                stats_table.put_item(Item=item, ConditionExpression=condition, ExpressionAttributeNames=expr_names,
+                                     **({"ExpressionAttributeValues": expr_values} if expr_values else {}))
+                return item
+            except Exception as e:
+                if not is_condition_failure(e):
+                    raise
+        print(f"Error rebuilding reading stats: the rollup kept changing...")
+        return None
+    except Exception as e:
+        print(f"Error rebuilding reading stats...")
+        return None
+
+# Monthly reading time series (books and pages completed per month) for trend charts
+def get_reading_timeseries(user_id, fill_gaps=True):
+    try:
+        response = counters_table.get_item(Key=_stats_key(user_id))
+        item = response.get("Item") or rebuild_user_stats(user_id)
+        return _monthly_series(item, fill_gaps) if item else []
+    except Exception as e:
+        print(f"Error fetching reading time series...")
+        return []
@@ -0,0 +1,221 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import threading
+from datetime import datetime
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeSerializer
+
+from config.aws_config import get_dynamodb_resource
+from db_module.book_record import books_from_items
+dynamodb = get_dynamodb_resource()
+
+TAGS_TABLE = 'ReadingTrackerTags'
+tags_table = dynamodb.Table(TAGS_TABLE)
+counters_table = dynamodb.Table('ReadingTrackerCounters')
+
+# Sort key prefixes in the tags table: "book#<tag>#<book_id>" links a tag to a book,
+# "count#<tag>" holds how many of the user's books carry the tag
+BOOK_PREFIX = "book#"
+COUNT_PREFIX = "count#"
+
+# Marker item in the counters table, written once a user's tag index has been built from their books
+TAG_INDEX_MARKER_PREFIX = "tag_index#"
+
+# DynamoDB limits: actions per transaction and keys per BatchGetItem call
+MAX_TRANSACTION_ACTIONS = 100
+BATCH_GET_LIMIT = 100
+
+_serializer = TypeSerializer()
+
+# Transactions go through the low-level client, which takes typed attribute values ({"S": ...})
+def to_attribute_values(values):
+    return {name: _serializer.serialize(value) for name, value in values.items()}
+
+# Clean tag list from a comma-separated string or a list: stripped, without blanks or repeats
+def normalize_tags(tags):
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    cleaned = []
+    for tag in tags or []:
+        tag = str(tag).strip()
+        if tag and tag not in cleaned:
+            cleaned.append(tag)
+    return cleaned
+
+def book_tag_key(tag, book_id):
+    return f"{BOOK_PREFIX}{tag}#{book_id}"
+
+def _count_action(user_id, tag, change):
+    return {"Update": {
+        "TableName": TAGS_TABLE,
+        "Key": to_attribute_values({"user_id": user_id, "tag_key": COUNT_PREFIX + tag}),
+        "UpdateExpression": "SET #tag = :tag ADD book_count :change",
+        "ExpressionAttributeNames": {"#tag": "tag"},
+        "ExpressionAttributeValues": to_attribute_values({":tag": tag, ":change": change})
+    }}
+
+# Transaction actions moving a book's tag links and tag counters from old_tags to new_tags
+def tag_actions(user_id, book_id, old_tags, new_tags):
+    old_tags, new_tags = normalize_tags(old_tags), normalize_tags(new_tags)
+    actions = []
+    for tag in new_tags:
+        if tag not in old_tags:
+            actions.append({"Put": {
+                "TableName": TAGS_TABLE,
+                "Item": to_attribute_values({"user_id": user_id, "tag_key": book_tag_key(tag, book_id),
+                                             "tag": tag, "book_id": book_id})
+            }})
+            actions.append(_count_action(user_id, tag, 1))
+    for tag in old_tags:
+        if tag not in new_tags:
+            actions.append({"Delete": {
+                "TableName": TAGS_TABLE,
+                "Key": to_attribute_values({"user_id": user_id, "tag_key": book_tag_key(tag, book_id)})
+            }})
+            actions.append(_count_action(user_id, tag, -1))
+    return actions
+
+# Apply a book write and its tag index changes in one transaction, so they succeed or fail together
+def transact_write(actions):
+    if len(actions) > MAX_TRANSACTION_ACTIONS:
+        raise ValueError(f"A single change can add or remove at most {(MAX_TRANSACTION_ACTIONS - 1) // 2} tags")
+    dynamodb.meta.client.transact_write_items(TransactItems=actions)
+
+# Run one query on the tags table to completion, following pagination
+def _query_tags(query_args):
+    items = []
+    while True:
+        response = tags_table.query(**query_args)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Ids of the user's books carrying a tag, from one query on the tag's links
+def book_ids_by_tag(user_id, tag):
+    items = _query_tags({
+        "KeyConditionExpression": Key("user_id").eq(user_id) & Key("tag_key").begins_with(book_tag_key(tag, "")),
+        "FilterExpression": Attr("tag").eq(tag),  # "a#b" links share the "book#a#" prefix
+        "ProjectionExpression": "book_id"
+    })
+    return [item["book_id"] for item in items]
+
+# Book items for the given ids, read with batched key lookups; returns (items, number of requests made)
+def get_book_items(user_id, book_ids, fields=None):
+    from db_module.dynamo_handler import books_table, build_projection  # dynamo_handler writes through this module
+
+    if fields and "book_id" not in fields:
+        fields = list(fields) + ["book_id"]
+    items, requests = [], 0
+    for start in range(0, len(book_ids), BATCH_GET_LIMIT):
+        request = {"Keys": [{"user_id": user_id, "book_id": book_id} for book_id in book_ids[start:start + BATCH_GET_LIMIT]],
+                   **build_projection(fields)}
+        # Retry whatever DynamoDB could not return within one call
+        while request["Keys"]:
+            response = dynamodb.batch_get_item(RequestItems={books_table.name: request})
+            requests += 1
+            items.extend(response.get("Responses", {}).get(books_table.name, []))
+            request["Keys"] = response.get("UnprocessedKeys", {}).get(books_table.name, {}).get("Keys", [])
+    return items, requests
+
+# The user's books carrying a tag. This is a two-step read, not a single query: the tag links only hold
+# book ids (copying book fields onto them would mean rewriting every link on each edit), so one query
+# finds the ids and batched key lookups then read the books.
+def books_by_tag(user_id, tag, fields=None):
+    try:
+        items, _ = get_book_items(user_id, book_ids_by_tag(user_id, tag), fields)
+        return sorted(books_from_items(items), key=lambda book: book.get("book_id") or "")
+    except Exception as e:
+        print(f"Fetching books by tag failed...")
+        return []
+
+# How many of the user's books carry each tag, from one query on the counters: {tag: count}, most used first
+def tag_counts(user_id):
+    try:
+        items = _query_tags({
+            "KeyConditionExpression": Key("user_id").eq(user_id) & Key("tag_key").begins_with(COUNT_PREFIX),
+            "ProjectionExpression": "#tag, book_count",
+            "ExpressionAttributeNames": {"#tag": "tag"}
+        })
+        counts = {item["tag"]: int(item.get("book_count", 0)) for item in items}
+        return dict(sorted(((tag, count) for tag, count in counts.items() if count > 0), key=lambda entry: (-entry[1], entry[0])))
+    except Exception as e:
+        print(f"Fetching tag counts failed...")
+        return {}
+
+# Rebuild a user's tag index from their books, e.g. for books stored before the index existed:
+# `python db_module/tag_index.py --backfill U1001` (all users when none are given)
+def rebuild_tag_index(user_id):
+    from db_module.dynamo_handler import books_table, build_projection
+
+    books = []
+    query_args = {"KeyConditionExpression": Key("user_id").eq(user_id), **build_projection(["book_id", "tags"])}
+    while True:
+        response = books_table.query(**query_args)
+        books.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    links, counts = {}, {}
+    for book in books:
+        for tag in normalize_tags(book.get("tags")):
+            links[book_tag_key(tag, book["book_id"])] = {"tag": tag, "book_id": book["book_id"]}
+            counts[tag] = counts.get(tag, 0) + 1
+
+    wanted = set(links) | {COUNT_PREFIX + tag for tag in counts}
+    existing = _query_tags({"KeyConditionExpression": Key("user_id").eq(user_id), "ProjectionExpression": "tag_key"})
+    with tags_table.batch_writer() as batch:
+        for item in existing:
+            if item["tag_key"] not in wanted:
+                batch.delete_item(Key={"user_id": user_id, "tag_key": item["tag_key"]})
+        for tag_key, link in links.items():
+            batch.put_item(Item={"user_id": user_id, "tag_key": tag_key, **link})
+        for tag, count in counts.items():
+            batch.put_item(Item={"user_id": user_id, "tag_key": COUNT_PREFIX + tag, "tag": tag, "book_count": count})
+    counters_table.put_item(Item={"counter_name": TAG_INDEX_MARKER_PREFIX + user_id,
+                                  "built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    with _tag_index_lock:
+        _tag_index_ready.add(user_id)
+    return counts
+
+_tag_index_ready = set()
+_tag_index_lock = threading.Lock()
+
+# Whether the tag index holds all of a user's books. Books stored before the index existed have no
+# links, so the first tag query of a user without the marker item rebuilds their index.
+def tag_index_complete(user_id):
+    with _tag_index_lock:
+        if user_id in _tag_index_ready:
+            return True
+    try:
+        if "Item" not in counters_table.get_item(Key={"counter_name": TAG_INDEX_MARKER_PREFIX + user_id}):
+            rebuild_tag_index(user_id)
+    except Exception as e:
+        print(f"Error building the tag index...")
+        return False
+    with _tag_index_lock:
+        _tag_index_ready.add(user_id)
+    return True
+
+def backfill_tag_index(user_ids=None):
+    from db_module.reconcile_stats import get_all_user_ids
+
+    user_ids = user_ids or get_all_user_ids()
+    for user_id in user_ids:
+        rebuild_tag_index(user_id)
+    print(f"✅ Rebuilt the tag index for {len(user_ids)} user(s)!")
+    return len(user_ids)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag index maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild the tag index from the books table")
+    parser.add_argument("user_ids", nargs="*", help="Only these users")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill_tag_index(args.user_ids)
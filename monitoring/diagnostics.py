@@ -0,0 +1,85 @@
+import streamlit as st
+import pandas as pd
+
+from monitoring.metrics import registry, METRICS_FILE
+from catalog.catalog import get_catalog, is_catalog_loaded
+
+# Hidden page (open with ?diagnostics=1) showing the hot-path metrics collected by this process
+def show_diagnostics():
+    st.title("🩺 Diagnostics")
+    st.caption("Metrics for this server process since it started. Not linked from the navigation.")
+
+    snapshot = registry.snapshot()
+    histograms = pd.DataFrame(snapshot["histograms"])
+    counters = pd.DataFrame(snapshot["counters"])
+
+    if histograms.empty and counters.empty:
+        st.info("No metrics recorded yet.")
+        return
+
+    def series_table(frame, name, columns):
+        rows = frame[frame["name"] == name] if not frame.empty else frame
+        if rows.empty:
+            return pd.DataFrame()
+        labels = pd.DataFrame(list(rows["labels"]), index=rows.index)
+        return pd.concat([labels, rows[columns]], axis=1).reset_index(drop=True)
+
+    # --- DynamoDB latency per table/operation, joined with items, capacity and errors ---
+    st.subheader("DynamoDB Calls")
+    latency = series_table(histograms, "dynamodb_request_duration_ms", ["count", "mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+    if latency.empty:
+        st.write("No DynamoDB calls recorded.")
+    else:
+        for metric, column in [("dynamodb_items_total", "items"), ("dynamodb_scanned_items_total", "scanned"),
+                               ("dynamodb_consumed_capacity_units_total", "capacity_units"),
+                               ("dynamodb_retries_total", "retries")]:
+            values = series_table(counters, metric, ["value"])
+            if values.empty:
+                latency[column] = 0
+                continue
+            values = values.groupby(["table", "operation"], as_index=False)["value"].sum().rename(columns={"value": column})
+            latency = latency.merge(values, on=["table", "operation"], how="left")
+        latency = latency.fillna(0).sort_values("count", ascending=False)
+        st.dataframe(latency.round(2), use_container_width=True, hide_index=True)
+
+    errors = series_table(counters, "dynamodb_errors_total", ["value"])
+    if not errors.empty:
+        st.markdown("**Errors by code**")
+        st.dataframe(errors.rename(columns={"value": "count"}), use_container_width=True, hide_index=True)
+
+    # --- Page handler wall time ---
+    st.subheader("Page Renders")
+    pages = series_table(histograms, "page_render_duration_ms", ["count", "mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+    if pages.empty:
+        st.write("No page renders recorded.")
+    else:
+        st.dataframe(pages.sort_values("count", ascending=False).round(2), use_container_width=True, hide_index=True)
+
+    page_errors = series_table(counters, "page_errors_total", ["value"])
+    if not page_errors.empty:
+        st.markdown("**Page errors**")
+        st.dataframe(page_errors.rename(columns={"value": "count"}), use_container_width=True, hide_index=True)
+
+    # --- Shared catalog (one copy per process, not per session) ---
+    st.subheader("Book Catalog")
+    if is_catalog_loaded():
+        catalog = get_catalog()
+        st.write(f"{len(catalog)} books, {len(catalog.genre_index)} genres, "
+                 f"~{catalog.memory_bytes() / (1024 * 1024):.1f} MB shared by all sessions.")
+    else:
+        st.write("Not loaded in this process yet.")
+
+    # --- Prometheus text exposition ---
+    st.subheader("Prometheus Export")
+    prometheus_text = registry.render_prometheus()
+    st.write(f"Dumped periodically to `{METRICS_FILE}`.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Download metrics", data=prometheus_text, file_name="smartreads_metrics.prom",
+                           mime="text/plain", use_container_width=True)
+    with col2:
+        if st.button("🧹 Reset metrics", use_container_width=True):
+            registry.reset()
+            st.rerun()
+    with st.expander("Raw metrics"):
+        st.code(prometheus_text, language="text")
@@ -0,0 +1,185 @@
+import time
+
+from botocore.exceptions import ClientError
+
+from monitoring.metrics import registry
+
+# Record one finished DynamoDB call into the registry
+def record_call(table_name, operation, seconds, response=None, error=None):
+    labels = {"table": table_name, "operation": operation}
+    outcome = "ok" if error is None else "error"
+    registry.observe("dynamodb_request_duration_ms", seconds * 1000, labels=labels,
+                     help_text="Client-side latency of DynamoDB calls")
+    registry.inc("dynamodb_requests_total", labels={**labels, "outcome": outcome},
+                 help_text="DynamoDB calls by outcome")
+
+    if error is not None:
+        code = error.response.get("Error", {}).get("Code", "Unknown") if isinstance(error, ClientError) else type(error).__name__
+        registry.inc("dynamodb_errors_total", labels={**labels, "code": code},
+                     help_text="Failed DynamoDB calls by error code")
+        metadata = getattr(error, "response", {}).get("ResponseMetadata", {}) if isinstance(error, ClientError) else {}
+    else:
+        metadata = response.get("ResponseMetadata", {})
+        if "Items" in response:
+            items = response.get("Count", len(response["Items"]))
+        elif "Count" in response:
+            items = response["Count"]  # Select=COUNT
+        else:
+            items = 1 if response.get("Item") or response.get("Attributes") else 0
+        registry.inc("dynamodb_items_total", items, labels=labels,
+                     help_text="Items returned by DynamoDB calls")
+        if "ScannedCount" in response:
+            registry.inc("dynamodb_scanned_items_total", response["ScannedCount"], labels=labels,
+                         help_text="Items read by DynamoDB before filtering")
+
+        capacity = response.get("ConsumedCapacity")
+        for entry in capacity if isinstance(capacity, list) else [capacity] if capacity else []:
+            registry.inc("dynamodb_consumed_capacity_units_total", float(entry.get("CapacityUnits", 0)), labels=labels,
+                         help_text="Capacity units reported by ReturnConsumedCapacity")
+
+    retries = metadata.get("RetryAttempts", 0)
+    if retries:
+        registry.inc("dynamodb_retries_total", retries, labels=labels,
+                     help_text="SDK retries spent on DynamoDB calls")
+
+class InstrumentedTable:
+    def __init__(self, table):
+        self._table = table
+
+    def _call(self, operation, kwargs):
+        kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+        started = time.perf_counter()
+        try:
+            response = getattr(self._table, operation)(**kwargs)
+        except Exception as e:
+            record_call(self._table.name, operation, time.perf_counter() - started, error=e)
+            raise
+        record_call(self._table.name, operation, time.perf_counter() - started, response=response)
+        return response
+
+    def get_item(self, **kwargs):
+        return self._call("get_item", kwargs)
+
+    def put_item(self, **kwargs):
+        return self._call("put_item", kwargs)
+
+    def update_item(self, **kwargs):
+        return self._call("update_item", kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._call("delete_item", kwargs)
+
+    def query(self, **kwargs):
+        return self._call("query", kwargs)
+
+    def scan(self, **kwargs):
+        return self._call("scan", kwargs)
+
+    # Batch writes go straight to the client, only the number of buffered items is counted
+    def batch_writer(self, *args, **kwargs):
+        return InstrumentedBatchWriter(self._table.name, self._table.batch_writer(*args, **kwargs))
+
+    # Everything else (name, meta, key_schema, wait_until_exists...) is the wrapped table's
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+class InstrumentedBatchWriter:
+    def __init__(self, table_name, writer):
+        self._table_name = table_name
+        self._writer = writer
+
+    def __enter__(self):
+        self._writer.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        started = time.perf_counter()
+        try:
+            return self._writer.__exit__(*exc_info)
+        finally:
+            registry.observe("dynamodb_request_duration_ms", (time.perf_counter() - started) * 1000,
+                             labels={"table": self._table_name, "operation": "batch_write_flush"})
+
+    def put_item(self, **kwargs):
+        registry.inc("dynamodb_items_total", labels={"table": self._table_name, "operation": "batch_put_item"})
+        return self._writer.put_item(**kwargs)
+
+    def delete_item(self, **kwargs):
+        registry.inc("dynamodb_items_total", labels={"table": self._table_name, "operation": "batch_delete_item"})
+        return self._writer.delete_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+# The part of a multi-table response (batch get, transaction) that belongs to one table; SDK retries
+# are only counted once, under the first table
+def _table_share(response, table_name, first):
+    share = {"ConsumedCapacity": [entry for entry in response.get("ConsumedCapacity", []) if entry.get("TableName") == table_name]}
+    if "Responses" in response:
+        share["Items"] = response["Responses"].get(table_name, [])
+    if first:
+        share["ResponseMetadata"] = response.get("ResponseMetadata", {})
+    return share
+
+# Time a call that spans tables, recording it once per table it touched
+def _call_multi_table(call, operation, table_names, kwargs):
+    kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+    started = time.perf_counter()
+    try:
+        response = call(**kwargs)
+    except Exception as e:
+        for table_name in table_names:
+            record_call(table_name, operation, time.perf_counter() - started, error=e)
+        raise
+    seconds = time.perf_counter() - started
+    for i, table_name in enumerate(table_names):
+        record_call(table_name, operation, seconds, response=_table_share(response, table_name, i == 0))
+    return response
+
+# Tables named by the actions of a TransactItems list, in order of first use
+def _transaction_tables(actions):
+    names = [detail.get("TableName") for action in actions for detail in action.values()]
+    return list(dict.fromkeys(name for name in names if name))
+
+class InstrumentedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def transact_write_items(self, **kwargs):
+        return _call_multi_table(self._client.transact_write_items, "transact_write_items",
+                                 _transaction_tables(kwargs.get("TransactItems", [])), kwargs)
+
+    # describe_table, exceptions and the other control-plane calls are the wrapped client's
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+class InstrumentedMeta:
+    def __init__(self, meta):
+        self._meta = meta
+        self.client = InstrumentedClient(meta.client)
+
+    def __getattr__(self, name):
+        return getattr(self._meta, name)
+
+class InstrumentedResource:
+    def __init__(self, resource):
+        self._resource = resource
+        self.meta = InstrumentedMeta(resource.meta)
+
+    def Table(self, name):
+        return InstrumentedTable(self._resource.Table(name))
+
+    def create_table(self, **kwargs):
+        return InstrumentedTable(self._resource.create_table(**kwargs))
+
+    def batch_get_item(self, **kwargs):
+        return _call_multi_table(self._resource.batch_get_item, "batch_get_item", list(kwargs.get("RequestItems", {})), kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+# Wrap a boto3-compatible DynamoDB resource so every table call is measured
+def instrument_resource(resource):
+    if isinstance(resource, InstrumentedResource):
+        return resource
+    return InstrumentedResource(resource)
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+try:
+    from streamlit.runtime.scriptrunner_utils.exceptions import ScriptControlException
+except ImportError:
+    # A private Streamlit module that has moved between releases; fall back to matching class names
+    ScriptControlException = None
+
+SCRIPT_CONTROL_NAMES = {"ScriptControlException", "RerunException", "StopException"}
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Prometheus text dump location, refreshed at most every METRICS_DUMP_INTERVAL seconds
+METRICS_FILE = os.environ.get("SMARTREADS_METRICS_FILE", os.path.join(tempfile.gettempdir(), "smartreads_metrics.prom"))
+METRICS_DUMP_INTERVAL = float(os.environ.get("SMARTREADS_METRICS_DUMP_INTERVAL", "10"))
+
+class Histogram:
+    __slots__ = ("bucket_counts", "count", "total")
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+        self.count += 1
+        self.total += value
+
+    # Estimate a quantile by interpolating inside the bucket that contains it
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else LATENCY_BUCKETS_MS[-1]
+            if bucket_count and seen + bucket_count >= target:
+                return lower + (upper - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return LATENCY_BUCKETS_MS[-1]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(Histogram)  # (name, labels) -> Histogram
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.help = {}
+        self.last_dump = 0.0
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((labels or {}).items()))
+
+    def observe(self, name, value, labels=None, help_text=None):
+        with self.lock:
+            self.histograms[(name, self._labels(labels))].observe(value)
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    def inc(self, name, value=1, labels=None, help_text=None):
+        with self.lock:
+            self.counters[(name, self._labels(labels))] += value
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # Plain-dict view of every series, for the diagnostics page
+    def snapshot(self):
+        with self.lock:
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "mean_ms": h.mean,
+                    "p50_ms": h.quantile(0.5), "p90_ms": h.quantile(0.9), "p99_ms": h.quantile(0.99)
+                }
+                for (name, labels), h in self.histograms.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self.counters.items()
+            ]
+        return {"histograms": histograms, "counters": counters}
+
+    # Render every series in the Prometheus text exposition format
+    def render_prometheus(self):
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+        lines = []
+        with self.lock:
+            by_name = defaultdict(list)
+            for (name, labels), h in self.histograms.items():
+                by_name[name].append((labels, h))
+            for name in sorted(by_name):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, h in by_name[name]:
+                    cumulative = 0
+                    for bound, bucket_count in zip(LATENCY_BUCKETS_MS + ["+Inf"], h.bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {h.total}")
+                    lines.append(f"{name}_count{format_labels(labels)} {h.count}")
+
+            by_name = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                by_name[name].append((labels, value))
+            for name in sorted(by_name):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in by_name[name]:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Write the Prometheus text atomically, throttled unless forced
+    def dump(self, path=None, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_dump < METRICS_DUMP_INTERVAL:
+            return None
+        self.last_dump = now
+        path = path or METRICS_FILE
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+            return path
+        except OSError:
+            print(f"Error writing metrics dump...")
+            return None
+
+# Process-wide registry shared by every Streamlit session
+registry = MetricsRegistry()
+
+# Whether an exception is one of Streamlit's st.rerun()/st.stop() control-flow exceptions
+def is_script_control(error):
+    if ScriptControlException is not None:
+        return isinstance(error, ScriptControlException)
+    return any(cls.__name__ in SCRIPT_CONTROL_NAMES for cls in type(error).__mro__)
+
+# Decorator/wrapper that times a page handler and counts its failures
+def instrument_page(page_name, handler):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return handler(*args, **kwargs)
+        except Exception as e:
+            outcome = "error"
+            registry.inc("page_errors_total", labels={"page": page_name, "error": type(e).__name__},
+                         help_text="Unhandled exceptions raised by page handlers")
+            raise
+        except BaseException as e:
+            # Streamlit's rerun/stop control-flow exceptions (BaseException subclasses) are not failures
+            if is_script_control(e):
+                outcome = "rerun"
+            raise
+        finally:
+            registry.observe("page_render_duration_ms", (time.perf_counter() - started) * 1000,
+                             labels={"page": page_name, "outcome": outcome},
+                             help_text="Wall time spent rendering a page handler")
+            registry.dump()
+    wrapper.__name__ = getattr(handler, "__name__", page_name)
+    return wrapper
@@ -0,0 +1,188 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import cProfile
+import glob
+import json
+import logging
+import pstats
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from monitoring.metrics import is_script_control
+
+# Profiling is off unless SMARTREADS_PROFILE is set or the page is opened with ?profile=1
+PROFILE_DIR = os.environ.get("SMARTREADS_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "smartreads_profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("SMARTREADS_PROFILE_SAMPLE_RATE", "0.1"))  # Share of reruns traced with cProfile
+PROFILE_MAX_TRACES = int(os.environ.get("SMARTREADS_PROFILE_MAX_TRACES", "200"))  # Oldest traces are deleted past this
+RERUN_LOG_MAX_BYTES = 5 * 1024 * 1024
+RERUN_LOG_BACKUPS = 5
+RERUN_LOG_NAME = "reruns.jsonl"
+
+# cProfile can only run in one thread at a time, other sessions skip sampling meanwhile
+_trace_lock = threading.Lock()
+_rerun_logger = None
+_setup_lock = threading.Lock()
+
+def profiling_enabled(query_flag=None):
+    if query_flag not in (None, "", "0", "false", "off"):
+        return True
+    return os.environ.get("SMARTREADS_PROFILE", "").strip().lower() in ("1", "true", "on")
+
+# One JSON line per rerun, rotated by size
+def _get_rerun_logger():
+    global _rerun_logger
+    with _setup_lock:
+        if _rerun_logger is None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            logger = logging.getLogger("smartreads.profiler")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(os.path.join(PROFILE_DIR, RERUN_LOG_NAME),
+                                          maxBytes=RERUN_LOG_MAX_BYTES, backupCount=RERUN_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _rerun_logger = logger
+    return _rerun_logger
+
+# Keep only the newest PROFILE_MAX_TRACES trace files
+def _prune_traces():
+    traces = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.prof")), key=os.path.getmtime)
+    for path in traces[:max(0, len(traces) - PROFILE_MAX_TRACES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# Time one rerun of a page handler, tracing a sample of them with cProfile
+@contextmanager
+def profile_rerun(page, enabled=True):
+    if not enabled:
+        yield
+        return
+
+    profiler = None
+    if random.random() < PROFILE_SAMPLE_RATE and _trace_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already attached
+            profiler = None
+            _trace_lock.release()
+
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    except BaseException as e:
+        # st.rerun()/st.stop() unwind through here (as BaseException), they end the rerun early but are not errors
+        if is_script_control(e):
+            outcome = "rerun"
+        raise
+    finally:
+        wall_ms = (time.perf_counter() - started) * 1000
+        trace_file = None
+        if profiler is not None:
+            profiler.disable()
+            _trace_lock.release()
+            trace_file = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{page}.prof"
+            try:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                profiler.dump_stats(os.path.join(PROFILE_DIR, trace_file))
+                _prune_traces()
+            except OSError:
+                print(f"Error writing profile trace...")
+                trace_file = None
+        try:
+            _get_rerun_logger().info(json.dumps({
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "page": page,
+                "wall_ms": round(wall_ms, 3),
+                "outcome": outcome,
+                "trace": trace_file
+            }))
+        except OSError:
+            print(f"Error writing profile log...")
+
+# Read every rerun record, including rotated log files
+def load_reruns(profile_dir=PROFILE_DIR):
+    reruns = []
+    for path in glob.glob(os.path.join(profile_dir, RERUN_LOG_NAME + "*")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    reruns.append(json.loads(line))
+                except ValueError:
+                    continue
+    return reruns
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# Per-page wall time summary, slowest total first
+def summarize_reruns(reruns):
+    by_page = defaultdict(list)
+    for rerun in reruns:
+        by_page[rerun["page"]].append(rerun["wall_ms"])
+    summary = []
+    for page, samples in by_page.items():
+        ordered = sorted(samples)
+        summary.append({
+            "page": page,
+            "reruns": len(ordered),
+            "total_ms": sum(ordered),
+            "mean_ms": sum(ordered) / len(ordered),
+            "p50_ms": _percentile(ordered, 0.50),
+            "p95_ms": _percentile(ordered, 0.95),
+            "max_ms": ordered[-1]
+        })
+    return sorted(summary, key=lambda row: row["total_ms"], reverse=True)
+
+# Print the slowest pages and the functions that dominate the sampled traces
+def report(profile_dir=PROFILE_DIR, top=20, page=None, sort="cumulative"):
+    reruns = load_reruns(profile_dir)
+    if not reruns:
+        print(f"No profiling data found in {profile_dir}")
+        return
+
+    print(f"{'page':<28} {'reruns':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for row in summarize_reruns(reruns):
+        print(f"{row['page']:<28} {row['reruns']:>7} {row['total_ms'] / 1000:>9.2f} {row['mean_ms']:>9.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['max_ms']:>9.1f}")
+
+    traces = [os.path.join(profile_dir, r["trace"]) for r in reruns
+              if r.get("trace") and (page is None or r["page"] == page)]
+    traces = [path for path in traces if os.path.exists(path)]
+    if not traces:
+        return
+    print(f"\nTop {top} functions by {sort} time across {len(traces)} sampled rerun(s)"
+          + (f" of {page}" if page else "") + ":")
+    stats = pstats.Stats(traces[0])
+    for path in traces[1:]:
+        stats.add(path)
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+# Run with e.g. `python monitoring/profiler.py --top 30 --page show_dashboard`
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate Streamlit rerun profiles and report the top offenders.")
+    parser.add_argument("--dir", default=PROFILE_DIR, help="Directory holding the rerun log and traces")
+    parser.add_argument("--top", type=int, default=20, help="Number of functions to list")
+    parser.add_argument("--page", help="Only merge traces recorded for this page handler")
+    parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"],
+                        help="Sort order for the function listing")
+    args = parser.parse_args()
+    report(args.dir, args.top, args.page, args.sort)
@@ -0,0 +1,173 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from boto3.dynamodb.conditions import Key
+
+from config.aws_config import get_change_feed_mode
+from db_module.book_events import register_book_listener
+from db_module.book_record import Book
+from db_module.dynamo_handler import get_book_details, VERSION_ATTRIBUTE
+from reading_tracker.tracker import books_table, get_all_books_for_user
+
+# Changes a hub remembers for sessions catching up; a session further behind refreshes everything it holds
+MAX_DELTAS = 500
+
+# Hubs kept in this server process, least recently used evicted first. A hub idle for longer is
+# reloaded, which also picks up writes made by other server processes.
+MAX_HUBS = 256
+HUB_IDLE_SECONDS = 15 * 60
+
+# Numbers every hub created in this process, so a session can tell a reloaded hub (whose versions
+# restart at 0) from the one it last saw
+_generations = itertools.count(1)
+
+# One user's library, shared by all of their sessions (browser tabs) in this server process. It is
+# loaded once, then kept current from the book change listeners; each change bumps the hub version
+# so sessions can ask which books changed since the (generation, version) they last saw.
+class LibraryHub:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.generation = next(_generations)
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.books = None  # book_id -> Book, loaded on first use
+        self.pending = None  # Changes that arrive while the library is being loaded
+        self.version = 0
+        self.deltas = deque(maxlen=MAX_DELTAS)  # (version, book_id), oldest first
+        self.last_used = time.monotonic()
+
+    # Query the whole partition without holding the lock, then replay the writes made meanwhile
+    def _ensure_loaded(self):
+        self.last_used = time.monotonic()
+        if self.books is not None:
+            return
+        with self.load_lock:
+            if self.books is not None:
+                return
+            with self.lock:
+                self.pending = []
+            items = []
+            query_args = {"KeyConditionExpression": Key("user_id").eq(self.user_id)}
+            try:
+                while True:
+                    response = books_table.query(**query_args)
+                    items.extend(response.get("Items", []))
+                    if "LastEvaluatedKey" not in response:
+                        break
+                    query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            except Exception:
+                with self.lock:
+                    self.pending = None
+                raise
+            with self.lock:
+                self.books = {item["book_id"]: Book.from_item(item) for item in items}
+                for book_id, book in self.pending:
+                    self._store(book_id, book)
+                self.pending = None
+
+    # Keep the newer of two copies of a book (by version), so late or repeated events never roll it back
+    def _store(self, book_id, book):
+        current = self.books.get(book_id)
+        if book is None:
+            return self.books.pop(book_id, None) is not None
+        if current is not None and (current.get(VERSION_ATTRIBUTE) or 0) > (book.get(VERSION_ATTRIBUTE) or 0):
+            return False
+        self.books[book_id] = book
+        return True
+
+    # Record a write: book is the new Book, or None when it was deleted. The version moves even before
+    # the library is loaded, so it also tells sessions that queried DynamoDB directly that their results are stale.
+    def apply(self, book_id, book):
+        with self.lock:
+            if self.books is None:
+                if self.pending is not None:
+                    self.pending.append((book_id, book))
+            elif not self._store(book_id, book):
+                return
+            self.version += 1
+            self.deltas.append((self.version, book_id))
+
+    def get_book(self, book_id):
+        self._ensure_loaded()
+        with self.lock:
+            return self.books.get(book_id)
+
+    # (version, books sorted by book_id); the Book objects are shared, so callers must not modify them
+    def snapshot(self):
+        self._ensure_loaded()
+        with self.lock:
+            return self.version, sorted(self.books.values(), key=lambda book: book.get("book_id") or "")
+
+    # (current version, ids of books changed after `version`); the ids are None when the hub no longer
+    # remembers that far back, or when `generation` is an earlier hub's
+    def changes_since(self, generation, version):
+        with self.lock:
+            if generation != self.generation:
+                return self.version, None
+            if version >= self.version:
+                return self.version, set()
+            if not self.deltas or self.deltas[0][0] > version + 1:
+                return self.version, None
+            return self.version, {book_id for change_version, book_id in self.deltas if change_version > version}
+
+_hubs = OrderedDict()
+_hubs_lock = threading.Lock()
+
+# With the Streams change feed, book listeners run in the consumer process and never reach this one
+def hubs_enabled():
+    return get_change_feed_mode() != "streams"
+
+# The user's hub, or None when hubs are disabled
+def get_library_hub(user_id):
+    if not hubs_enabled():
+        return None
+    with _hubs_lock:
+        hub = _hubs.get(user_id)
+        if hub is None or time.monotonic() - hub.last_used > HUB_IDLE_SECONDS:
+            hub = _hubs[user_id] = LibraryHub(user_id)
+        _hubs.move_to_end(user_id)
+        while len(_hubs) > MAX_HUBS:
+            _hubs.popitem(last=False)
+    return hub
+
+# Apply a write the caller already knows the result of (e.g. the Book returned by edit_book), so the
+# user's next read sees it before the change listeners run
+def record_book_write(user_id, book_id, book):
+    with _hubs_lock:
+        hub = _hubs.get(user_id)
+    if hub is not None:
+        hub.apply(book_id, book)
+
+def _on_book_change(user_id, old_item, new_item):
+    book_id = (new_item or old_item or {}).get("book_id")
+    if book_id:
+        record_book_write(user_id, book_id, Book.from_item(new_item))
+
+register_book_listener(_on_book_change)
+
+# The user's whole library from their hub (no read once loaded), or from DynamoDB when hubs are disabled
+def get_user_books(user_id, fields=None):
+    hub = get_library_hub(user_id)
+    if hub is not None:
+        try:
+            return hub.snapshot()[1]
+        except Exception as e:
+            print(f"Error loading the library hub...")
+    return get_all_books_for_user(user_id, fields=fields)
+
+# One of the user's books from their hub, or from DynamoDB when hubs are disabled
+def find_user_book(user_id, book_id, fields=None):
+    hub = get_library_hub(user_id)
+    if hub is not None:
+        try:
+            return hub.get_book(book_id)
+        except Exception as e:
+            print(f"Error loading the library hub...")
+    return get_book_details(user_id, book_id, fields=fields)
@@ -1,7 +1,6 @@
 import sys
 import os
 from datetime import datetime
-from decimal import Decimal
 
 # Add parent directory to system path for module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,95 +8,158 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import custom AWS DynamoDB config and query condition utility
 from config.aws_config import get_dynamodb_resource
 from boto3.dynamodb.conditions import Key
+from db_module.dynamo_handler import (
+    build_projection, is_condition_failure, query_all_books, version_condition, version_increment, VERSION_ATTRIBUTE
+)
+from db_module.book_events import publish_book_change
+from db_module.book_record import Book, books_from_items
+from db_module.codec import encode_progress, decode_progress, encode_rating, encode_status_key, STATUS_KEY_ATTRIBUTE
 
 # Get the DynamoDB resource and reference the books table
 dynamodb = get_dynamodb_resource()
 books_table = dynamodb.Table('ReadingTrackerBooks')
 
 # Fetch all books associated with a specific user
-def get_all_books_for_user(user_id):
+def get_all_books_for_user(user_id, fields=None):
     try:
-        # Query books by user_id
-        response = books_table.query(KeyConditionExpression=Key("user_id").eq(user_id))
-        return response.get('Items', [])
+        # Query books by user_id (every page), optionally projecting only the requested fields
+        return books_from_items(query_all_books({"KeyConditionExpression": Key("user_id").eq(user_id), **build_projection(fields)}))
     except Exception as e:
         print(f"Error fetching books...")
         return []
 
-# Update reading progress for a specific book in the database
-def update_book_progress_in_db(user_id, book_id, progress_data):
+# Update reading progress for a specific book in the database; with expected_version it only applies while
+# the book is unchanged since it was read. Returns (updated Book, percent), or (None, 0) on failure.
+def update_book_progress_in_db(user_id, book_id, progress_data, expected_version=None):
     try:
         # Extract total pages and pages read from input
         total_pages = progress_data['total_pages']
         pages_read = progress_data['pages_read']
-        # Calculate progress percentage
-        progress_percent = round(Decimal(pages_read) / Decimal(total_pages) * Decimal(100), 2)
+        # Calculate progress in integer basis points
+        progress_bp = encode_progress(pages_read, total_pages)
 
         # Build list of update expressions
         update_expression_parts = [
             "pages_read = :pr",
             "total_pages = :tp",
-            "progress_percent = :pp",
-            "#s = :st"  # Use expression alias for reserved word 'status'
+            "progress_bp = :pp",
+            "#s = :st",  # Use expression alias for reserved word 'status'
+            f"{STATUS_KEY_ATTRIBUTE} = :sk"  # Status index key
         ]
 
         # Define values for the placeholders
         expression_values = {
             ':pr': pages_read,
             ':tp': total_pages,
-            ':pp': progress_percent,
-            ':st': progress_data['status']
+            ':pp': progress_bp,
+            ':st': progress_data['status'],
+            ':sk': encode_status_key(user_id, progress_data['status'])
         }
 
         # Define name substitution for reserved keyword
         expression_names = {'#s': 'status'}
 
+        # Record when the book was completed, keeping the original time if it already was
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        remove_parts = ["progress_percent"]  # Superseded by progress_bp
+        if progress_data['status'] == 'completed':
+            update_expression_parts.append("completed_at = if_not_exists(completed_at, :ca)")
+            expression_values[':ca'] = now
+        else:
+            remove_parts.append("completed_at")
+
         # Optionally add deadline if present
         if progress_data.get('deadline'):
             update_expression_parts.append("deadline = :d")
             expression_values[':d'] = progress_data['deadline']
         
-        # Optionally add rating if provided
-        if 'rating' in progress_data:
+        # Optionally set the rating if provided; clearing it removes the attribute
+        rating = encode_rating(progress_data.get('rating'))
+        if rating is not None:
             update_expression_parts.append("rating = :r")
-            expression_values[':r'] = progress_data['rating']
+            expression_values[':r'] = rating
+        elif 'rating' in progress_data:
+            remove_parts.append("rating")
 
-        # Perform the update operation
-        books_table.update_item(
+        # Perform the update operation, returning the previous item for the stats rollup
+        update_expression = ("SET " + ", ".join(update_expression_parts) + " REMOVE " + ", ".join(remove_parts) +
+                             " " + version_increment(expression_names, expression_values))
+        response = books_table.update_item(
             Key={'user_id': user_id, 'book_id': book_id},
-            UpdateExpression="SET " + ", ".join(update_expression_parts),
+            UpdateExpression=update_expression,
+            ConditionExpression=version_condition(expected_version, expression_names, expression_values),
             ExpressionAttributeValues=expression_values,
-            ExpressionAttributeNames=expression_names
+            ExpressionAttributeNames=expression_names,
+            ReturnValues="ALL_OLD"
         )
 
-        return True, progress_percent
+        # Rebuild the new item locally (it follows exactly from the old one) instead of reading it back
+        old_item = response['Attributes']
+        new_item = dict(old_item)
+        new_item.pop('progress_percent', None)
+        new_item.update({
+            'pages_read': pages_read, 'total_pages': total_pages,
+            'progress_bp': progress_bp, 'status': progress_data['status'],
+            STATUS_KEY_ATTRIBUTE: expression_values[':sk']
+        })
+        if progress_data.get('deadline'):
+            new_item['deadline'] = progress_data['deadline']
+        if rating is not None:
+            new_item['rating'] = rating
+        elif 'rating' in progress_data:
+            new_item.pop('rating', None)
+        if progress_data['status'] == 'completed':
+            new_item['completed_at'] = new_item.get('completed_at') or now
+        else:
+            new_item.pop('completed_at', None)
+        new_item[VERSION_ATTRIBUTE] = int(old_item.get(VERSION_ATTRIBUTE, 0)) + 1
+        publish_book_change(user_id, old_item, new_item)
 
-    except Exception:
-        print(f"Error updating progress...")
-        return False, 0
+        return Book.from_item(new_item), decode_progress(progress_bp)
 
-# Mark a book as archived in the database
+    except Exception as e:
+        if is_condition_failure(e):
+            print("Error: The book was changed or deleted since it was read...")
+        else:
+            print(f"Error updating progress...")
+        return None, 0
+
+# Mark a book as archived in the database; returns the updated Book, or None on failure
 def archive_single_book_in_db(user_id, book_id):
     try:
-        books_table.update_item(
+        expression_names, expression_values = {}, {':a': True}
+        response = books_table.update_item(
             Key={'user_id': user_id, 'book_id': book_id},
-            UpdateExpression="SET archived = :a",
-            ExpressionAttributeValues={':a': True}
+            UpdateExpression="SET archived = :a " + version_increment(expression_names, expression_values),
+            ConditionExpression=version_condition(None, expression_names, expression_values),
+            ExpressionAttributeNames=expression_names,
+            ExpressionAttributeValues=expression_values,
+            ReturnValues="ALL_OLD"
         )
-        return True
+        old_item = response["Attributes"]
+        new_item = {**old_item, "archived": True, VERSION_ATTRIBUTE: int(old_item.get(VERSION_ATTRIBUTE, 0)) + 1}
+        publish_book_change(user_id, old_item, new_item)
+        return Book.from_item(new_item)
     except Exception:
         print(f"Error archiving book...")
-        return False
+        return None
 
-# Mark a book as unarchived in the database
+# Mark a book as unarchived in the database; returns the updated Book, or None on failure
 def unarchive_single_book_in_db(user_id, book_id):
     try:
-        books_table.update_item(
+        expression_names, expression_values = {}, {':a': False}
+        response = books_table.update_item(
             Key={'user_id': user_id, 'book_id': book_id},
-            UpdateExpression="SET archived = :a",
-            ExpressionAttributeValues={':a': False}
+            UpdateExpression="SET archived = :a " + version_increment(expression_names, expression_values),
+            ConditionExpression=version_condition(None, expression_names, expression_values),
+            ExpressionAttributeNames=expression_names,
+            ExpressionAttributeValues=expression_values,
+            ReturnValues="ALL_OLD"
         )
-        return True
+        old_item = response["Attributes"]
+        new_item = {**old_item, "archived": False, VERSION_ATTRIBUTE: int(old_item.get(VERSION_ATTRIBUTE, 0)) + 1}
+        publish_book_change(user_id, old_item, new_item)
+        return Book.from_item(new_item)
     except Exception:
         print(f"Error un-archiving book...")
-        return False
\ No newline at end of file
+        return None
\ No newline at end of file
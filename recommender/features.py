@@ -0,0 +1,130 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import math
+from decimal import Decimal
+
+import numpy as np
+
+RECOMMENDATION_COUNT = 30  # Recommendations shown per user
+CANDIDATE_COUNT = 60  # Ranked candidates kept per user, so single-book updates can drop a few without a re-rank
+RATING_BLEND = 0.15  # Share of the score taken from the catalog's average rating
+
+# How much a book in the user's library says about their taste
+STATUS_WEIGHTS = {"completed": 1.0, "reading": 0.75, "to-read": 0.5}
+
+# Feature column of every catalog genre, most common first
+def build_genre_columns(catalog):
+    return {genre: column for column, genre in enumerate(catalog.genres())}
+
+# IDF weight per genre column and the L2 norm of every catalog book's weighted genre row
+def build_genre_weights(catalog, genre_columns):
+    idf = np.zeros(len(genre_columns), dtype=np.float32)
+    for genre, ids in catalog.genre_index.items():
+        # Rare genres say more about a book than "Fiction" does
+        idf[genre_columns[genre]] = math.log(len(catalog) / len(ids)) + 1.0
+    row_norms = np.array([
+        math.sqrt(sum(float(idf[genre_columns[genre]]) ** 2 for genre in book.genres)) or 1.0
+        for book in catalog.books
+    ], dtype=np.float32)
+    return idf, row_norms
+
+# IDF-weighted, L2-normalized genre matrix for the whole catalog
+def build_feature_matrix(catalog):
+    genre_columns = build_genre_columns(catalog)
+    idf, row_norms = build_genre_weights(catalog, genre_columns)
+    matrix = np.zeros((len(catalog), len(genre_columns)), dtype=np.float32)
+    for genre, ids in catalog.genre_index.items():
+        column = genre_columns[genre]
+        ids = np.frombuffer(ids, dtype=np.uint32)
+        matrix[ids, column] = idf[column] / row_norms[ids]
+    ratings = np.frombuffer(catalog.ratings, dtype=np.float32).copy()
+    return matrix, ratings, genre_columns
+
+# Weight of one library book in the preference vector: status and the user's own rating
+def book_weight(book):
+    weight = STATUS_WEIGHTS.get(str(book.get("status") or "").lower(), 0.5)
+    rating = book.get("rating")
+    if rating is not None:
+        weight *= 0.5 + float(rating) / 4.0  # 1 star -> 0.75, 3 -> 1.25, 5 -> 1.75
+    return weight
+
+# Catalog feature columns a library book maps to: its catalog entry's genres, else its own genre text
+def book_genre_columns(book, catalog, genre_columns):
+    matches = catalog.find_by_title(book.get("title") or "")
+    if matches:
+        return [genre_columns[genre] for genre in matches[0].genres if genre in genre_columns]
+    genre = str(book.get("genre") or "").strip().casefold()
+    return [column for name, column in genre_columns.items() if name.casefold() == genre]
+
+# The user's taste as a weighted sum of genre columns (unnormalized)
+def build_user_profile(books, catalog, genre_columns):
+    profile = np.zeros(len(genre_columns), dtype=np.float32)
+    for book in books:
+        columns = book_genre_columns(book, catalog, genre_columns)
+        if columns:
+            profile[columns] += book_weight(book) / len(columns)
+    return profile
+
+# Catalog ids of books the user already has, so they are never recommended
+def owned_catalog_ids(books, catalog):
+    owned = []
+    for book in books:
+        owned.extend(match.book_id for match in catalog.find_by_title(book.get("title") or ""))
+    return owned
+
+# Score a batch of profiles against the catalog and keep each one's top_n catalog ids
+def score_profiles(matrix, ratings, profiles, exclusions, top_n=RECOMMENDATION_COUNT):
+    profiles = np.asarray(profiles, dtype=np.float32).reshape(-1, matrix.shape[1])
+    norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+    profiles = profiles / np.where(norms == 0, 1.0, norms)
+
+    scores = (profiles @ matrix.T) * (1.0 - RATING_BLEND) + (ratings / 5.0) * RATING_BLEND
+    results = []
+    for row, excluded in zip(scores, exclusions):
+        if len(excluded):
+            row[np.asarray(excluded, dtype=np.int64)] = -np.inf
+        count = min(top_n, len(row))
+        top = np.argpartition(-row, count - 1)[:count]
+        top = top[np.argsort(-row[top], kind="stable")]
+        results.append([(int(i), float(row[i])) for i in top if np.isfinite(row[i])])
+    return results
+
+# Score one profile against a subset of catalog rows only (e.g. the books matching a genre filter)
+def score_candidates(matrix, ratings, profile, candidate_ids, top_n=RECOMMENDATION_COUNT):
+    candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+    if not len(candidate_ids):
+        return []
+    profile = np.asarray(profile, dtype=np.float32)
+    norm = np.linalg.norm(profile)
+    profile = profile / (norm or 1.0)
+    scores = (matrix[candidate_ids] @ profile) * (1.0 - RATING_BLEND) + (ratings[candidate_ids] / 5.0) * RATING_BLEND
+    count = min(top_n, len(scores))
+    top = np.argpartition(-scores, count - 1)[:count]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(candidate_ids[i]), float(scores[i])) for i in top]
+
+# Recommendation items in the shape stored on the user record and rendered as cards
+def to_recommendations(catalog, scored):
+    recommendations = []
+    for book_id, score in scored:
+        book = catalog.get(book_id)
+        recommendations.append({
+            "catalog_id": book.book_id,
+            "title": book.title,
+            "author": book.author,
+            "avg_rating": Decimal(f"{book.avg_rating:.2f}"),
+            "score": Decimal(f"{score:.4f}")
+        })
+    return recommendations
+
+# Sparse, catalog-independent form of a profile for the user record: {genre: weight}
+def profile_to_preference(profile, genre_columns):
+    genres = list(genre_columns)
+    return {genres[column]: Decimal(f"{profile[column]:.6f}") for column in np.flatnonzero(profile)}
+
+def preference_to_profile(preference, genre_columns):
+    return {genre_columns[genre]: float(weight) for genre, weight in (preference or {}).items() if genre in genre_columns}
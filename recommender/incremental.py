@@ -0,0 +1,184 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import heapq
+import math
+import threading
+from decimal import Decimal
+
+from catalog.catalog import get_catalog
+from db_module.book_events import register_book_listener
+from db_module.dynamo_handler import get_user_details, save_recommendations
+from recommender.features import (
+    book_genre_columns, book_weight, build_genre_weights, preference_to_profile, to_recommendations,
+    CANDIDATE_COUNT, RATING_BLEND, RECOMMENDATION_COUNT
+)
+from recommender.recommend import get_genre_columns, refresh_recommendations
+
+# How far the preference vector may move (relative to its length) before candidates outside the
+# stored list could plausibly outrank them; past this the whole catalog is re-ranked
+MAX_PREFERENCE_DRIFT = 0.15
+
+_genre_weights = None
+_weights_lock = threading.Lock()
+
+# IDF per genre column and catalog row norms, the pieces of the feature matrix a single update needs
+def get_genre_weights():
+    global _genre_weights
+    with _weights_lock:
+        if _genre_weights is None:
+            _genre_weights = build_genre_weights(get_catalog(), get_genre_columns())
+    return _genre_weights
+
+# Sparse change to the preference vector caused by one book write: {genre column: delta}
+def book_delta(old_item, new_item, catalog, genre_columns):
+    delta = {}
+    for item, sign in ((old_item, -1.0), (new_item, 1.0)):
+        if not item:
+            continue
+        columns = book_genre_columns(item, catalog, genre_columns)
+        for column in columns:
+            delta[column] = delta.get(column, 0.0) + sign * book_weight(item) / len(columns)
+    return {column: value for column, value in delta.items() if abs(value) > 1e-9}
+
+# A user's preference vector plus their ranked candidates, kept as a bounded min-heap of (score, catalog_id)
+class RecommendationState:
+    __slots__ = ("profile", "norm_sq", "drift", "dots", "members", "heap", "catalog", "genre_columns", "idf", "row_norms")
+
+    def __init__(self, profile, candidate_ids, catalog, genre_columns, idf, row_norms, drift=0.0):
+        self.profile = profile
+        self.drift = drift
+        self.norm_sq = sum(weight * weight for weight in profile.values())
+        self.catalog = catalog
+        self.genre_columns = genre_columns
+        self.idf = idf
+        self.row_norms = row_norms
+        # Raw dot product of the profile with each candidate's feature row
+        self.dots = {catalog_id: self._dot(catalog_id) for catalog_id in candidate_ids}
+        # Candidates per genre column, so a delta only visits the candidates sharing one of its genres
+        self.members = {}
+        for catalog_id in self.dots:
+            for column in self._columns(catalog_id):
+                self.members.setdefault(column, set()).add(catalog_id)
+        self.heap = []
+        self.rescore()
+
+    # Rebuild from the preference and candidates stored on the user record; None when there is nothing to start from
+    @classmethod
+    def from_user(cls, user, catalog, genre_columns, idf, row_norms):
+        profile = preference_to_profile(user.get("preference"), genre_columns)
+        candidate_ids = [int(rec["catalog_id"]) for rec in user.get("recommendations", []) if "catalog_id" in rec]
+        if not profile or not candidate_ids:
+            return None
+        return cls(profile, candidate_ids, catalog, genre_columns, idf, row_norms, float(user.get("preference_drift", 0)))
+
+    def _columns(self, catalog_id):
+        return [self.genre_columns[genre] for genre in self.catalog.get(catalog_id).genres if genre in self.genre_columns]
+
+    def _dot(self, catalog_id):
+        dot = sum(self.profile.get(column, 0.0) * float(self.idf[column]) for column in self._columns(catalog_id))
+        return dot / float(self.row_norms[catalog_id])
+
+    def score(self, catalog_id):
+        norm = math.sqrt(self.norm_sq) or 1.0
+        rating = float(self.catalog.ratings[catalog_id])
+        return self.dots[catalog_id] / norm * (1.0 - RATING_BLEND) + rating / 5.0 * RATING_BLEND
+
+    def rescore(self):
+        self.heap = [(self.score(catalog_id), catalog_id) for catalog_id in self.dots]
+        heapq.heapify(self.heap)
+
+    # Fold a sparse delta into the profile and the dot products of the candidates sharing its genres,
+    # then re-rank: O(K + candidates per changed genre)
+    def apply_delta(self, delta):
+        change_norm = math.sqrt(sum(change * change for change in delta.values()))
+        self.drift += change_norm / (math.sqrt(self.norm_sq) or change_norm or 1.0)
+        for column, change in delta.items():
+            old = self.profile.get(column, 0.0)
+            new = old + change
+            self.norm_sq += new * new - old * old
+            if abs(new) > 1e-9:
+                self.profile[column] = new
+            else:
+                self.profile.pop(column, None)
+        self.norm_sq = max(self.norm_sq, 0.0)
+        for column, change in delta.items():
+            weighted = change * float(self.idf[column])
+            for catalog_id in self.members.get(column, ()):
+                self.dots[catalog_id] += weighted / float(self.row_norms[catalog_id])
+        self.rescore()
+
+    # Drop candidates the user now owns
+    def discard(self, catalog_ids):
+        removed = [catalog_id for catalog_id in catalog_ids if self.dots.pop(catalog_id, None) is not None]
+        for catalog_id in removed:
+            for column in self._columns(catalog_id):
+                self.members[column].discard(catalog_id)
+        if removed:
+            self.rescore()
+        return bool(removed)
+
+    def ranked(self):
+        return [(catalog_id, score) for score, catalog_id in heapq.nlargest(CANDIDATE_COUNT, self.heap)]
+
+    def preference(self):
+        genres = list(self.genre_columns)
+        return {genres[column]: weight for column, weight in self.profile.items()}
+
+# Update a user's stored recommendations for a batch of their book writes ((old_item, new_item) pairs),
+# falling back to a full re-rank when needed
+def apply_user_book_events(user_id, changes):
+    catalog = get_catalog()
+    genre_columns = get_genre_columns()
+    delta, added_titles, titles_changed = {}, [], False
+    for old_item, new_item in changes:
+        for column, change in book_delta(old_item, new_item, catalog, genre_columns).items():
+            delta[column] = delta.get(column, 0.0) + change
+        added_title = (new_item or {}).get("title")
+        if added_title:
+            added_titles.append(added_title)
+            titles_changed = titles_changed or added_title != (old_item or {}).get("title")
+    delta = {column: value for column, value in delta.items() if abs(value) > 1e-9}
+    if not delta and not titles_changed:
+        return None  # Nothing that affects recommendations changed (e.g. pages read)
+
+    user = get_user_details(user_id, fields=["preference", "preference_drift", "recommendations"])
+    if not user:
+        return None
+    idf, row_norms = get_genre_weights()
+    state = RecommendationState.from_user(user, catalog, genre_columns, idf, row_norms)
+    if state is None:
+        return refresh_recommendations(user_id)
+
+    for added_title in added_titles:
+        state.discard(match.book_id for match in catalog.find_by_title(added_title))
+    if delta:
+        state.apply_delta(delta)
+
+    # Taste moved too far, or too few candidates are left to fill the page: re-rank the whole catalog
+    if state.drift > MAX_PREFERENCE_DRIFT or len(state.heap) < RECOMMENDATION_COUNT:
+        return refresh_recommendations(user_id)
+
+    recommendations = to_recommendations(catalog, state.ranked())
+    preference = {genre: Decimal(f"{weight:.6f}") for genre, weight in state.preference().items()}
+    if not save_recommendations(user_id, recommendations, preference, state.drift):
+        return None
+    return recommendations
+
+def apply_book_event(user_id, old_item, new_item):
+    return apply_user_book_events(user_id, [(old_item, new_item)])
+
+# Batch listener: one read and one save of the stored recommendations per user in the batch
+def apply_book_events(changes):
+    by_user = {}
+    for user_id, old_item, new_item in changes:
+        by_user.setdefault(user_id, []).append((old_item, new_item))
+    for user_id, user_changes in by_user.items():
+        apply_user_book_events(user_id, user_changes)
+
+# Keep recommendations current as books are added, edited, rated, completed or deleted
+def enable_incremental_recommendations():
+    register_book_listener(apply_book_events, batch=True)
@@ -0,0 +1,84 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+from multiprocessing import AuthenticationError
+
+from catalog.catalog import get_catalog
+from catalog.genre_bitmaps import get_genre_bitmaps
+from db_module.dynamo_handler import save_recommendations
+from reading_tracker.tracker import get_all_books_for_user
+from recommender.features import (
+    build_feature_matrix, build_genre_columns, build_user_profile, owned_catalog_ids,
+    profile_to_preference, score_candidates, score_profiles, to_recommendations, CANDIDATE_COUNT, RECOMMENDATION_COUNT
+)
+from recommender.scoring_service import ScoringClient, feature_version
+
+# Library attributes the preference profile is built from
+PROFILE_FIELDS = ["title", "genre", "rating", "status"]
+
+_genre_columns = None
+_local_features = None
+_features_lock = threading.Lock()
+
+def get_genre_columns():
+    global _genre_columns
+    if _genre_columns is None:
+        _genre_columns = build_genre_columns(get_catalog())
+    return _genre_columns
+
+# In-process feature matrix, only built when the scoring service is unavailable
+def get_local_features():
+    global _local_features
+    with _features_lock:
+        if _local_features is None:
+            matrix, ratings, _ = build_feature_matrix(get_catalog())
+            _local_features = (matrix, ratings)
+    return _local_features
+
+# Preference profile and owned catalog ids for one library
+def profile_for_books(books):
+    catalog = get_catalog()
+    return build_user_profile(books, catalog, get_genre_columns()), owned_catalog_ids(books, catalog)
+
+def library_profiles(user_ids):
+    profiles, exclusions = [], []
+    for user_id in user_ids:
+        profile, owned = profile_for_books(get_all_books_for_user(user_id, fields=PROFILE_FIELDS))
+        profiles.append(profile)
+        exclusions.append(owned)
+    return profiles, exclusions
+
+# Rank catalog books for a precomputed profile, through the scoring service when it is running
+def recommend_for_profile(profile, owned, top_n=CANDIDATE_COUNT):
+    try:
+        scored = ScoringClient().score([profile], [owned], feature_version(get_genre_columns()), top_n)[0]
+    except (OSError, EOFError, RuntimeError, AuthenticationError):
+        # Service not running (or on another catalog): score in this process instead
+        matrix, ratings = get_local_features()
+        scored = score_profiles(matrix, ratings, [profile], [owned], top_n)[0]
+    return to_recommendations(get_catalog(), scored)
+
+def recommend_for_books(books, top_n=CANDIDATE_COUNT):
+    profile, owned = profile_for_books(books)
+    return recommend_for_profile(profile, owned, top_n)
+
+# Full re-rank: recompute a user's profile and recommendations from their library and store both
+def refresh_recommendations(user_id):
+    profile, owned = profile_for_books(get_all_books_for_user(user_id, fields=PROFILE_FIELDS))
+    recommendations = recommend_for_profile(profile, owned)
+    if not save_recommendations(user_id, recommendations, profile_to_preference(profile, get_genre_columns())):
+        return None
+    return recommendations
+
+# Recommendations restricted to a genre query; candidates come from the genre bitmaps, minus owned books.
+# Returns (recommendations, number of unread catalog books matching the query); nothing is stored.
+def recommend_in_genres(user_id, all_of=(), any_of=(), none_of=(), top_n=RECOMMENDATION_COUNT):
+    profile, owned = profile_for_books(get_all_books_for_user(user_id, fields=PROFILE_FIELDS))
+    bitmaps = get_genre_bitmaps()
+    candidates = bitmaps.book_ids(bitmaps.without(bitmaps.query(all_of, any_of, none_of), owned))
+    matrix, ratings = get_local_features()
+    return to_recommendations(get_catalog(), score_candidates(matrix, ratings, profile, candidates, top_n)), len(candidates)
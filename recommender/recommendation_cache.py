@@ -0,0 +1,79 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import hashlib
+import json
+import threading
+import streamlit as st
+
+from db_module.book_events import register_book_listener
+from db_module.dynamo_handler import get_user_details
+from recommender.features import RECOMMENDATION_COUNT
+from recommender.incremental import enable_incremental_recommendations
+from recommender.recommend import recommend_in_genres
+
+RECOMMENDATION_CACHE_TTL = 300  # Seconds before a user's recommendations are re-read
+
+# Per-user generation of the genre query cache. It is part of the cache key, so bumping it drops only
+# that user's cached queries (Streamlit can only clear a cached function by exact arguments or entirely).
+_genre_versions = {}
+_genre_versions_lock = threading.Lock()
+
+# Recommendations already read elsewhere (e.g. the login bundle), used by the next cache fill instead of a read
+_seeded_recommendations = {}
+_seeded_lock = threading.Lock()
+
+# Loads a user's recommendations with a content version, cached for a short TTL
+@st.cache_data(ttl=RECOMMENDATION_CACHE_TTL, show_spinner=False)
+def load_recommendations(user_id):
+    with _seeded_lock:
+        recommendations = _seeded_recommendations.pop(user_id, None)
+    if recommendations is None:
+        user_details = get_user_details(user_id, fields=["recommendations"]) or {}
+        recommendations = user_details.get('recommendations', [])
+    recommendations = recommendations[:RECOMMENDATION_COUNT]  # The rest are spare candidates
+    version = hashlib.sha1(json.dumps(recommendations, sort_keys=True, default=str).encode()).hexdigest()
+    return {"items": recommendations, "version": version}
+
+# Fill a user's load_recommendations entry from recommendations the caller has just read
+def seed_recommendations(user_id, recommendations):
+    load_recommendations.clear(user_id)
+    with _seeded_lock:
+        _seeded_recommendations[user_id] = list(recommendations)
+    try:
+        return load_recommendations(user_id)
+    finally:
+        with _seeded_lock:
+            _seeded_recommendations.pop(user_id, None)
+
+# Recommendations restricted to a genre query, scored on demand over the matching catalog books only
+@st.cache_data(ttl=RECOMMENDATION_CACHE_TTL, show_spinner=False)
+def _load_genre_recommendations(user_id, genre_version, all_of, any_of, none_of):
+    recommendations, matched = recommend_in_genres(user_id, all_of, any_of, none_of)
+    version = hashlib.sha1(json.dumps([all_of, any_of, none_of, recommendations], default=str).encode()).hexdigest()
+    return {"items": recommendations, "version": version, "matched": matched}
+
+def load_genre_recommendations(user_id, all_of, any_of, none_of):
+    with _genre_versions_lock:
+        genre_version = _genre_versions.get(user_id, 0)
+    return _load_genre_recommendations(user_id, genre_version, all_of, any_of, none_of)
+
+# Drop one user's cached recommendations and genre queries, leaving other users' entries in place
+def clear_user_recommendations(user_id):
+    with _seeded_lock:
+        _seeded_recommendations.pop(user_id, None)
+    load_recommendations.clear(user_id)
+    with _genre_versions_lock:
+        _genre_versions[user_id] = _genre_versions.get(user_id, 0) + 1
+
+# Drop the writer's cached recommendations so the page shows the updated list
+def clear_cached_recommendations(user_id, old_item, new_item):
+    clear_user_recommendations(user_id)
+
+# Update stored recommendations on every book write, then clear the cache. This module is imported once
+# per process (the app script reruns on every interaction), so the listeners are registered only once.
+enable_incremental_recommendations()
+register_book_listener(clear_cached_recommendations)
@@ -0,0 +1,253 @@
+import sys
+import os
+
+# Add parent directory to system path for module imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import hashlib
+import secrets
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from catalog.catalog import get_catalog
+from recommender.features import (
+    build_feature_matrix, profile_to_preference, score_profiles, to_recommendations, CANDIDATE_COUNT, RECOMMENDATION_COUNT
+)
+
+# Local endpoint of the scoring service (a Unix socket). By default it lives in a directory only this
+# user can enter, next to a random key the service generates at startup; SMARTREADS_SCORING_AUTHKEY
+# overrides the key file. Connections carry pickles, so both ends must authenticate before any is read.
+SCORING_SOCKET = os.environ.get("SMARTREADS_SCORING_SOCKET")
+SCORING_WORKERS = int(os.environ.get("SMARTREADS_SCORING_WORKERS", "0")) or os.cpu_count() or 1
+BATCH_SIZE = 64  # Profiles scored per worker task
+
+# Private runtime directory (mode 0700, owned by this user) for the socket and the key file
+def scoring_runtime_dir():
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    path = os.path.join(base, f"smartreads-scoring-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by this user with mode 0700")
+    return path
+
+def scoring_socket_path():
+    return SCORING_SOCKET or os.path.join(scoring_runtime_dir(), "scoring.sock")
+
+# Shared secret of the service; create=True (service start) writes a fresh random key to a 0600 file
+def scoring_authkey(create=False):
+    if os.environ.get("SMARTREADS_SCORING_AUTHKEY"):
+        return os.environ["SMARTREADS_SCORING_AUTHKEY"].encode()
+    path = os.path.join(scoring_runtime_dir(), "authkey")
+    if create:
+        key = secrets.token_bytes(32)
+        temp_path = f"{path}.{os.getpid()}"
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as key_file:
+            key_file.write(key)
+        os.replace(temp_path, path)
+        return key
+    with open(path, "rb") as key_file:
+        return key_file.read()
+
+# Refuse sockets created by another user (e.g. one squatting a shared path before the service started)
+def _check_socket_owner(address):
+    if os.lstat(address).st_uid != os.getuid():
+        raise PermissionError(f"{address} is not owned by this user")
+
+# Fingerprint of the feature layout, so clients never send profiles built against another catalog
+def feature_version(genre_columns):
+    return hashlib.sha1("\n".join(genre_columns).encode("utf-8")).hexdigest()[:16]
+
+# Catalog feature matrix and ratings copied once into a named shared-memory block
+class SharedFeatureMatrix:
+    def __init__(self, matrix, ratings):
+        self.shape = matrix.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes + ratings.nbytes)
+        view_matrix, view_ratings = attach_views(self.shm, self.shape)
+        view_matrix[:] = matrix
+        view_ratings[:] = ratings
+
+    @property
+    def descriptor(self):
+        return self.shm.name, self.shape
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+# Zero-copy NumPy views over the shared block: the matrix followed by the ratings vector
+def attach_views(shm, shape):
+    rows, columns = shape
+    matrix = np.ndarray((rows, columns), dtype=np.float32, buffer=shm.buf)
+    ratings = np.ndarray((rows,), dtype=np.float32, buffer=shm.buf, offset=rows * columns * 4)
+    return matrix, ratings
+
+# --- Worker process side ---
+_worker = {}
+
+def _attach_worker(descriptor):
+    name, shape = descriptor
+    # Pool workers share the parent's resource tracker, the parent unlinks the block on shutdown
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    _worker["matrix"], _worker["ratings"] = attach_views(shm, shape)
+
+def _score_batch(profiles, exclusions, top_n):
+    return score_profiles(_worker["matrix"], _worker["ratings"], profiles, exclusions, top_n)
+
+# Process pool scoring user profiles against the shared catalog matrix
+class ScoringService:
+    def __init__(self, catalog=None, workers=SCORING_WORKERS):
+        self.catalog = catalog or get_catalog()
+        self.workers = workers
+        self.shared = None
+        self.pool = None
+        self.listener = None
+        self.version = None
+        self.genre_columns = None
+
+    def start(self):
+        matrix, ratings, genre_columns = build_feature_matrix(self.catalog)
+        self.genre_columns = genre_columns
+        self.version = feature_version(genre_columns)
+        self.shared = SharedFeatureMatrix(matrix, ratings)
+        del matrix, ratings  # Only the shared copy is kept
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_worker,
+                                        initargs=(self.shared.descriptor,))
+        return self
+
+    # Score profiles in batches spread over the workers, results in input order
+    def score(self, profiles, exclusions, top_n=RECOMMENDATION_COUNT):
+        profiles = np.asarray(profiles, dtype=np.float32)
+        futures = [
+            self.pool.submit(_score_batch, profiles[i:i + BATCH_SIZE], exclusions[i:i + BATCH_SIZE], top_n)
+            for i in range(0, len(profiles), BATCH_SIZE)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    # Answer requests on the Unix socket until stop() is called
+    def serve(self, address=None):
+        address = address or scoring_socket_path()
+        if os.path.lexists(address):
+            _check_socket_owner(address)
+            os.remove(address)  # Stale socket from a previous run
+        self.listener = Listener(address, family="AF_UNIX", authkey=scoring_authkey(create=True))
+        os.chmod(address, 0o600)
+        print(f"Scoring service listening on {address} with {self.workers} worker(s)...")
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                break  # Listener closed by stop()
+            except Exception:
+                continue  # Failed authentication
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if request.get("op") == "ping":
+                        response = {"ok": True, "version": self.version, "workers": self.workers}
+                    elif request.get("op") == "score":
+                        if request.get("version") != self.version:
+                            raise ValueError("Feature version mismatch, the client uses a different catalog")
+                        results = self.score(request["profiles"], request["exclusions"],
+                                             request.get("top_n", RECOMMENDATION_COUNT))
+                        response = {"ok": True, "results": results}
+                    else:
+                        raise ValueError(f"Unknown operation: {request.get('op')}")
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                connection.send(response)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+# Client used by the app; raises OSError/ConnectionError when the service is not running
+class ScoringClient:
+    def __init__(self, address=None, timeout=5.0):
+        self.address = address
+        self.timeout = timeout
+
+    def _request(self, request):
+        address = self.address or scoring_socket_path()
+        _check_socket_owner(address)
+        with Client(address, family="AF_UNIX", authkey=scoring_authkey()) as connection:
+            connection.send(request)
+            if not connection.poll(self.timeout):
+                raise TimeoutError("Scoring service did not answer in time")
+            response = connection.recv()
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Scoring failed"))
+        return response
+
+    def ping(self):
+        return self._request({"op": "ping"})
+
+    def score(self, profiles, exclusions, version, top_n=RECOMMENDATION_COUNT):
+        return self._request({"op": "score", "profiles": np.asarray(profiles, dtype=np.float32),
+                              "exclusions": exclusions, "version": version, "top_n": top_n})["results"]
+
+# Recompute and store recommendations for every user, scoring in parallel across the pool
+def rescore_all_users(service, user_ids=None):
+    from db_module.dynamo_handler import save_recommendations
+    from db_module.reconcile_stats import get_all_user_ids
+    from recommender.recommend import library_profiles
+
+    user_ids = user_ids or get_all_user_ids()
+    started = time.perf_counter()
+    profiles, exclusions = library_profiles(user_ids)
+    results = service.score(profiles, exclusions, CANDIDATE_COUNT)
+    failed = [user_id for user_id, profile, scored in zip(user_ids, profiles, results)
+              if not save_recommendations(user_id, to_recommendations(service.catalog, scored),
+                                          profile_to_preference(profile, service.genre_columns))]
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {len(user_ids)} user(s) in {elapsed:.2f}s ({len(user_ids) / max(elapsed, 1e-9):.0f} users/s)!")
+    if failed:
+        print(f"⚠️ Failed to store recommendations for: {', '.join(failed)}")
+    return failed
+
+# Run the service with e.g. `python recommender/scoring_service.py`, or a one-off batch with `--all-users`
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process recommendation scoring service.")
+    parser.add_argument("--socket", default=None, help="Unix socket to listen on (default: in a private runtime directory)")
+    parser.add_argument("--workers", type=int, default=SCORING_WORKERS, help="Number of scoring processes")
+    parser.add_argument("--all-users", action="store_true", help="Rescore every user once and exit")
+    parser.add_argument("user_ids", nargs="*", help="With --all-users, only rescore these users")
+    args = parser.parse_args()
+
+    service = ScoringService(workers=args.workers).start()
+    try:
+        if args.all_users:
+            rescore_all_users(service, args.user_ids)
+        else:
+            service.serve(args.socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()